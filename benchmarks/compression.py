@@ -0,0 +1,98 @@
+"""Compare bandwidth saved against CPU spent for each response encoding.
+
+Seeds a temporary SQLite database, fetches real feed and post responses
+from the app uncompressed, then compresses each body with every encoding
+CompressionMiddleware can produce at a range of levels. Reports the
+compression ratio, bytes saved and CPU time per response, both for the
+whole body at once and for the body streamed in chunks with a flush after
+each one, as the middleware does for streaming responses.
+
+    python -m benchmarks.compression --posts 2000 --rounds 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+tmp_dir = tempfile.mkdtemp()
+os.environ["ENV_STATE"] = "test"
+os.environ["TEST_DATABASE_URL"] = f"sqlite:///{tmp_dir}/benchmark.db"
+os.environ["TEST_DB_FORCE_ROLL_BACK"] = "false"
+
+import httpx  # noqa: E402
+
+from storeapi.compression import available_encodings  # noqa: E402
+from storeapi.database import create_schema, database, engine  # noqa: E402
+from storeapi.main import app  # noqa: E402
+from storeapi.seed import seed  # noqa: E402
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 8, 11), "zstd": (1, 3, 9, 19)}
+
+
+async def fetch_bodies(paths: list) -> dict:
+    await database.connect()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        bodies = {}
+        for path in paths:
+            response = await client.get(path, headers={"Accept-Encoding": "identity"})
+            response.raise_for_status()
+            bodies[path] = response.content
+    await database.disconnect()
+    return bodies
+
+
+def compress(compressor_cls, level: int, body: bytes, chunk_size: int) -> bytes:
+    compressor = compressor_cls(level)
+    if not chunk_size:
+        return compressor.compress(body) + compressor.finish()
+
+    output = []
+    for start in range(0, len(body), chunk_size):
+        output.append(compressor.compress(body[start:start + chunk_size]) + compressor.flush())
+    output.append(compressor.finish())
+    return b"".join(output)
+
+
+def measure(compressor_cls, level: int, body: bytes, rounds: int, chunk_size: int) -> tuple:
+    start = time.process_time()
+    for _ in range(rounds):
+        compressed = compress(compressor_cls, level, body, chunk_size)
+    cpu_ms = (time.process_time() - start) / rounds * 1000
+    return len(compressed), cpu_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--likes", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20, help="compressions per measurement")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="chunk size for the streaming rows")
+    args = parser.parse_args()
+
+    create_schema()
+    seed(engine, args.users, args.posts, args.comments, args.likes)
+    bodies = asyncio.run(fetch_bodies(["/post?sorting=new", "/post?sorting=most_likes", "/post/1"]))
+
+    encodings = available_encodings()
+    print(f"encodings available: {', '.join(encodings)}\n")
+    print(f"{'response':<26} {'encoding':<16} {'bytes':>10} {'ratio':>7} {'saved':>10} {'cpu ms':>8} {'KB/cpu ms':>10}")
+    for path, body in bodies.items():
+        print(f"{path:<26} {'identity':<16} {len(body):>10}")
+        for encoding, compressor_cls in encodings.items():
+            for level in LEVELS[encoding]:
+                for mode, chunk_size in (("", 0), ("stream", args.chunk_size)):
+                    size, cpu_ms = measure(compressor_cls, level, body, args.rounds, chunk_size)
+                    saved = len(body) - size
+                    label = f"{encoding}-{level}" + (f" {mode}" if mode else "")
+                    print(
+                        f"{'':<26} {label:<16} {size:>10} {len(body) / size:>7.1f} {saved:>10} "
+                        f"{cpu_ms:>8.2f} {saved / 1024 / max(cpu_ms, 1e-6):>10.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
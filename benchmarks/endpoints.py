@@ -0,0 +1,182 @@
+"""Load-test the main API endpoints against a seeded SQLite database.
+
+Seeds a temporary SQLite database with storeapi.seed, then drives each
+endpoint in-process through httpx's ASGI transport and reports
+throughput and p50/p95/p99 latency. Results can be saved as JSON and
+compared against a previous run; the command exits non-zero when an
+endpoint regresses past the tolerance.
+
+    python -m benchmarks.endpoints --users 200 --posts 2000 --output results.json
+    python -m benchmarks.endpoints --baseline results.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+tmp_dir = tempfile.mkdtemp()
+os.environ["ENV_STATE"] = "test"
+os.environ["TEST_DATABASE_URL"] = f"sqlite:///{tmp_dir}/benchmark.db"
+os.environ["TEST_DB_FORCE_ROLL_BACK"] = "false"
+
+import httpx  # noqa: E402
+import sqlalchemy  # noqa: E402
+
+from storeapi.config import config  # noqa: E402
+from storeapi.database import create_schema, database, engine, tag_table  # noqa: E402
+from storeapi.hot_scores import hot_scores  # noqa: E402
+from storeapi.like_buffer import like_buffer  # noqa: E402
+from storeapi.main import app  # noqa: E402
+from storeapi.security import create_access_token  # noqa: E402
+from storeapi.seed import DEFAULT_PASSWORD, seed  # noqa: E402
+
+
+def scenarios(users: int, posts: int, tags: list, rng: random.Random) -> dict:
+    """Map an endpoint name to a function issuing one request."""
+    headers = {"Authorization": f"Bearer {create_access_token('seed1@example.com')}"}
+
+    def post_id() -> int:
+        return rng.randint(1, posts)
+
+    return {
+        "GET /post?sorting=new": lambda client: client.get("/post", params={"sorting": "new"}),
+        "GET /post?sorting=old": lambda client: client.get("/post", params={"sorting": "old"}),
+        "GET /post?sorting=most_likes": lambda client: client.get("/post", params={"sorting": "most_likes"}),
+        "GET /post?sorting=hot": lambda client: client.get("/post", params={"sorting": "hot"}),
+        "GET /post?fields=likes": lambda client: client.get("/post", params={"fields": "likes"}),
+        "GET /post/{id}": lambda client: client.get(f"/post/{post_id()}"),
+        "GET /post/{id}/comment": lambda client: client.get(f"/post/{post_id()}/comment"),
+        "GET /tags/{tag}/posts": lambda client: client.get(f"/tags/{rng.choice(tags)}/posts"),
+        "GET /tags/trending": lambda client: client.get("/tags/trending"),
+        "POST /post": lambda client: client.post("/post", json={"body": "Benchmark post"}, headers=headers),
+        "POST /comment": lambda client: client.post(
+            "/comment", json={"body": "Benchmark comment", "post_id": post_id()}, headers=headers
+        ),
+        "POST /like": lambda client: client.post("/like", json={"post_id": post_id()}, headers=headers),
+        "POST /token": lambda client: client.post(
+            "/token", data={"username": f"seed{rng.randint(1, users)}@example.com", "password": DEFAULT_PASSWORD}
+        ),
+    }
+
+
+def percentile(latencies: list, pct: int) -> float:
+    return statistics.quantiles(latencies, n=100, method="inclusive")[pct - 1]
+
+
+async def measure(client: httpx.AsyncClient, request, requests: int, concurrency: int) -> dict:
+    for _ in range(min(10, requests)):
+        (await request(client)).raise_for_status()
+
+    latencies = []
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await request(client)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return a description of every endpoint that regressed past tolerance."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if result["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous['throughput']:.1f} -> {result['throughput']:.1f} req/s"
+            )
+    return regressions
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    create_schema()
+    seed(engine, args.users, args.posts, args.comments, args.likes, seed=args.seed)
+    with engine.connect() as connection:
+        tags = [name.lstrip("#") for name in connection.execute(sqlalchemy.select(tag_table.c.name)).scalars()]
+
+    await database.connect()
+    # Score once up front; the seeded posts are all recent.
+    await hot_scores.refresh()
+    if config.LIKE_BUFFER_ENABLED:
+        await like_buffer.start()
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        print(f"{'endpoint':<30} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, request in scenarios(args.users, args.posts, tags, rng).items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            # bcrypt dominates login, so it gets a fraction of the requests.
+            requests = max(args.requests // 10, 10) if name == "POST /token" else args.requests
+            result = results[name] = await measure(client, request, requests, args.concurrency)
+            print(
+                f"{name:<30} {result['throughput']:>9.1f} {result['p50_ms']:>8.2f} "
+                f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+            )
+
+    await like_buffer.stop()
+    await database.disconnect()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--likes", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=300, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="run only endpoints whose name contains one of these")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"dataset": {
+                "users": args.users, "posts": args.posts, "comments": args.comments, "likes": args.likes,
+            }, "results": results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+        if regressions:
+            print("Regressions past tolerance:", *regressions, sep="\n  ")
+            sys.exit(1)
+        print("No regressions past tolerance.")
+
+
+if __name__ == "__main__":
+    main()
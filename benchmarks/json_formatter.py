@@ -0,0 +1,70 @@
+"""Compare throughput of the JSON log formatters.
+
+Formats each kind of record (plain, with extras, with an exception) with
+python-json-logger, and with our JsonFormatter on orjson and on the stdlib
+json fallback. Exception records are dominated by traceback rendering,
+which every formatter pays alike.
+
+    python -m benchmarks.json_formatter --records 100000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from unittest import mock
+
+os.environ.setdefault("ENV_STATE", "test")
+
+from pythonjsonlogger import jsonlogger  # noqa: E402
+
+from storeapi import logging_conf  # noqa: E402
+from storeapi.logging_conf import JsonFormatter  # noqa: E402
+
+DATEFMT = "%Y-%m-%d %H:%M:%S"
+FORMAT = "%(asctime)s %(msecs)03d %(levelname)-8s %(correlation_id)s %(name)s %(lineno)d %(message)s"
+
+
+def make_records() -> dict:
+    plain = logging.LogRecord("storeapi.routers.post", logging.INFO, __file__, 40, "Finding post with id: %s", (1,), None)
+    extras = logging.LogRecord("storeapi.security", logging.DEBUG, __file__, 80, "Fetching user", None, None)
+    extras.email = "****@example.com"
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        failed = logging.LogRecord("storeapi.main", logging.ERROR, __file__, 50, "Failed", None, sys.exc_info())
+
+    records = {"plain": plain, "extras": extras, "exception": failed}
+    for record in records.values():
+        record.correlation_id = "0123456789abcdef0123456789abcdef"
+    return records
+
+
+def run(formatter: logging.Formatter, record: logging.LogRecord, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        record.exc_text = None
+        formatter.format(record)
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'record':<10} {'formatter':<24} {'records/s':>12} {'speedup':>8}")
+    for kind, record in make_records().items():
+        results = {"python-json-logger": run(jsonlogger.JsonFormatter(FORMAT, datefmt=DATEFMT), record, args.records)}
+        if logging_conf.orjson is not None:
+            results["JsonFormatter (orjson)"] = run(JsonFormatter(datefmt=DATEFMT), record, args.records)
+        with mock.patch.object(logging_conf, "orjson", None):
+            results["JsonFormatter (json)"] = run(JsonFormatter(datefmt=DATEFMT), record, args.records)
+
+        baseline = results["python-json-logger"]
+        for name, throughput in results.items():
+            print(f"{kind:<10} {name:<24} {throughput:>12,.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
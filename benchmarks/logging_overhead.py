@@ -0,0 +1,104 @@
+"""Measure the logging cost of a typical request under each logging mode.
+
+Every simulated request runs under its own correlation id and emits the
+same records as ``GET /post/{post_id}``. The caller-side time is what a
+request pays on the event loop; the drain time is the work left for the
+queue listener thread.
+
+    python -m benchmarks.logging_overhead --requests 5000 --sample-rate 0.1
+"""
+import argparse
+import contextlib
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("ENV_STATE", "test")
+
+import sqlalchemy  # noqa: E402
+from asgi_correlation_id.context import correlation_id  # noqa: E402
+
+from storeapi.config import config  # noqa: E402
+from storeapi.logging_conf import (  # noqa: E402
+    configure_logging,
+    dropped_log_records,
+    stop_logging,
+)
+
+posts = sqlalchemy.table("posts", sqlalchemy.column("id"), sqlalchemy.column("body"))
+query = sqlalchemy.select(posts).where(posts.c.id == 1)
+logger = logging.getLogger("storeapi.benchmarks")
+
+
+def simulate_request(post_id: int) -> None:
+    token = correlation_id.set(uuid.uuid4().hex)
+    try:
+        logger.info("Getting post with comments")
+        logger.debug(query)
+        logger.info("Finding post with id: %s", post_id)
+        logger.debug(query)
+        logger.debug("Fetching user from database", extra={"email": "test@example.com"})
+        logger.debug({"id": post_id, "body": "Test Post", "likes": 0})
+    finally:
+        correlation_id.reset(token)
+
+
+def run_mode(name: str, settings: dict, requests: int) -> dict:
+    for key, value in settings.items():
+        setattr(config, key, value)
+
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+        cwd = os.getcwd()
+        os.chdir(log_dir)
+        try:
+            with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                if name == "disabled":
+                    logging.disable(logging.CRITICAL)
+                configure_logging()
+
+                start = time.perf_counter()
+                for post_id in range(requests):
+                    simulate_request(post_id)
+                elapsed = time.perf_counter() - start
+
+                dropped = dropped_log_records()
+                start = time.perf_counter()
+                stop_logging()
+                drain = time.perf_counter() - start
+                logging.disable(logging.NOTSET)
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "mode": name,
+        "per_request_us": elapsed / requests * 1e6,
+        "drain_ms": drain * 1e3,
+        "dropped": dropped,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    defaults = {"LOG_SAMPLE_RATE": 1.0, "LOG_QUEUE_ENABLED": False}
+    modes = {
+        "disabled": defaults,
+        "default": defaults,
+        "sampled": {**defaults, "LOG_SAMPLE_RATE": args.sample_rate},
+        "queue": {**defaults, "LOG_QUEUE_ENABLED": True},
+        "queue+sampled": {"LOG_SAMPLE_RATE": args.sample_rate, "LOG_QUEUE_ENABLED": True},
+    }
+
+    print(f"{'mode':<15} {'us/request':>12} {'drain ms':>10} {'dropped':>8}")
+    for name, settings in modes.items():
+        result = run_mode(name, settings, args.requests)
+        print(f"{name:<15} {result['per_request_us']:>12.1f} {result['drain_ms']:>10.1f} {result['dropped']:>8}")
+
+
+if __name__ == "__main__":
+    main()
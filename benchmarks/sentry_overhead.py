@@ -0,0 +1,106 @@
+"""Measure the request overhead of Sentry tracing and profiling settings.
+
+Runs GET /post in-process against a temporary SQLite database, first with
+Sentry disabled and then with each sampling setting. Envelopes are
+discarded by a null transport, so only the in-process cost is measured.
+
+    python -m benchmarks.sentry_overhead --requests 500
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+tmp_dir = tempfile.mkdtemp()
+os.environ["ENV_STATE"] = "test"
+os.environ["TEST_DATABASE_URL"] = f"sqlite:///{tmp_dir}/benchmark.db"
+os.environ["TEST_DB_FORCE_ROLL_BACK"] = "false"
+
+import httpx  # noqa: E402
+import sentry_sdk  # noqa: E402
+from sentry_sdk.transport import Transport  # noqa: E402
+
+from storeapi.database import (  # noqa: E402
+    create_schema,
+    database,
+    post_table,
+    user_table,
+)
+from storeapi.main import app  # noqa: E402
+from storeapi.tracing import AdaptiveTracesSampler  # noqa: E402
+
+DSN = "https://public@sentry.example.com/1"
+
+
+class NullTransport(Transport):
+    def capture_envelope(self, envelope) -> None:
+        pass
+
+
+SETTINGS = {
+    "traces 0%": {"traces_sample_rate": 0.0},
+    "traces 1%": {"traces_sample_rate": 0.01},
+    "adaptive": {
+        "traces_sampler": AdaptiveTracesSampler(
+            default_rate=0.05, route_rates={"GET /post": 0.01}, slow_request_ms=1000, boost_requests=10
+        )
+    },
+    "traces 100%": {"traces_sample_rate": 1.0},
+    "traces+profiles 100%": {"traces_sample_rate": 1.0, "profiles_sample_rate": 1.0},
+}
+
+
+async def seed(posts: int) -> None:
+    user_id = await database.execute(user_table.insert().values(email="bench@example.com", password="x"))
+    await database.execute_many(
+        post_table.insert(), [{"body": f"Post {i}", "user_id": user_id} for i in range(posts)]
+    )
+
+
+async def measure(client: httpx.AsyncClient, requests: int, rounds: int = 3) -> float:
+    """Best-of-rounds mean latency in milliseconds."""
+    for _ in range(10):
+        await client.get("/post")
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/post")
+            response.raise_for_status()
+        timings.append((time.perf_counter() - start) / requests * 1000)
+    return min(timings)
+
+
+async def run(requests: int, posts: int) -> None:
+    create_schema()
+    await database.connect()
+    await seed(posts)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        baseline = await measure(client, requests)
+        print(f"{'setting':<22} {'ms/request':>10} {'overhead':>9}")
+        print(f"{'sentry off':<22} {baseline:>10.3f} {'':>9}")
+
+        for name, options in SETTINGS.items():
+            sentry_sdk.init(dsn=DSN, transport=NullTransport, **options)
+            latency = await measure(client, requests)
+            print(f"{name:<22} {latency:>10.3f} {(latency / baseline - 1) * 100:>8.1f}%")
+
+    sentry_sdk.init(dsn=None)
+    await database.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests, args.posts))
+
+
+if __name__ == "__main__":
+    main()
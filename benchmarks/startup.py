@@ -0,0 +1,74 @@
+"""Measure how long importing the app takes and which modules dominate.
+
+Imports storeapi.main in fresh interpreters with -X importtime and reports
+the best cumulative import time and the slowest top-level packages. Exits
+non-zero when the import exceeds --budget-ms or pulls in a module listed
+in --forbid, which keeps lazy imports from silently becoming eager again.
+
+    python -m benchmarks.startup --runs 5 --budget-ms 1500
+"""
+import argparse
+import collections
+import os
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_FORBIDDEN = ("b2sdk", "sentry_sdk", "PIL")
+
+
+def import_times(module: str) -> dict:
+    """Map each imported module to its (self, cumulative) import time in microseconds."""
+    env = {
+        **os.environ,
+        "ENV_STATE": "test",
+        "TEST_DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/startup.db",
+        "TEST_SENTRY_DSN": "",
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="storeapi.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, help="fail when the best import time exceeds this")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN, help="packages that must not be imported")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    packages = collections.Counter()
+    for name, (self_us, _) in best.items():
+        packages[name.split(".")[0]] += self_us
+
+    print(f"{'package':<30} {'self ms':>9}")
+    for package, self_us in packages.most_common(args.top):
+        print(f"{package:<30} {self_us / 1000:>9.1f}")
+    print(f"\nimport {args.module}: {total_ms:.1f} ms (best of {args.runs})")
+
+    failures = [f"{package} is imported at startup" for package in args.forbid if package in packages]
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.1f} ms, budget is {args.budget_ms:.1f} ms")
+
+    if failures:
+        print("Startup budget exceeded:", *failures, sep="\n  ")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
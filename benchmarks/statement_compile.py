@@ -0,0 +1,78 @@
+"""Measure per-query statement build and compile overhead.
+
+Compares building a Core statement per call and compiling it through the
+stock databases backends (before) with a PreparedStatement compiled once
+and cached by the app backends (after). No database is needed: only the
+Python work done before a query is sent is timed.
+
+    python -m benchmarks.statement_compile --iterations 20000
+"""
+import argparse
+import os
+import timeit
+
+os.environ.setdefault("ENV_STATE", "test")
+
+from databases.backends.postgres import PostgresConnection  # noqa: E402
+from databases.backends.sqlite import SQLiteConnection  # noqa: E402
+
+from storeapi.database import comment_table, post_table, user_table  # noqa: E402
+from storeapi.db_backends.postgres import InstrumentedPostgresBackend  # noqa: E402
+from storeapi.db_backends.sqlite import PooledSQLiteBackend  # noqa: E402
+from storeapi.routers.post import (  # noqa: E402
+    PostSorting,
+    select_comments_by_post,
+    select_post_and_likes,
+    select_post_and_likes_by_id,
+    select_posts_sorted,
+)
+from storeapi.security import select_user_by_email  # noqa: E402
+
+STATEMENTS = {
+    "feed (new)": (
+        lambda: select_post_and_likes.order_by(post_table.c.id.desc()),
+        select_posts_sorted[PostSorting.new], {},
+    ),
+    "post with likes by id": (
+        lambda: select_post_and_likes.where(post_table.c.id == 42),
+        select_post_and_likes_by_id, {"post_id": 42},
+    ),
+    "comments by post": (
+        lambda: comment_table.select().where(comment_table.c.post_id == 42),
+        select_comments_by_post, {"post_id": 42},
+    ),
+    "user by email": (
+        lambda: user_table.select().where(user_table.c.email == "user@example.com"),
+        select_user_by_email, {"email": "user@example.com"},
+    ),
+}
+
+
+def connections() -> dict:
+    sqlite = PooledSQLiteBackend("sqlite:///benchmark.db")
+    postgres = InstrumentedPostgresBackend("postgresql://localhost/benchmark")
+    return {
+        "sqlite": (SQLiteConnection(sqlite._pool, sqlite._dialect), sqlite.connection()),
+        "postgres": (PostgresConnection(postgres, postgres._dialect), postgres.connection()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'dialect':<9} {'statement':<24} {'before us':>10} {'after us':>9} {'speedup':>8}")
+    for dialect, (stock, cached) in connections().items():
+        for name, (build, prepared, values) in STATEMENTS.items():
+            before = min(timeit.repeat(
+                lambda: stock._compile(build()), number=args.iterations, repeat=3
+            )) / args.iterations * 1e6
+            after = min(timeit.repeat(
+                lambda: cached._compile(prepared.bind(values)), number=args.iterations, repeat=3
+            )) / args.iterations * 1e6
+            print(f"{dialect:<9} {name:<24} {before:>10.1f} {after:>9.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
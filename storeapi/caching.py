@@ -0,0 +1,41 @@
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """A weak ETag, since it follows versions rather than bytes; compression leaves it as it is."""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match, which uses the weak comparison from RFC 9110."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    candidates = (candidate.strip() for candidate in header.split(","))
+    return _opaque_tag(etag) in (_opaque_tag(candidate) for candidate in candidates)
+
+
+def cache_headers(
+        etag: str, cache_control: str, surrogate_keys: Iterable[str], surrogate_control: Optional[str] = None
+) -> dict:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Surrogate-Key": " ".join(surrogate_keys),
+    }
+    if surrogate_control:
+        headers["Surrogate-Control"] = surrogate_control
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
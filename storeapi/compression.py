@@ -0,0 +1,250 @@
+import logging
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from storeapi.tracing import route_key
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Media types that are already compressed; running them through gzip only
+# burns CPU.
+COMPRESSED_MEDIA_TYPES = (
+    "image/", "video/", "audio/", "font/woff", "application/zip", "application/gzip",
+    "application/x-gzip", "application/zstd", "application/x-bzip2", "application/x-7z-compressed",
+    "application/pdf", "application/octet-stream",
+)
+
+
+class Compressor:
+    """Incremental compressor; flush() emits everything buffered so far."""
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def flush(self) -> bytes:
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        raise NotImplementedError
+
+
+class GzipCompressor(Compressor):
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor(Compressor):
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor(Compressor):
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encodings() -> Dict[str, Callable[[int], Compressor]]:
+    """Encodings this process can produce, in order of preference."""
+    encodings = {}
+    if zstandard is not None:
+        encodings["zstd"] = ZstdCompressor
+    if brotli is not None:
+        encodings["br"] = BrotliCompressor
+    encodings["gzip"] = GzipCompressor
+    return encodings
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header: str, supported: List[str]) -> Optional[str]:
+    """Pick the client's highest-rated coding from supported, in supported order on ties.
+
+    Returns None when the client accepts none of them, so the response
+    goes out uncompressed.
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def is_compressible(headers: Dict[bytes, bytes]) -> bool:
+    if b"content-encoding" in headers:
+        return False
+    content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+    return not content_type.startswith(COMPRESSED_MEDIA_TYPES)
+
+
+class CompressionMiddleware:
+    """Compress responses with zstd, brotli or gzip as negotiated with the client.
+
+    Bodies smaller than minimum_size and media types that are already
+    compressed go out as they are. Levels come from levels, overridden per
+    route by route_levels, keyed by route_key with every path parameter
+    written as {id}: "GET /post/{id}/comment" for /post/{post_id}/comment.
+    A level of 0 turns an encoding off for that route. Responses sent in
+    several body messages are compressed incrementally and flushed after
+    every chunk, so streaming endpoints keep delivering data as it is
+    produced.
+    """
+
+    def __init__(
+            self, app, minimum_size: int = 500, levels: Optional[Dict[str, int]] = None,
+            route_levels: Optional[Dict[str, Dict[str, int]]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+        self.levels = {"zstd": 3, "br": 4, "gzip": 6, **(levels or {})}
+        self.route_levels = route_levels or {}
+
+    def _encoding_levels(self, scope) -> Dict[str, int]:
+        route = scope.get("route")
+        if route is None or not self.route_levels:
+            return self.levels
+        overrides = self.route_levels.get(route_key(scope["method"], getattr(route, "path", scope["path"])), {})
+        return {**self.levels, **overrides}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                if message["status"] in (204, 304) or not is_compressible(headers):
+                    passthrough = True
+                    return await send(message)
+                # Hold the start message until the first body chunk tells
+                # us whether the response is worth compressing.
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = _add_vary(start.get("headers", []))
+
+                levels = self._encoding_levels(scope)
+                supported = [coding for coding in self.encodings if levels.get(coding, 0) > 0]
+                encoding = negotiate_encoding(accept_encoding, supported) if accept_encoding else None
+
+                if encoding is None or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send({**start, "headers": headers})
+                    return await send(message)
+
+                compressor = self.encodings[encoding](levels[encoding])
+                headers = [
+                    (name, _weak_etag(value) if name == b"etag" else value)
+                    for name, value in headers if name != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+
+                if not more_body:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": headers})
+                    return await send({"type": "http.response.body", "body": body, "more_body": False})
+
+                await send({**start, "headers": headers})
+
+            if more_body:
+                chunk = compressor.compress(body) + compressor.flush()
+            else:
+                chunk = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _add_vary(headers) -> list:
+    vary = [value for name, value in headers if name == b"vary"]
+    headers = [(name, value) for name, value in headers if name != b"vary"]
+    values = [part.strip() for value in vary for part in value.split(b",") if part.strip()]
+    if b"accept-encoding" not in (value.lower() for value in values):
+        values.append(b"Accept-Encoding")
+    return headers + [(b"vary", b", ".join(values))]
+
+
+def _weak_etag(value: bytes) -> bytes:
+    # The compressed bytes differ from the identity representation, so a
+    # strong validator would be wrong; a weak one still revalidates.
+    return value if value.startswith(b"W/") else b"W/" + value
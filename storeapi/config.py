@@ -1,8 +1,8 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Literal, Optional, Union
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 load_dotenv()
 
@@ -14,15 +14,84 @@ class BaseConfig(BaseSettings):
 
 class GlobalConfig(BaseConfig):
     DATABASE_URL: Optional[str] = None
+    DATABASE_READ_URLS: List[str] = []
     DB_FORCE_ROLL_BACK: bool = False
+    DB_CREATE_SCHEMA: bool = True
+    DB_SLOW_QUERY_MS: float = 100
+    DB_REPEATED_QUERY_THRESHOLD: int = 5
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 5
+    DB_POOL_ACQUIRE_TIMEOUT: float = 10
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_CONNECTION_LIFETIME: float = 300
+    DB_READ_STICKY_SECONDS: float = 5
+    DB_REPLICA_RETRY_SECONDS: float = 30
+    READ_COALESCING_ENABLED: bool = True
+    FEED_FANOUT_MAX_FOLLOWERS: int = 1000
+    FEED_BACKFILL_POSTS: int = 50
+    FEED_PAGE_SIZE: int = 20
+    FEED_MAX_PAGE_SIZE: int = 100
+    HOT_SCORES_ENABLED: bool = True
+    HOT_SCORES_INTERVAL: float = 60
+    HOT_SCORES_WINDOW_HOURS: float = 48
+    HOT_SCORES_DECAY_SECONDS: float = 45000
+    HOT_SCORES_COMMENT_WEIGHT: float = 2
+    HOT_POSTS_LIMIT: int = 100
+    TAGS_MAX_PER_POST: int = 20
+    TAGS_TRENDING_WINDOW_HOURS: float = 24
+    TAGS_TRENDING_LIMIT: int = 10
+    EVENTS_BACKEND: str = "local"
+    EVENTS_DATABASE_URL: Optional[str] = None
+    EVENTS_CHANNEL: str = "storeapi_events"
+    EVENTS_MAX_PENDING: int = 100
+    EVENTS_HEARTBEAT_SECONDS: float = 15
+    EVENTS_RECONNECT_SECONDS: float = 1
+    EVENTS_RECONNECT_MAX_SECONDS: float = 30
+    EVENTS_MAX_QUEUED: int = 10000
+    LIKE_BUFFER_ENABLED: bool = False
+    LIKE_BUFFER_BATCH_SIZE: int = 500
+    LIKE_BUFFER_MAX_SIZE: int = 10000
+    LIKE_BUFFER_FLUSH_INTERVAL: float = 0.5
+    DB_SQLITE_TUNED: bool = True
+    DB_SQLITE_PRAGMAS: Dict[str, Union[int, str]] = {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "mmap_size": 268435456,
+        "cache_size": -64000,
+        "busy_timeout": 5000,
+        "foreign_keys": "on",
+        "temp_store": "memory",
+    }
     LOGTAIL_API_KEY: Optional[str] = None
+    LOG_FILE: str = "storeapi.log"
+    LOG_SAMPLE_RATE: float = 1.0
+    LOG_QUEUE_ENABLED: bool = False
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_QUEUE_DROP_POLICY: Literal["block", "drop_newest", "drop_oldest"] = "drop_newest"
     MAILGUN_DOMAIN: Optional[str] = None
     MAILGUN_API_KEY: Optional[str] = None
     B2_KEY_ID: Optional[str] = None
     B2_APPLICATION_KEY: Optional[str] = None
     B2_BUCKET_NAME: Optional[str] = None
+    STORAGE_BACKEND: str = "b2"
+    LOCAL_STORAGE_DIR: str = "uploads"
+    LOCAL_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
     DEEPAI_API_KEY: Optional[str] = None
     SENTRY_DSN: Optional[str] = None
+    SENTRY_TRACES_SAMPLE_RATE: float = 1.0
+    SENTRY_ROUTE_SAMPLE_RATES: Dict[str, float] = {}
+    SENTRY_SLOW_REQUEST_MS: float = 1000
+    SENTRY_BOOST_REQUESTS: int = 10
+    SENTRY_PROFILING_ENABLED: bool = True
+    SENTRY_PROFILES_SAMPLE_RATE: float = 1.0
+    IMAGE_PROCESS_WORKERS: Optional[int] = None
+    FEED_CACHE_CONTROL: str = "public, max-age=0, must-revalidate"
+    POST_CACHE_CONTROL: str = "public, max-age=0, must-revalidate"
+    SURROGATE_CONTROL: Optional[str] = None
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 500
+    COMPRESSION_LEVELS: Dict[str, int] = {"zstd": 3, "br": 4, "gzip": 6}
+    COMPRESSION_ROUTE_LEVELS: Dict[str, Dict[str, int]] = {}
 
 
 class DevelopmentConfig(GlobalConfig):
@@ -30,6 +99,12 @@ class DevelopmentConfig(GlobalConfig):
 
 
 class ProductionConfig(GlobalConfig):
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = 20
+    LOG_QUEUE_ENABLED: bool = True
+    SENTRY_TRACES_SAMPLE_RATE: float = 0.05
+    SENTRY_ROUTE_SAMPLE_RATES: Dict[str, float] = {"GET /post": 0.01, "GET /post/{id}": 0.01}
+    SENTRY_PROFILES_SAMPLE_RATE: float = 0.1
     model_config = SettingsConfigDict(env_prefix="PROD_", extra='ignore')
 
 
@@ -1,6 +1,15 @@
-import databases
+import asyncio
+import logging
+from typing import Optional
+
 import sqlalchemy
+
 from storeapi.config import config
+from storeapi.db_backends import PreparedStatement
+from storeapi.query_stats import InstrumentedDatabase
+from storeapi.replicas import ReadRouter
+
+logger = logging.getLogger(__name__)
 
 
 metadata = sqlalchemy.MetaData()
@@ -12,6 +21,8 @@ user_table = sqlalchemy.Table(
     sqlalchemy.Column("email", sqlalchemy.String, unique=True),
     sqlalchemy.Column("password", sqlalchemy.String),
     sqlalchemy.Column("confirmed", sqlalchemy.Boolean, default=False),
+    # Decides between fan-out on write and on read for the user's posts.
+    sqlalchemy.Column("follower_count", sqlalchemy.Integer, nullable=False, server_default="0"),
 )
 
 post_table = sqlalchemy.Table(
@@ -21,6 +32,14 @@ post_table = sqlalchemy.Table(
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
     sqlalchemy.Column("image_url", sqlalchemy.String),
+    sqlalchemy.Column("image_variants", sqlalchemy.JSON),
+    # Bumped whenever the post, its likes or its comments change; used for ETags.
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False, server_default="1"),
+    sqlalchemy.Column(
+        "created_at", sqlalchemy.DateTime(timezone=True), nullable=False, server_default=sqlalchemy.func.now()
+    ),
+    sqlalchemy.Index("ix_posts_user_id_id", "user_id", "id"),
+    sqlalchemy.Index("ix_posts_created_at", "created_at"),
 )
 
 comment_table = sqlalchemy.Table(
@@ -30,6 +49,7 @@ comment_table = sqlalchemy.Table(
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), nullable=False),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Index("ix_comments_post_id", "post_id"),
 )
 
 like_table = sqlalchemy.Table(
@@ -38,12 +58,185 @@ like_table = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), nullable=False),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Index("ix_likes_post_id", "post_id"),
+)
+
+follow_table = sqlalchemy.Table(
+    "follows",
+    metadata,
+    sqlalchemy.Column("follower_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("followee_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Index("ix_follows_followee_id", "followee_id", "follower_id"),
+)
+
+# Materialized home timelines: one row per post delivered to a user.
+timeline_table = sqlalchemy.Table(
+    "timelines",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), primary_key=True),
+)
+
+# Per-user counters kept up to date by the write paths; rebuilt from
+# scratch with python -m storeapi.user_stats.
+user_stats_table = sqlalchemy.Table(
+    "user_stats",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("post_count", sqlalchemy.Integer, nullable=False, server_default="0"),
+    sqlalchemy.Column("comment_count", sqlalchemy.Integer, nullable=False, server_default="0"),
+    sqlalchemy.Column("likes_received", sqlalchemy.Integer, nullable=False, server_default="0"),
+)
+
+# Hot scores of recent posts, kept up to date by storeapi.hot_scores.
+post_score_table = sqlalchemy.Table(
+    "post_scores",
+    metadata,
+    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), primary_key=True),
+    sqlalchemy.Column("score", sqlalchemy.Float, nullable=False),
+    # The posts.version the score was computed from.
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("computed_at", sqlalchemy.DateTime(timezone=True), nullable=False),
+    sqlalchemy.Index("ix_post_scores_score", "score", "post_id"),
+)
+
+# Hashtags and mentions, named with their sigil: "#python", "@alice".
+tag_table = sqlalchemy.Table(
+    "tags",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("name", sqlalchemy.String, nullable=False, unique=True),
+)
+
+# The primary key doubles as the (tag_id, post_id) index for paging a tag's posts.
+post_tag_table = sqlalchemy.Table(
+    "post_tags",
+    metadata,
+    sqlalchemy.Column("tag_id", sqlalchemy.ForeignKey("tags.id"), primary_key=True),
+    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), primary_key=True),
+    sqlalchemy.Column(
+        "created_at", sqlalchemy.DateTime(timezone=True), nullable=False, server_default=sqlalchemy.func.now()
+    ),
+    sqlalchemy.Index("ix_post_tags_created_at_tag_id", "created_at", "tag_id"),
+)
+
+# A single row whose version every write that changes GET /post bumps, so
+# the feed's ETag is one primary key read rather than a scan of posts.
+feed_version_table = sqlalchemy.Table(
+    "feed_version",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False, server_default="0"),
+)
+sqlalchemy.event.listen(
+    feed_version_table, "after_create", sqlalchemy.DDL("INSERT INTO feed_version (id) VALUES (1)")
 )
 
 connect_args = {"check_same_thread": False} if 'sqlite' in config.DATABASE_URL else {}
 engine = sqlalchemy.create_engine(config.DATABASE_URL, connect_args=connect_args)
 
-metadata.create_all(engine)
 
-db_args = {'min_size': 1, 'max_size': 5} if 'postgres' in config.DATABASE_URL else {}
-database = databases.Database(config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK, **db_args)
+def create_schema() -> None:
+    """Create missing tables. Run by lifespan when DB_CREATE_SCHEMA is set, or with python -m storeapi.database."""
+    logger.info("Creating database schema")
+    metadata.create_all(engine)
+
+
+class Database(InstrumentedDatabase):
+    SUPPORTED_BACKENDS = {
+        **InstrumentedDatabase.SUPPORTED_BACKENDS,
+        "postgresql": "storeapi.db_backends.postgres:InstrumentedPostgresBackend",
+        "postgres": "storeapi.db_backends.postgres:InstrumentedPostgresBackend",
+    }
+
+    def _bind(self, query, values: Optional[dict]) -> tuple:
+        """Turn a PreparedStatement into something the backend can execute."""
+        if not isinstance(query, PreparedStatement):
+            return query, values
+        if hasattr(self._backend, "statement_cache"):
+            return query.bind(values or {}), None
+        return (query.statement.params(**values) if values else query.statement), None
+
+    async def fetch_all(self, query, values: Optional[dict] = None):
+        return await super().fetch_all(*self._bind(query, values))
+
+    async def fetch_one(self, query, values: Optional[dict] = None):
+        return await super().fetch_one(*self._bind(query, values))
+
+    async def fetch_val(self, query, values: Optional[dict] = None, column=0):
+        return await super().fetch_val(*self._bind(query, values), column=column)
+
+    async def execute(self, query, values: Optional[dict] = None):
+        return await super().execute(*self._bind(query, values))
+
+
+class TunedSQLiteDatabase(Database):
+    SUPPORTED_BACKENDS = {**Database.SUPPORTED_BACKENDS, "sqlite": "storeapi.db_backends.sqlite:PooledSQLiteBackend"}
+
+
+if 'postgres' in config.DATABASE_URL:
+    database_cls = Database
+    db_args = {
+        'min_size': config.DB_POOL_MIN_SIZE,
+        'max_size': config.DB_POOL_MAX_SIZE,
+        'acquire_timeout': config.DB_POOL_ACQUIRE_TIMEOUT,
+        'statement_cache_size': config.DB_STATEMENT_CACHE_SIZE,
+        'max_inactive_connection_lifetime': config.DB_CONNECTION_LIFETIME,
+    }
+elif config.DB_SQLITE_TUNED and ':memory:' not in config.DATABASE_URL:
+    # Separate read connections cannot share an in-memory database, so
+    # those keep the default one-connection-per-request backend.
+    database_cls = TunedSQLiteDatabase
+    db_args = {
+        'pragmas': config.DB_SQLITE_PRAGMAS,
+        'max_size': config.DB_POOL_MAX_SIZE,
+        'acquire_timeout': config.DB_POOL_ACQUIRE_TIMEOUT,
+    }
+else:
+    database_cls = Database
+    db_args = {}
+database = database_cls(config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK, **db_args)
+read_database = ReadRouter(
+    database,
+    [database_cls(url, **db_args) for url in config.DATABASE_READ_URLS],
+    sticky_seconds=config.DB_READ_STICKY_SECONDS,
+    retry_seconds=config.DB_REPLICA_RETRY_SECONDS,
+)
+
+
+def pool_stats() -> dict:
+    """Size of the connection pool, or an empty dict for backends without one."""
+    pool = getattr(database._backend, "_pool", None)
+    if pool is None or not hasattr(pool, "get_size"):
+        return {}
+
+    return {
+        "size": pool.get_size(),
+        "idle": pool.get_idle_size(),
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+    }
+
+
+def acquire_stats() -> dict:
+    """Wait times for pooled connections, or an empty dict for backends that do not record them."""
+    stats = getattr(database._backend, "acquire_stats", None)
+    return stats.as_dict() if stats is not None else {}
+
+
+async def warm_up_pool() -> None:
+    """Check out min_size connections at once and run a query on each.
+
+    This fails startup early when the database is unreachable and primes
+    every pooled connection before the first request arrives.
+    """
+    async def ping():
+        async with database.connection() as connection:
+            await connection.fetch_val("SELECT 1")
+
+    await asyncio.gather(*(ping() for _ in range(config.DB_POOL_MIN_SIZE)))
+    logger.debug("Warmed up %s database connections", config.DB_POOL_MIN_SIZE)
+
+
+if __name__ == "__main__":
+    create_schema()
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """No pooled connection became free within the acquire timeout."""
+
+
+class AcquireStats:
+    """How long requests wait for a connection from the pool."""
+
+    def __init__(self):
+        self.count = 0
+        self.waiting = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def timed(self, acquire, timeout: float):
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(acquire, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning("Timed out after %.1f s waiting for a database connection", timeout)
+            raise PoolTimeoutError(f"No database connection available after {timeout} s") from None
+        finally:
+            wait = time.perf_counter() - start
+            self.waiting -= 1
+            self.count += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": self.total_wait / self.count * 1000 if self.count else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class PreparedStatement:
+    """A statement built once, with bind parameters, whose compiled SQL is cached.
+
+    Pass it to the database with the parameter values, e.g.
+    database.fetch_one(post_by_id, {"post_id": 1}). Backends with a
+    StatementCache compile it once per dialect; other backends fall back to
+    statement.params(**values). Expanding (IN) parameters change the SQL
+    for every call, so they are not supported.
+    """
+
+    __slots__ = ("statement",)
+
+    def __init__(self, statement):
+        cache_key = statement._generate_cache_key()
+        if cache_key is None or any(bind.expanding for bind in cache_key.bindparams):
+            raise ValueError("Prepared statements must be cacheable and cannot use expanding parameters")
+        self.statement = statement
+
+    def bind(self, values: dict) -> "BoundStatement":
+        return BoundStatement(self, values)
+
+    def __str__(self) -> str:
+        return str(self.statement)
+
+
+class BoundStatement:
+    """A prepared statement with the values for one execution."""
+
+    __slots__ = ("prepared", "values")
+
+    def __init__(self, prepared: PreparedStatement, values: dict):
+        self.prepared = prepared
+        self.values = values
+
+    def __str__(self) -> str:
+        return str(self.prepared)
+
+
+class StatementCache:
+    """Compiled prepared statements for one backend, and therefore one dialect."""
+
+    def __init__(self):
+        self._entries: Dict[PreparedStatement, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prepared: PreparedStatement, compile: Callable[[PreparedStatement], tuple]) -> tuple:
+        entry = self._entries.get(prepared)
+        if entry is None:
+            self.misses += 1
+            entry = self._entries[prepared] = compile(prepared)
+        else:
+            self.hits += 1
+        return entry
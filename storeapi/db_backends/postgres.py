@@ -0,0 +1,52 @@
+from databases.backends.postgres import PostgresBackend, PostgresConnection
+
+from storeapi.db_backends import (
+    AcquireStats,
+    BoundStatement,
+    PreparedStatement,
+    StatementCache,
+)
+
+
+class InstrumentedPostgresConnection(PostgresConnection):
+    def _compile(self, query):
+        if not isinstance(query, BoundStatement):
+            return super()._compile(query)
+
+        compiled, sql, keys = self._database.statement_cache.get(query.prepared, self._compile_prepared)
+        params = compiled.construct_params(query.values)
+        processors = compiled._bind_processors
+        args = [processors[key](params[key]) if key in processors else params[key] for key in keys]
+        return sql, args, compiled._result_columns
+
+    def _compile_prepared(self, prepared: PreparedStatement) -> tuple:
+        compiled = prepared.statement.compile(dialect=self._dialect, compile_kwargs={"render_postcompile": True})
+        # Same numbering as PostgresConnection._compile: $n follows the sorted parameter names.
+        keys = sorted(compiled.params)
+        sql = compiled.string % {key: f"${i}" for i, key in enumerate(keys, start=1)}
+        return compiled, sql, keys
+
+    async def acquire(self) -> None:
+        assert self._connection is None, "Connection is already acquired"
+        assert self._database._pool is not None, "DatabaseBackend is not running"
+        self._connection = await self._database.acquire_stats.timed(
+            self._database._pool.acquire(), self._database.acquire_timeout
+        )
+
+
+class InstrumentedPostgresBackend(PostgresBackend):
+    """asyncpg backend that bounds and records the wait for a pooled connection
+    and caches compiled prepared statements.
+
+    acquire_timeout is consumed here; every other option is passed through
+    to asyncpg.create_pool.
+    """
+
+    def __init__(self, database_url, acquire_timeout: float = 10, **options):
+        super().__init__(database_url, **options)
+        self.acquire_timeout = acquire_timeout
+        self.acquire_stats = AcquireStats()
+        self.statement_cache = StatementCache()
+
+    def connection(self) -> InstrumentedPostgresConnection:
+        return InstrumentedPostgresConnection(self, self._dialect)
@@ -0,0 +1,236 @@
+import asyncio
+from typing import List, Optional
+from urllib.parse import urlencode
+
+import aiosqlite
+from databases.backends.sqlite import (
+    CompilationContext,
+    SQLiteBackend,
+    SQLiteConnection,
+    SQLiteTransaction,
+)
+from databases.core import DatabaseURL
+
+from storeapi.db_backends import (
+    AcquireStats,
+    BoundStatement,
+    PreparedStatement,
+    StatementCache,
+)
+
+
+class SQLiteConnectionPool:
+    """Read connections plus one writer connection to a SQLite file.
+
+    SQLite allows a single writer at a time, so writes are serialized on
+    one connection behind a lock instead of failing with "database is
+    locked". With WAL, reads run concurrently on the pooled connections.
+    Every connection gets the configured pragmas when it is opened.
+    """
+
+    def __init__(
+            self, url: DatabaseURL, pragmas: dict, max_size: int, acquire_timeout: float,
+            acquire_stats: AcquireStats, **options
+    ):
+        self._database = url.database
+        if url.options:
+            self._database += "?" + urlencode(url.options)
+        self._pragmas = pragmas
+        self._max_size = max_size
+        self._acquire_timeout = acquire_timeout
+        self._acquire_stats = acquire_stats
+        self._options = options
+        self._idle: List[aiosqlite.Connection] = []
+        self._size = 0
+        self._available: Optional[asyncio.Semaphore] = None
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    async def _open(self) -> aiosqlite.Connection:
+        connection = aiosqlite.connect(database=self._database, isolation_level=None, **self._options)
+        await connection.__aenter__()
+        for name, value in self._pragmas.items():
+            await connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    async def connect(self) -> None:
+        # Created here rather than in __init__ so they bind to the running loop.
+        self._available = asyncio.Semaphore(self._max_size)
+        self._write_lock = asyncio.Lock()
+        self._writer = await self._open()
+
+    async def disconnect(self) -> None:
+        for connection in self._idle:
+            await connection.close()
+        if self._writer is not None:
+            await self._writer.close()
+        self._idle, self._size, self._writer = [], 0, None
+
+    async def acquire(self) -> aiosqlite.Connection:
+        await self._acquire_stats.timed(self._available.acquire(), self._acquire_timeout)
+        if self._idle:
+            return self._idle.pop()
+        try:
+            connection = await self._open()
+        except BaseException:
+            self._available.release()
+            raise
+        self._size += 1
+        return connection
+
+    async def release(self, connection: aiosqlite.Connection) -> None:
+        self._idle.append(connection)
+        self._available.release()
+
+    async def lock_writer(self) -> aiosqlite.Connection:
+        await self._acquire_stats.timed(self._write_lock.acquire(), self._acquire_timeout)
+        return self._writer
+
+    def unlock_writer(self) -> None:
+        self._write_lock.release()
+
+    def get_size(self) -> int:
+        return self._size
+
+    def get_idle_size(self) -> int:
+        return len(self._idle)
+
+    def get_min_size(self) -> int:
+        return 0
+
+    def get_max_size(self) -> int:
+        return self._max_size
+
+
+class PooledSQLiteConnection(SQLiteConnection):
+    """Reads use a pooled connection; writes and transactions borrow the writer."""
+
+    def __init__(self, pool: SQLiteConnectionPool, dialect, statement_cache: StatementCache):
+        super().__init__(pool, dialect)
+        self._statement_cache = statement_cache
+        self._reader: Optional[aiosqlite.Connection] = None
+        self._holds_writer = False
+
+    async def acquire(self) -> None:
+        assert self._connection is None, "Connection is already acquired"
+        self._reader = self._connection = await self._pool.acquire()
+
+    async def release(self) -> None:
+        assert self._connection is not None, "Connection is not acquired"
+        if self._holds_writer:
+            self.end_write()
+        await self._pool.release(self._reader)
+        self._reader = self._connection = None
+
+    async def begin_write(self) -> bool:
+        """Switch to the writer connection; returns False if it is already held."""
+        if self._holds_writer:
+            return False
+        self._connection = await self._pool.lock_writer()
+        self._holds_writer = True
+        return True
+
+    def end_write(self) -> None:
+        self._connection = self._reader
+        self._holds_writer = False
+        self._pool.unlock_writer()
+
+    async def execute(self, query):
+        locked = await self.begin_write()
+        try:
+            return await super().execute(query)
+        finally:
+            if locked:
+                self.end_write()
+
+    async def execute_many(self, queries):
+        locked = await self.begin_write()
+        try:
+            return await super().execute_many(queries)
+        finally:
+            if locked:
+                self.end_write()
+
+    def _compile(self, query):
+        if not isinstance(query, BoundStatement):
+            return super()._compile(query)
+
+        compiled, context = self._statement_cache.get(query.prepared, self._compile_prepared)
+        params = compiled.construct_params(query.values)
+        processors = compiled._bind_processors
+        args = [
+            processors[key](params[key]) if key in processors else params[key] for key in compiled.positiontup
+        ]
+        return compiled.string, args, compiled._result_columns, context
+
+    def _compile_prepared(self, prepared: PreparedStatement) -> tuple:
+        compiled = prepared.statement.compile(dialect=self._dialect, compile_kwargs={"render_postcompile": True})
+        execution_context = self._dialect.execution_ctx_cls()
+        execution_context.dialect = self._dialect
+        execution_context.result_column_struct = (
+            compiled._result_columns,
+            compiled._ordered_columns,
+            compiled._textual_ordered_columns,
+            compiled._ad_hoc_textual,
+            compiled._loose_column_name_matching,
+        )
+        return compiled, CompilationContext(execution_context)
+
+    def transaction(self) -> "PooledSQLiteTransaction":
+        return PooledSQLiteTransaction(self)
+
+
+class PooledSQLiteTransaction(SQLiteTransaction):
+    async def start(self, is_root: bool, extra_options: dict) -> None:
+        # Writes inside the transaction must see its own uncommitted rows,
+        # so the whole root transaction runs on the writer connection.
+        self._owns_writer = is_root and await self._connection.begin_write()
+        try:
+            await super().start(is_root, extra_options)
+        except BaseException:
+            self._end()
+            raise
+
+    async def commit(self) -> None:
+        try:
+            await super().commit()
+        finally:
+            self._end()
+
+    async def rollback(self) -> None:
+        try:
+            await super().rollback()
+        finally:
+            self._end()
+
+    def _end(self) -> None:
+        if self._owns_writer:
+            self._owns_writer = False
+            self._connection.end_write()
+
+
+class PooledSQLiteBackend(SQLiteBackend):
+    """SQLite backend with tuned pragmas, pooled readers and a single writer.
+
+    Compiled prepared statements are cached in statement_cache.
+    """
+
+    def __init__(
+            self, database_url, pragmas: Optional[dict] = None, max_size: int = 5,
+            acquire_timeout: float = 10, **options
+    ):
+        super().__init__(database_url, **options)
+        self.acquire_stats = AcquireStats()
+        self.statement_cache = StatementCache()
+        self._pool = SQLiteConnectionPool(
+            self._database_url, pragmas or {}, max_size, acquire_timeout, self.acquire_stats, **options
+        )
+
+    async def connect(self) -> None:
+        await self._pool.connect()
+
+    async def disconnect(self) -> None:
+        await self._pool.disconnect()
+
+    def connection(self) -> PooledSQLiteConnection:
+        return PooledSQLiteConnection(self._pool, self._dialect, self.statement_cache)
@@ -0,0 +1,304 @@
+"""Pub/sub for real-time post updates.
+
+Write paths publish events to the broker, which hands them to a backend.
+LocalBackend delivers within the process. PostgresBackend goes through
+LISTEN/NOTIFY, so every worker receives every event. Each worker then
+dispatches events to its own subscriptions, one per SSE or WebSocket
+connection.
+"""
+import asyncio
+import importlib
+import itertools
+import json
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Set
+
+from storeapi.config import config
+from storeapi.metrics import (
+    events_disconnects,
+    events_dropped,
+    events_overflowed,
+    events_published,
+    events_subscribers,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = {
+    "local": "storeapi.events:LocalBackend",
+    "postgres": "storeapi.events:PostgresBackend",
+}
+
+# Events of this type for the same post are merged while they wait to be sent.
+LIKED = "post.liked"
+
+
+class SubscriptionOverflow(Exception):
+    pass
+
+
+class Subscription:
+    """Events waiting to be sent to one connection.
+
+    A like event for a post that already has one waiting is merged into
+    it, adding up likes_added, so a viral post produces one update per
+    send instead of one per like. When more than max_pending events are
+    waiting, the connection is too slow to keep up. The subscription is
+    then closed and the client is expected to reconnect and refetch, so
+    it never holds an unbounded backlog.
+    """
+
+    def __init__(self, post_id: Optional[int] = None, max_pending: int = 100):
+        self.post_id = post_id
+        self.max_pending = max_pending
+        self.pending: OrderedDict = OrderedDict()
+        self.overflowed = False
+        self._ready = asyncio.Event()
+        self._sequence = itertools.count()
+
+    def matches(self, event: dict) -> bool:
+        return self.post_id is None or event["post_id"] == self.post_id
+
+    def put(self, event: dict) -> None:
+        if self.overflowed:
+            return
+
+        if event["type"] == LIKED:
+            key = (LIKED, event["post_id"])
+            queued = self.pending.get(key)
+            if queued is not None:
+                queued["data"]["likes_added"] += event["data"]["likes_added"]
+                return
+            event = {**event, "data": {**event["data"]}}
+        else:
+            key = next(self._sequence)
+
+        if len(self.pending) >= self.max_pending:
+            logger.warning("Closing event subscription with %s unsent events", len(self.pending))
+            events_overflowed.inc()
+            self.overflowed = True
+            self.pending.clear()
+        else:
+            self.pending[key] = event
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> List[dict]:
+        """Wait for events and take all of them; an empty list means the timeout passed."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+
+        if self.overflowed:
+            raise SubscriptionOverflow()
+        events = list(self.pending.values())
+        self.pending.clear()
+        return events
+
+
+class LocalBackend:
+    """Delivers events to subscribers in this process only."""
+
+    deliver: Callable[[dict], None]
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, event: dict) -> None:
+        self.deliver(event)
+
+
+class PostgresBackend:
+    """Delivers events to every worker through Postgres LISTEN/NOTIFY.
+
+    Uses a dedicated asyncpg connection outside the pool, since a
+    listening connection must stay checked out. NOTIFY payloads are
+    limited to 8000 bytes, so larger events are dropped with a warning.
+
+    publish only queues the event, so write requests never wait on that
+    one connection. A background task sends whatever has queued up in a
+    single pipelined round-trip. When more than max_queued events are
+    waiting, new ones are dropped and counted in events_dropped_total.
+
+    When the connection is lost, the backend reconnects in the
+    background, waiting retry_seconds after the first failed attempt and
+    doubling up to max_retry_seconds. Events published in the meantime
+    wait in the queue; events notified by other workers are lost, so
+    open subscriptions miss them.
+    """
+
+    max_payload = 7999
+    send_batch_size = 500
+    # How long stop waits for queued events to be sent.
+    drain_timeout = 5
+    deliver: Callable[[dict], None]
+
+    def __init__(
+            self, url: str, channel: str = "storeapi_events", retry_seconds: float = 1, max_retry_seconds: float = 30,
+            max_queued: int = 10000
+    ):
+        self.url = url.replace("postgresql+asyncpg://", "postgresql://")
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.connection = None
+        self._connected = asyncio.Event()
+        self._queue: asyncio.Queue = asyncio.Queue(max_queued)
+        self._sender: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self._connect()
+        self._sender = asyncio.create_task(self._send_queued())
+
+    async def stop(self) -> None:
+        if self._sender is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Dropping %s events not sent to Postgres before stopping", self._queue.qsize())
+                events_dropped.inc(("stopped",), self._queue.qsize())
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+            self._sender = None
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except asyncio.CancelledError:
+                pass
+            self._reconnect_task = None
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            self._connected.clear()
+            connection.remove_termination_listener(self._on_termination)
+            await connection.remove_listener(self.channel, self._on_notify)
+            await connection.close()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(self.url)
+        try:
+            await connection.add_listener(self.channel, self._on_notify)
+        except BaseException:
+            connection.terminate()
+            raise
+        connection.add_termination_listener(self._on_termination)
+        self.connection = connection
+        self._connected.set()
+
+    def _on_termination(self, connection) -> None:
+        if connection is not self.connection:
+            return
+        logger.warning("Lost the Postgres connection listening for events; reconnecting")
+        events_disconnects.inc()
+        self.connection = None
+        self._connected.clear()
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.retry_seconds
+        while True:
+            try:
+                await self._connect()
+            except Exception:
+                logger.exception("Could not reconnect to Postgres for events, retrying in %s s", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_seconds)
+            else:
+                logger.info("Reconnected to Postgres for events")
+                self._reconnect_task = None
+                return
+
+    async def _send_queued(self) -> None:
+        while True:
+            payloads = [await self._queue.get()]
+            while len(payloads) < self.send_batch_size and not self._queue.empty():
+                payloads.append(self._queue.get_nowait())
+            try:
+                await self._connected.wait()
+                await self.connection.executemany(
+                    "SELECT pg_notify($1, $2)", [(self.channel, payload) for payload in payloads]
+                )
+            except Exception:
+                logger.exception("Dropping %s events that could not be sent to Postgres", len(payloads))
+                events_dropped.inc(("send_failed",), len(payloads))
+            finally:
+                for _ in payloads:
+                    self._queue.task_done()
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        self.deliver(json.loads(payload))
+
+    async def publish(self, event: dict) -> None:
+        payload = json.dumps(event)
+        if len(payload.encode()) > self.max_payload:
+            logger.warning("Dropping %s event for post %s: payload too large", event["type"], event["post_id"])
+            events_dropped.inc(("too_large",))
+            return
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning("Dropping %s event for post %s: send queue is full", event["type"], event["post_id"])
+            events_dropped.inc(("queue_full",))
+
+
+def create_backend(name: str):
+    module_name, class_name = BACKENDS.get(name, name).split(":")
+    backend_cls = getattr(importlib.import_module(module_name), class_name)
+    if backend_cls is PostgresBackend:
+        return backend_cls(
+            config.EVENTS_DATABASE_URL or config.DATABASE_URL, config.EVENTS_CHANNEL,
+            config.EVENTS_RECONNECT_SECONDS, config.EVENTS_RECONNECT_MAX_SECONDS, config.EVENTS_MAX_QUEUED,
+        )
+    return backend_cls()
+
+
+class EventBroker:
+    def __init__(self, backend):
+        self.backend = backend
+        self.backend.deliver = self.dispatch
+        self.subscriptions: Set[Subscription] = set()
+
+    async def start(self) -> None:
+        await self.backend.start()
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    async def publish(self, type: str, post_id: int, data: dict) -> None:
+        """Publish an event; failures are logged, never raised to the write path."""
+        events_published.inc((type,))
+        try:
+            await self.backend.publish({"type": type, "post_id": post_id, "data": data})
+        except Exception:
+            logger.exception("Could not publish %s event for post %s", type, post_id)
+
+    def dispatch(self, event: dict) -> None:
+        for subscription in self.subscriptions:
+            if subscription.matches(event):
+                subscription.put(event)
+
+    @contextmanager
+    def subscribe(self, post_id: Optional[int] = None) -> Iterator[Subscription]:
+        subscription = Subscription(post_id, max_pending=config.EVENTS_MAX_PENDING)
+        self.subscriptions.add(subscription)
+        events_subscribers.inc()
+        try:
+            yield subscription
+        finally:
+            self.subscriptions.discard(subscription)
+            events_subscribers.dec()
+
+
+broker = EventBroker(create_backend(config.EVENTS_BACKEND))
@@ -0,0 +1,36 @@
+"""The version behind the ETag of GET /post.
+
+Every write that adds a post or bumps a post's version then calls
+bump_feed_version, so a conditional GET /post reads one row instead of
+aggregating over posts. The bump runs after the write has committed, in
+its own statement, so the row is only locked for that statement rather
+than for the length of every write transaction. A reader may briefly see
+the new posts under the old version, which only costs it one more 200;
+it never sees the new version before the posts it stands for.
+"""
+import logging
+
+import databases
+import sqlalchemy
+
+from storeapi.database import feed_version_table
+from storeapi.db_backends import PreparedStatement
+
+logger = logging.getLogger(__name__)
+
+select_feed_version = PreparedStatement(
+    sqlalchemy.select(feed_version_table.c.version).where(feed_version_table.c.id == 1)
+)
+increment_feed_version = PreparedStatement(
+    feed_version_table.update()
+    .where(feed_version_table.c.id == 1)
+    .values(version=feed_version_table.c.version + 1)
+)
+
+
+async def bump_feed_version(database: databases.Database) -> None:
+    """Bump the feed version after a write; failures are logged, never raised to the write path."""
+    try:
+        await database.execute(increment_feed_version)
+    except Exception:
+        logger.exception("Could not bump the feed version")
@@ -0,0 +1,50 @@
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Turn a comma-separated fields= value into field names in model order.
+
+    Returns None when no fields were asked for. id is always included so
+    clients can still tell the items apart.
+    """
+    if fields is None:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - model.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    requested.add("id")
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+@lru_cache()
+def partial_model(model: Type[BaseModel], fields: Optional[Tuple[str, ...]]) -> Type[BaseModel]:
+    """A copy of model with only the given fields, or model itself for None."""
+    if fields is None:
+        return model
+
+    return create_model(
+        f"{model.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (info.annotation, info) for name, info in model.model_fields.items() if name in fields},
+    )
+
+
+@lru_cache()
+def _adapter(type_) -> TypeAdapter:
+    return TypeAdapter(type_)
+
+
+def json_response(type_, content, headers: Optional[dict] = None) -> Response:
+    """Validate and serialize content as type_, bypassing the route's response_model."""
+    adapter = _adapter(type_)
+    return Response(
+        adapter.dump_json(adapter.validate_python(content)), media_type="application/json", headers=headers
+    )
@@ -0,0 +1,181 @@
+"""Time-decayed "hot" ranking of posts.
+
+A post scores
+
+    log10(max(likes + comment_weight * comments, 1)) + created_at / decay_seconds
+
+as in Reddit's hot ranking: ten times the activity is worth being
+decay_seconds newer, so fresh posts overtake old ones that have stopped
+gaining likes. Unlike a score divided by age, it only changes when the
+post's likes or comments do, so post_scores is maintained incrementally:
+every interval seconds HotScores rescores just the posts whose version
+moved since their score was written, and drops the scores of posts older
+than window_hours. GET /post?sorting=hot reads the top of its score index
+instead of counting likes across all posts.
+"""
+import asyncio
+import datetime
+import logging
+import math
+import time
+from typing import Optional
+
+import databases
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from storeapi.config import config
+from storeapi.database import (
+    comment_table,
+    database,
+    like_table,
+    post_score_table,
+    post_table,
+)
+from storeapi.db_backends import PreparedStatement
+from storeapi.metrics import hot_scores_refresh_seconds, hot_scores_rescored
+
+logger = logging.getLogger(__name__)
+
+# Keeps each INSERT under SQLite's bound parameter limit.
+INSERT_BATCH_SIZE = 1000
+# Held for the length of a refresh so only one Postgres client runs it at a time.
+ADVISORY_LOCK_KEY = 0x686f7473
+
+
+def _count_per_post(table: sqlalchemy.Table, label: str):
+    return (
+        sqlalchemy.select(sqlalchemy.func.count())
+        .where(table.c.post_id == post_table.c.id)
+        .scalar_subquery()
+        .label(label)
+    )
+
+
+# Recent posts liked or commented on since they were scored, and new
+# posts. Each count is a range read on the post_id index of likes or
+# comments.
+select_changed_posts = PreparedStatement(
+    sqlalchemy.select(
+        post_table.c.id,
+        post_table.c.created_at,
+        post_table.c.version,
+        _count_per_post(like_table, "likes"),
+        _count_per_post(comment_table, "comments"),
+    )
+    .select_from(post_table.outerjoin(post_score_table))
+    .where(
+        post_table.c.created_at >= sqlalchemy.bindparam("since"),
+        sqlalchemy.or_(
+            post_score_table.c.version.is_(None), post_score_table.c.version != post_table.c.version
+        ),
+    )
+)
+delete_expired_scores = PreparedStatement(
+    post_score_table.delete().where(post_score_table.c.post_id.in_(
+        sqlalchemy.select(post_table.c.id)
+        .join(post_score_table)
+        .where(post_table.c.created_at < sqlalchemy.bindparam("since"))
+    ))
+)
+try_advisory_lock = PreparedStatement(sqlalchemy.select(sqlalchemy.func.pg_try_advisory_xact_lock(ADVISORY_LOCK_KEY)))
+
+
+def hot_score(
+        likes: int, comments: int, created_at: datetime.datetime, decay_seconds: float, comment_weight: float
+) -> float:
+    # SQLite hands back naive timestamps, which CURRENT_TIMESTAMP writes in UTC.
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+    return math.log10(max(likes + comment_weight * comments, 1)) + created_at.timestamp() / decay_seconds
+
+
+def upsert_scores(dialect: str, rows: list):
+    insert = (postgresql.insert if dialect.startswith("postgres") else sqlite.insert)(post_score_table).values(rows)
+    return insert.on_conflict_do_update(
+        index_elements=["post_id"],
+        set_={name: insert.excluded[name] for name in ("score", "version", "computed_at")},
+    )
+
+
+class HotScores:
+    """Periodically rescores changed posts newer than window_hours into post_scores.
+
+    On Postgres a refresh runs under a transaction-level advisory lock, so
+    when several workers start the job only one of them refreshes at a
+    time and the others skip that round. A refresh that fails is logged
+    and the previous scores stay in place until the next one.
+    """
+
+    def __init__(
+            self, database: databases.Database, interval: float = 60, window_hours: float = 48,
+            decay_seconds: float = 45000, comment_weight: float = 2
+    ):
+        self.database = database
+        self.interval = interval
+        self.window_hours = window_hours
+        self.decay_seconds = decay_seconds
+        self.comment_weight = comment_weight
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Could not refresh hot scores")
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self, now: Optional[datetime.datetime] = None) -> int:
+        """Rescore changed recent posts and drop expired scores; returns the number of posts rescored."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        since = now - datetime.timedelta(hours=self.window_hours)
+        dialect = self.database.url.dialect
+        start = time.perf_counter()
+
+        async with self.database.transaction():
+            if dialect.startswith("postgres") and not await self.database.fetch_val(try_advisory_lock):
+                logger.debug("Another worker is refreshing hot scores")
+                return 0
+
+            await self.database.execute(delete_expired_scores, {"since": since})
+            posts = await self.database.fetch_all(select_changed_posts, {"since": since})
+            scores = [
+                {
+                    "post_id": post.id,
+                    "score": hot_score(
+                        post.likes, post.comments, post.created_at, self.decay_seconds, self.comment_weight
+                    ),
+                    "version": post.version,
+                    "computed_at": now,
+                }
+                for post in posts
+            ]
+            for offset in range(0, len(scores), INSERT_BATCH_SIZE):
+                await self.database.execute(upsert_scores(dialect, scores[offset:offset + INSERT_BATCH_SIZE]))
+
+        hot_scores_rescored.inc(amount=len(scores))
+        hot_scores_refresh_seconds.observe(time.perf_counter() - start)
+        logger.debug("Rescored %s recent posts", len(scores))
+        return len(scores)
+
+
+hot_scores = HotScores(
+    database,
+    interval=config.HOT_SCORES_INTERVAL,
+    window_hours=config.HOT_SCORES_WINDOW_HOURS,
+    decay_seconds=config.HOT_SCORES_DECAY_SECONDS,
+    comment_weight=config.HOT_SCORES_COMMENT_WEIGHT,
+)
@@ -1,15 +1,20 @@
 import logging
 from functools import lru_cache
 
-import b2sdk.v2 as b2
-
 from storeapi.config import config
 
 logger = logging.getLogger(__name__)
 
+# b2_get_upload_url hands out a URL and token that stay valid for a day and
+# accept any file name in the bucket.
+UPLOAD_URL_EXPIRES_SECONDS = 24 * 60 * 60
+
 
 @lru_cache()
 def b2_api():
+    # b2sdk is slow to import and only needed once something is uploaded.
+    import b2sdk.v2 as b2
+
     logger.debug("Creating and authorizing B2 API")
     info = b2.InMemoryAccountInfo()
     api = b2.B2Api(info)
@@ -19,18 +24,57 @@ def b2_api():
 
 
 @lru_cache()
-def b2_get_bucket(api: b2.B2Api):
+def b2_get_bucket(api):
     return api.get_bucket_by_name(config.B2_BUCKET_NAME)
 
 
 def b2_upload_file(local_file: str, file_name: str) -> str:
     api = b2_api()
-    logger.debug(f"Uploading {local_file} to B2 as {file_name}")
+    logger.debug("Uploading %s to B2 as %s", local_file, file_name)
 
     uploaded_file = b2_get_bucket(api).upload_local_file(
         local_file=local_file, file_name=file_name
     )
 
     download_url = api.get_download_url_for_fileid(uploaded_file.id_)
-    logger.debug(f"Uploaded {local_file} to B2 successfully and got download URL: {download_url}")
+    logger.debug("Uploaded %s to B2 successfully and got download URL: %s", local_file, download_url)
+    return download_url
+
+
+def b2_upload_bytes(data: bytes, file_name: str, content_type: str) -> str:
+    api = b2_api()
+    logger.debug("Uploading %s bytes to B2 as %s", len(data), file_name)
+
+    uploaded_file = b2_get_bucket(api).upload_bytes(
+        data_bytes=data, file_name=file_name, content_type=content_type
+    )
+
+    download_url = api.get_download_url_for_fileid(uploaded_file.id_)
+    logger.debug("Uploaded %s to B2 successfully and got download URL: %s", file_name, download_url)
     return download_url
+
+
+def b2_get_upload_authorization() -> dict:
+    api = b2_api()
+    logger.debug("Requesting B2 upload URL for direct upload")
+
+    upload_url = api.session.get_upload_url(b2_get_bucket(api).id_)
+    return {
+        "upload_url": upload_url["uploadUrl"],
+        "authorization_token": upload_url["authorizationToken"],
+        "expires_in": UPLOAD_URL_EXPIRES_SECONDS,
+    }
+
+
+def b2_get_file_url(file_name: str) -> str | None:
+    from b2sdk.v2.exception import FileNotPresent
+
+    api = b2_api()
+
+    try:
+        file_version = b2_get_bucket(api).get_file_info_by_name(file_name)
+    except FileNotPresent:
+        logger.debug("File %s is not present in B2", file_name)
+        return None
+
+    return api.get_download_url_for_fileid(file_version.id_)
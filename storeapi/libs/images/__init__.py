@@ -0,0 +1,102 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from storeapi.config import config
+from storeapi.libs.b2 import b2_upload_bytes
+from storeapi.libs.local_storage import local_upload_bytes
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SIZES = {"thumbnail": 160, "medium": 640}
+VARIANT_FORMATS = {
+    "webp": {"format": "WEBP", "content_type": "image/webp", "quality": 80},
+    "avif": {"format": "AVIF", "content_type": "image/avif", "quality": 60},
+}
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ImageProcessingError(Exception):
+    pass
+
+
+def supported_formats() -> list:
+    from PIL import features
+
+    return [name for name in VARIANT_FORMATS if features.check(name)]
+
+
+def render_variants(source: Union[bytes, str]) -> Dict[Tuple[str, str], bytes]:
+    """Decode an image and encode every size/format variant.
+
+    Runs inside the process pool, so it must stay a picklable module-level
+    function that only returns plain bytes. Pillow is imported here so
+    only the worker processes pay for it.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    if not source:
+        raise ImageProcessingError("Image is empty")
+
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            image.load()
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+        raise ImageProcessingError(f"Could not decode image: {err}") from err
+
+    variants = {}
+    for size_name, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size))
+
+        for format_name in supported_formats():
+            options = VARIANT_FORMATS[format_name]
+            buffer = io.BytesIO()
+            resized.save(buffer, format=options["format"], quality=options["quality"])
+            variants[(size_name, format_name)] = buffer.getvalue()
+
+    return variants
+
+
+def process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+
+    if _process_pool is None:
+        logger.debug("Starting image processing pool")
+        _process_pool = ProcessPoolExecutor(max_workers=config.IMAGE_PROCESS_WORKERS)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+
+    if _process_pool is not None:
+        logger.debug("Shutting down image processing pool")
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+
+
+async def create_image_variants(source: Union[bytes, str], base_name: str) -> Dict[str, str]:
+    """Render the variants of an image and store them in STORAGE_BACKEND, leaving out any that fail to store."""
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(process_pool(), render_variants, source)
+    upload_bytes = local_upload_bytes if config.STORAGE_BACKEND == "local" else b2_upload_bytes
+
+    variant_urls = {}
+    for (size_name, format_name), data in rendered.items():
+        file_name = f"{base_name}/{size_name}.{format_name}"
+        try:
+            variant_urls[f"{size_name}_{format_name}"] = await run_in_threadpool(
+                upload_bytes, data, file_name, VARIANT_FORMATS[format_name]["content_type"]
+            )
+        except Exception:
+            logger.exception("Could not upload image variant %s", file_name)
+
+    logger.debug("Created %s image variants for %s", len(variant_urls), base_name)
+    return variant_urls
@@ -0,0 +1,31 @@
+import logging
+import pathlib
+from urllib.parse import quote
+
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+
+def local_file_path(file_name: str) -> pathlib.Path:
+    """Where file_name is kept under LOCAL_STORAGE_DIR; names that would leave it raise ValueError."""
+    storage_dir = pathlib.Path(config.LOCAL_STORAGE_DIR).resolve()
+    path = (storage_dir / file_name).resolve()
+    if storage_dir not in path.parents:
+        raise ValueError(f"Invalid file name: {file_name}")
+    return path
+
+
+def local_file_url(file_name: str) -> str:
+    # Served by GET /upload/local/{file_name}, on the API's own origin.
+    return f"/upload/local/{quote(file_name)}"
+
+
+def local_upload_bytes(data: bytes, file_name: str, content_type: str) -> str:
+    """Store data like b2_upload_bytes does; files are served without their content type."""
+    path = local_file_path(file_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+    logger.debug("Stored %s bytes locally as %s", len(data), file_name)
+    return local_file_url(file_name)
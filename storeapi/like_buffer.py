@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import List, Optional
+
+import databases
+
+from storeapi.config import config
+from storeapi.database import database, like_table, post_table
+from storeapi.events import LIKED, broker
+from storeapi.feed_version import bump_feed_version
+from storeapi.metrics import (
+    like_buffer_depth,
+    like_buffer_dropped,
+    like_buffer_flush_seconds,
+    like_buffer_flushed,
+)
+from storeapi.user_stats import increment_likes_received
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """Write-behind buffer that inserts likes in batches.
+
+    Likes are appended in memory and flushed when batch_size likes are
+    waiting or every flush_interval seconds, with one multi-row INSERT,
+    one UPDATE bumping the version of every post they touch and one
+    likes_received update per post. The buffer never holds more than
+    max_size likes: a request that finds it full waits for a flush, which
+    pushes back on clients instead of growing without bound. A batch that
+    fails to insert is logged and dropped rather than retried, so one bad
+    row cannot wedge the buffer. stop lets a flush in progress finish
+    rather than cancelling it, so no accepted like is lost on shutdown.
+    """
+
+    def __init__(
+            self, database: databases.Database, batch_size: int = 500, max_size: int = 10000,
+            flush_interval: float = 0.5
+    ):
+        self.database = database
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.pending: List[dict] = []
+        self._batch_ready = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping.set()
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+        await self.drain()
+
+    async def add(self, like: dict) -> None:
+        while len(self.pending) >= self.max_size:
+            await self.flush()
+        self.pending.append(like)
+        like_buffer_depth.set(len(self.pending))
+        if len(self.pending) >= self.batch_size:
+            self._batch_ready.set()
+
+    async def _flush_periodically(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            like_buffer_depth.set(len(self.pending))
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            likes_per_post = Counter(like["post_id"] for like in batch)
+            post_ids = sorted(likes_per_post)
+            try:
+                async with self.database.transaction():
+                    await self.database.execute(like_table.insert().values(batch))
+                    await self.database.execute(
+                        post_table.update()
+                        .where(post_table.c.id.in_(post_ids))
+                        .values(version=post_table.c.version + 1)
+                    )
+                    for post_id, likes in likes_per_post.items():
+                        await self.database.execute(increment_likes_received, {"post_id": post_id, "likes": likes})
+            except Exception:
+                logger.exception("Dropping %s buffered likes that could not be written", len(batch))
+                like_buffer_dropped.inc(amount=len(batch))
+                return 0
+            finally:
+                like_buffer_flush_seconds.observe(time.perf_counter() - start)
+
+            await bump_feed_version(self.database)
+            like_buffer_flushed.inc(amount=len(batch))
+            logger.debug("Flushed %s likes for %s posts", len(batch), len(post_ids))
+            for post_id, likes in likes_per_post.items():
+                await broker.publish(LIKED, post_id, {"likes_added": likes})
+
+        if len(self.pending) >= self.batch_size:
+            self._batch_ready.set()
+        return len(batch)
+
+    async def drain(self) -> None:
+        while self.pending:
+            await self.flush()
+
+
+like_buffer = LikeBuffer(
+    database,
+    batch_size=config.LIKE_BUFFER_BATCH_SIZE,
+    max_size=config.LIKE_BUFFER_MAX_SIZE,
+    flush_interval=config.LIKE_BUFFER_FLUSH_INTERVAL,
+)
@@ -1,7 +1,20 @@
+import datetime
+import json
 import logging
+import queue
+import time
+import zlib
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
 
-from storeapi.config import config, DevelopmentConfig
+from asgi_correlation_id.context import correlation_id
+
+from storeapi.config import DevelopmentConfig, config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 
 def obfuscated(email: str, obfuscated_length: int) -> str:
@@ -16,12 +29,213 @@ class EmailObfuscationFilter(logging.Filter):
         self.obfuscated_length = obfuscated_length
 
     def filter(self, record: logging.LogRecord) -> bool:
-        if "email" in record.__dict__:
+        # Handlers share records, so only obfuscate the first time we see one.
+        if "email" in record.__dict__ and not record.__dict__.get("_email_obfuscated"):
             record.email = obfuscated(record.email, self.obfuscated_length)
+            record._email_obfuscated = True
 
         return True
 
 
+RESERVED_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "correlation_id", "taskName"}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(data: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, default=_json_default)
+
+
+class JsonFormatter(logging.Formatter):
+    """Structured formatter with a fixed field set.
+
+    Produces the same document as the python-json-logger formatter we used
+    before (timestamp, level, correlation id, logger, line, message and any
+    extras) without re-parsing a format string for every record. The
+    timestamp is only rendered once per second and orjson is used when it is
+    installed.
+    """
+
+    def __init__(self, fmt: str | None = None, datefmt: str | None = None, style: str = "%", **kwargs):
+        super().__init__(fmt, datefmt, style, **kwargs)
+        self._cached_time = (None, None)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str | None = None) -> str:
+        second = int(record.created)
+        cached_second, asctime = self._cached_time
+        if second != cached_second:
+            asctime = time.strftime(datefmt or "%Y-%m-%d %H:%M:%S", self.converter(record.created))
+            self._cached_time = (second, asctime)
+        return asctime
+
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            message, message_fields = "", record.msg
+        else:
+            message, message_fields = record.getMessage(), None
+
+        data = {
+            "asctime": self.formatTime(record, self.datefmt),
+            "msecs": record.msecs,
+            "levelname": record.levelname,
+            "correlation_id": record.__dict__.get("correlation_id"),
+            "name": record.name,
+            "lineno": record.lineno,
+            "message": message,
+        }
+        if message_fields:
+            data.update(message_fields)
+
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+
+        return _dumps(data)
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Keep INFO/DEBUG records for a sample of requests, chosen by correlation id.
+
+    Hashing the correlation id means every record of a sampled request is
+    kept and every record of an unsampled one is dropped. Warnings and
+    errors, and records logged outside a request, are always kept.
+    """
+
+    def __init__(self, name: str = "", sample_rate: float = 1.0):
+        super().__init__(name)
+        self.threshold = int(sample_rate * 10000)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.threshold >= 10000:
+            return True
+
+        sampled = record.__dict__.get("_request_sampled")
+        if sampled is None:
+            request_id = correlation_id.get()
+            sampled = request_id is None or zlib.crc32(request_id.encode()) % 10000 < self.threshold
+            record._request_sampled = sampled
+
+        return sampled
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to a bounded queue drained by a QueueListener thread.
+
+    When the queue is full the record is handled according to drop_policy:
+    "block" waits for space, "drop_newest" discards the incoming record and
+    "drop_oldest" evicts the oldest queued record to make room.
+    """
+
+    def __init__(self, queue: queue.Queue, drop_policy: str = "drop_newest"):
+        super().__init__(queue)
+        self.drop_policy = drop_policy
+        self.dropped_records = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.drop_policy == "block":
+            self.queue.put(record)
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                self.dropped_records += 1
+                if self.drop_policy == "drop_newest":
+                    return
+
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+
+
+class BoundedQueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # The stock listener uses put_nowait, which fails on a full queue.
+        self.queue.put(self._sentinel)
+
+
+_queue_handlers: list[BoundedQueueHandler] = []
+_queue_listeners: list[BoundedQueueListener] = []
+_queued_loggers: dict[str, list[logging.Handler]] = {}
+
+
+def dropped_log_records() -> int:
+    return sum(handler.dropped_records for handler in _queue_handlers)
+
+
+def log_queue_depth() -> int:
+    return sum(handler.queue.qsize() for handler in _queue_handlers)
+
+
+def _start_queue_logging(logger_names: list[str]) -> None:
+    # Loggers sharing the same handlers share one queue and listener thread.
+    # Filters move onto the queue handler so they run in the calling thread,
+    # where the correlation id context variable is still set.
+    queue_handlers = {}
+    for name in logger_names:
+        logger = logging.getLogger(name)
+        target_handlers = tuple(logger.handlers)
+
+        if target_handlers not in queue_handlers:
+            queue_handler = BoundedQueueHandler(
+                queue.Queue(maxsize=config.LOG_QUEUE_SIZE), drop_policy=config.LOG_QUEUE_DROP_POLICY
+            )
+            for handler in target_handlers:
+                for log_filter in handler.filters:
+                    if log_filter not in queue_handler.filters:
+                        queue_handler.addFilter(log_filter)
+
+            listener = BoundedQueueListener(queue_handler.queue, *target_handlers, respect_handler_level=True)
+            listener.start()
+
+            queue_handlers[target_handlers] = queue_handler
+            _queue_handlers.append(queue_handler)
+            _queue_listeners.append(listener)
+
+        _queued_loggers[name] = list(target_handlers)
+        logger.handlers = [queue_handlers[target_handlers]]
+
+    for target_handlers in queue_handlers:
+        for handler in target_handlers:
+            handler.filters = []
+
+
+def stop_logging() -> None:
+    """Drain the log queues and point loggers back at their own handlers."""
+    for listener in _queue_listeners:
+        listener.stop()
+
+    for queue_handler, listener in zip(_queue_handlers, _queue_listeners):
+        for handler in listener.handlers:
+            handler.filters = list(queue_handler.filters)
+
+    for name, target_handlers in _queued_loggers.items():
+        logging.getLogger(name).handlers = target_handlers
+
+    _queue_handlers.clear()
+    _queue_listeners.clear()
+    _queued_loggers.clear()
+
+
 handlers = ["default", "rotating_file"]
 
 if config.ENV_STATE == 'prod':
@@ -29,82 +243,89 @@ if config.ENV_STATE == 'prod':
 
 
 def configure_logging() -> None:
-    dictConfig(
-        {
-            "version": 1,
-            "disable_existing_loggers": False,
-            "filters": {
-                "correlation_id": {
-                    "()": "asgi_correlation_id.CorrelationIdFilter",
-                    "uuid_length": 8 if isinstance(config, DevelopmentConfig) else 32,
-                    "default_value": "-",
-                },
-                "email_obfuscation": {
-                    "()": EmailObfuscationFilter,
-                    "obfuscated_length": (
-                        2 if isinstance(config, DevelopmentConfig) else 0
-                    ),
-                },
+    stop_logging()
+
+    logging_config = {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "filters": {
+            "request_sampling": {
+                "()": RequestSamplingFilter,
+                "sample_rate": config.LOG_SAMPLE_RATE,
             },
-            "formatters": {
-                "console": {
-                    "class": "logging.Formatter",
-                    "datefmt": "%Y-%m-%d %H:%M:%S",
-                    "format": "(%(correlation_id)s) %(name)s:%(lineno)d - %(message)s",
-                },
-                "file": {
-                    "class": "pythonjsonlogger.jsonlogger.JsonFormatter",
-                    "datefmt": "%Y-%m-%d %H:%M:%S",
-                    "format": "%(asctime)s %(msecs)03d %(levelname)-8s %(correlation_id)s %(name)s %(lineno)d %(message)s",
-                },
+            "correlation_id": {
+                "()": "asgi_correlation_id.CorrelationIdFilter",
+                "uuid_length": 8 if isinstance(config, DevelopmentConfig) else 32,
+                "default_value": "-",
             },
-            "handlers": {
-                "default": {
-                    "class": "rich.logging.RichHandler",
-                    "level": "DEBUG",
-                    "formatter": "console",
-                    "filters": ["correlation_id", "email_obfuscation"],
-                },
-                "rotating_file": {
-                    "class": "logging.handlers.RotatingFileHandler",
-                    "level": "DEBUG",
-                    "formatter": "file",
-                    "filename": "storeapi.log",
-                    "maxBytes": 1024 * 1024 * 5,  # 5 MB
-                    "backupCount": 2,
-                    "encoding": "utf-8",
-                    "filters": ["correlation_id", "email_obfuscation"],
-                },
-                "logtail": {
-                    "class": "logtail.LogtailHandler",
-                    "level": "DEBUG",
-                    "formatter": "console",
-                    "filters": ["correlation_id", "email_obfuscation"],
-                    "source_token": config.LOGTAIL_API_KEY
-                }
+            "email_obfuscation": {
+                "()": EmailObfuscationFilter,
+                "obfuscated_length": (
+                    2 if isinstance(config, DevelopmentConfig) else 0
+                ),
             },
-            "loggers": {
-                "uvicorn": {
-                    "handlers": ["default", "rotating_file"],
-                    "level": "INFO"
-                },
-                "databases": {
-                    "handlers": ["default", "rotating_file"],
-                    "level": "WARNING",
-                },
-                "aiosqlite": {
-                    "handlers": ["default", "rotating_file"],
-                    "level": "WARNING",
-                },
-                "asyncpg": {
-                    "handlers": ["default", "rotating_file"],
-                    "level": "WARNING",
-                },
-                "storeapi": {
-                    "handlers": handlers,
-                    "level": "DEBUG" if isinstance(config, DevelopmentConfig) else "INFO",
-                    "propagate": False,
-                },
+        },
+        "formatters": {
+            "console": {
+                "class": "logging.Formatter",
+                "datefmt": "%Y-%m-%d %H:%M:%S",
+                "format": "(%(correlation_id)s) %(name)s:%(lineno)d - %(message)s",
             },
-        }
-    )
+            "file": {
+                "()": JsonFormatter,
+                "datefmt": "%Y-%m-%d %H:%M:%S",
+            },
+        },
+        "handlers": {
+            "default": {
+                "class": "rich.logging.RichHandler",
+                "level": "DEBUG",
+                "formatter": "console",
+                "filters": ["request_sampling", "correlation_id", "email_obfuscation"],
+            },
+            "rotating_file": {
+                "class": "logging.handlers.RotatingFileHandler",
+                "level": "DEBUG",
+                "formatter": "file",
+                "filename": config.LOG_FILE,
+                "maxBytes": 1024 * 1024 * 5,  # 5 MB
+                "backupCount": 2,
+                "encoding": "utf-8",
+                "filters": ["request_sampling", "correlation_id", "email_obfuscation"],
+            },
+            "logtail": {
+                "class": "logtail.LogtailHandler",
+                "level": "DEBUG",
+                "formatter": "console",
+                "filters": ["request_sampling", "correlation_id", "email_obfuscation"],
+                "source_token": config.LOGTAIL_API_KEY
+            }
+        },
+        "loggers": {
+            "uvicorn": {
+                "handlers": ["default", "rotating_file"],
+                "level": "INFO"
+            },
+            "databases": {
+                "handlers": ["default", "rotating_file"],
+                "level": "WARNING",
+            },
+            "aiosqlite": {
+                "handlers": ["default", "rotating_file"],
+                "level": "WARNING",
+            },
+            "asyncpg": {
+                "handlers": ["default", "rotating_file"],
+                "level": "WARNING",
+            },
+            "storeapi": {
+                "handlers": handlers,
+                "level": "DEBUG" if isinstance(config, DevelopmentConfig) else "INFO",
+                "propagate": False,
+            },
+        },
+    }
+    dictConfig(logging_config)
+
+    if config.LOG_QUEUE_ENABLED:
+        _start_queue_logging(list(logging_config["loggers"]))
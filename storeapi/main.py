@@ -5,25 +5,35 @@ from http.client import HTTPException
 from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi import FastAPI
 from fastapi.exception_handlers import http_exception_handler
-import sentry_sdk
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
+from storeapi.compression import CompressionMiddleware
 from storeapi.config import config
-from storeapi.database import database
+from storeapi.database import create_schema, database, read_database, warm_up_pool
+from storeapi.db_backends import PoolTimeoutError
+from storeapi.events import broker
+from storeapi.hot_scores import hot_scores
+from storeapi.libs.images import shutdown_process_pool
+from storeapi.like_buffer import like_buffer
+from storeapi.logging_conf import configure_logging, stop_logging
+from storeapi.metrics import MetricsMiddleware
+from storeapi.query_stats import QueryStatsMiddleware
+from storeapi.replicas import ReadRoutingMiddleware
+from storeapi.routers.events import router as events_router
+from storeapi.routers.health import router as health_router
+from storeapi.routers.metrics import router as metrics_router
 from storeapi.routers.post import router as posts_router
-from storeapi.routers.user import router as users_router
+from storeapi.routers.tag import router as tag_router
+from storeapi.routers.timeline import router as timeline_router
 from storeapi.routers.upload import router as upload_router
-from storeapi.logging_conf import configure_logging
-
-sentry_sdk.init(
-    dsn=config.SENTRY_DSN,
-    # Set traces_sample_rate to 1.0 to capture 100%
-    # of transactions for performance monitoring.
-    traces_sample_rate=1.0,
-    # Set profiles_sample_rate to 1.0 to profile 100%
-    # of sampled transactions.
-    # We recommend adjusting this value in production.
-    profiles_sample_rate=1.0,
-)
+from storeapi.routers.user import router as users_router
+from storeapi.tracing import TracesSamplerMiddleware, init_sentry
+
+if config.SENTRY_DSN:
+    # Must run before the app and its routes are created so the FastAPI
+    # integration can wrap them.
+    init_sentry()
 
 logger = logging.getLogger(__name__)
 
@@ -31,25 +41,65 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     configure_logging()
+    if config.DB_CREATE_SCHEMA:
+        await run_in_threadpool(create_schema)
     await database.connect()
+    await warm_up_pool()
+    await read_database.connect()
+    await broker.start()
+    if config.LIKE_BUFFER_ENABLED:
+        await like_buffer.start()
+    if config.HOT_SCORES_ENABLED:
+        await hot_scores.start()
     yield
+    await hot_scores.stop()
+    # Flushes any buffered likes, so it must run before disconnecting.
+    await like_buffer.stop()
+    await broker.stop()
+    await read_database.disconnect()
     await database.disconnect()
+    shutdown_process_pool()
+    stop_logging()
 
 
 app = FastAPI(lifespan=lifespan)
 
+if config.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+        levels=config.COMPRESSION_LEVELS,
+        route_levels=config.COMPRESSION_ROUTE_LEVELS,
+    )
+app.add_middleware(ReadRoutingMiddleware, router=read_database)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(CorrelationIdMiddleware)
+if config.SENTRY_DSN:
+    app.add_middleware(TracesSamplerMiddleware)
 app.include_router(posts_router)
+app.include_router(timeline_router)
+app.include_router(tag_router)
 app.include_router(users_router)
 app.include_router(upload_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+app.include_router(events_router)
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler_logging(request, exc):
-    logger.error(f"HTTPException: {exc.status_code} {exc.detail}")
+    logger.error("HTTPException: %s %s", exc.status_code, exc.detail)
     return http_exception_handler(request, exc)
 
 
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request, exc):
+    return JSONResponse(
+        status_code=503, content={"detail": "Database is busy, try again later"}, headers={"Retry-After": "1"}
+    )
+
+
 @app.get("/sentry-debug")
 async def trigger_error():
     division_by_zero = 1 / 0
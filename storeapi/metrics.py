@@ -0,0 +1,254 @@
+import bisect
+import functools
+import logging
+import time
+from typing import Callable, Optional
+
+from storeapi.database import acquire_stats, pool_stats
+from storeapi.logging_conf import dropped_log_records, log_queue_depth
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, labels: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base for in-process metrics rendered in the Prometheus text format.
+
+    Updates happen on the event loop without locks: each sample is a plain
+    dict entry keyed by the label values tuple.
+    """
+
+    type = "untyped"
+
+    def __init__(
+            self, name: str, documentation: str, labelnames: tuple = (),
+            function: Optional[Callable[[], Optional[float]]] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict = {}
+        # Reads an unlabelled value kept elsewhere each time the metric is rendered.
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            value = self.function()
+            if value is not None:
+                self.values[()] = value
+        for labels, value in self.values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {value}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, value: float, labels: tuple = ()) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        # Only the matching bucket is incremented; cumulative counts are
+        # computed when rendering.
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket", _format_labels(self.labelnames, labels, f'le="{bound}"'), cumulative
+                )
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Total HTTP requests.", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency in seconds.", ("method", "route")
+))
+http_response_size_bytes = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size in bytes.", ("method", "route"), buckets=SIZE_BUCKETS
+))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served."
+))
+background_tasks_in_progress = registry.register(Gauge(
+    "background_tasks_in_progress", "Background tasks currently running.", ("task",)
+))
+coalesced_requests_total = registry.register(Counter(
+    "coalesced_requests_total", "Coalesced reads by whether they ran the query or shared it.", ("key", "role")
+))
+coalesced_waiters = registry.register(Gauge(
+    "coalesced_waiters", "Reads currently waiting on another request's query.", ("key",)
+))
+coalesced_waiters_per_flight = registry.register(Histogram(
+    "coalesced_waiters_per_flight", "Reads that shared each query's result.", ("key",), buckets=COUNT_BUCKETS
+))
+like_buffer_depth = registry.register(Gauge(
+    "like_buffer_depth", "Likes waiting in the write-behind buffer."
+))
+like_buffer_flushed = registry.register(Counter(
+    "like_buffer_flushed_total", "Buffered likes written to the database."
+))
+like_buffer_dropped = registry.register(Counter(
+    "like_buffer_dropped_total", "Buffered likes dropped because their batch failed to write."
+))
+like_buffer_flush_seconds = registry.register(Histogram(
+    "like_buffer_flush_seconds", "Time taken to write one batch of buffered likes."
+))
+hot_scores_rescored = registry.register(Counter(
+    "hot_scores_rescored_total", "Posts rescored for the hot ranking after new likes or comments."
+))
+hot_scores_refresh_seconds = registry.register(Histogram(
+    "hot_scores_refresh_seconds", "Time taken to rescore changed posts for the hot ranking."
+))
+events_published = registry.register(Counter(
+    "events_published_total", "Real-time events published.", ("type",)
+))
+events_subscribers = registry.register(Gauge(
+    "events_subscribers", "Open SSE and WebSocket event subscriptions."
+))
+events_overflowed = registry.register(Counter(
+    "events_overflowed_total", "Event subscriptions closed because the client could not keep up."
+))
+events_disconnects = registry.register(Counter(
+    "events_disconnects_total", "Times the connection listening for events was lost."
+))
+events_dropped = registry.register(Counter(
+    "events_dropped_total", "Real-time events dropped before reaching Postgres.", ("reason",)
+))
+registry.register(Gauge(
+    "db_pool_size", "Connections open in the database pool.", function=lambda: pool_stats().get("size")
+))
+registry.register(Gauge(
+    "db_pool_idle", "Idle connections in the database pool.", function=lambda: pool_stats().get("idle")
+))
+registry.register(Gauge(
+    "db_pool_max_size", "Maximum size of the database pool.", function=lambda: pool_stats().get("max_size")
+))
+registry.register(Gauge(
+    "db_pool_acquire_waiting", "Requests waiting for a pooled database connection.",
+    function=lambda: acquire_stats().get("waiting")
+))
+registry.register(Counter(
+    "db_pool_acquire_timeouts_total", "Connection acquires that hit the pool timeout.",
+    function=lambda: acquire_stats().get("timeouts")
+))
+registry.register(Gauge(
+    "db_pool_acquire_max_wait_seconds", "Longest wait for a pooled database connection.",
+    function=lambda: acquire_stats().get("max_wait_ms", 0) / 1000 or None
+))
+registry.register(Gauge(
+    "log_queue_depth", "Log records waiting for the queue listener.", function=log_queue_depth
+))
+registry.register(Counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full.", function=dropped_log_records
+))
+
+
+def track_in_progress(task_name: str):
+    """Count running invocations of an async background task."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            background_tasks_in_progress.inc((task_name,))
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                background_tasks_in_progress.dec((task_name,))
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        response_size = 0
+        start = time.perf_counter()
+        http_requests_in_progress.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec()
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "<unmatched>"))
+
+            http_requests_total.inc(labels + (str(status_code),))
+            http_request_duration_seconds.observe(time.perf_counter() - start, labels)
+            http_response_size_bytes.observe(response_size, labels)
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -13,6 +13,7 @@ class UserPost(UserPostIn):
     id: int
     user_id: int
     image_url: Optional[str] = None
+    image_variants: Optional[Dict[str, str]] = None
 
 
 class UserPostWithLikes(UserPost):
@@ -21,6 +22,11 @@ class UserPostWithLikes(UserPost):
     likes: int
 
 
+class PostPage(BaseModel):
+    posts: List[UserPostWithLikes]
+    next_before: Optional[int] = None
+
+
 class CommentIn(BaseModel):
     body: str
     post_id: int
@@ -47,3 +53,7 @@ class PostLike(PostLikeIn):
 
     id: int
     user_id: int
+
+
+class PostLikeQueued(PostLikeIn):
+    user_id: int
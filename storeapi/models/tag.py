@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class TrendingTag(BaseModel):
+    name: str
+    posts: int
@@ -0,0 +1,30 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class UploadAuthorizationIn(BaseModel):
+    file_name: str
+    content_type: Optional[str] = None
+
+
+class UploadAuthorization(BaseModel):
+    file_name: str
+    upload_url: str
+    method: str
+    headers: Dict[str, str]
+    token: str
+    # Seconds the upload URL can be used for, and the token for /upload/complete.
+    expires_in: int
+    token_expires_in: int
+
+
+class UploadCompleteIn(BaseModel):
+    token: str
+    post_id: Optional[int] = None
+
+
+class UploadComplete(BaseModel):
+    file_name: str
+    file_url: str
+    post_id: Optional[int] = None
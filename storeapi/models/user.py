@@ -1,4 +1,4 @@
-from pydantic .main import BaseModel
+from pydantic.main import BaseModel
 
 
 class User(BaseModel):
@@ -8,3 +8,11 @@ class User(BaseModel):
 
 class UserIn(User):
     password: str
+
+
+class UserProfile(BaseModel):
+    id: int
+    follower_count: int
+    post_count: int
+    comment_count: int
+    likes_received: int
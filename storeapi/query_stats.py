@@ -0,0 +1,133 @@
+import contextlib
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+import databases
+from sqlalchemy.sql import ClauseElement
+
+from storeapi.config import config
+from storeapi.db_backends import BoundStatement
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Queries run while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _statement_key(query) -> object:
+    if isinstance(query, BoundStatement):
+        return query.prepared
+    # The SQLAlchemy cache key identifies the statement shape without its
+    # bound values and is much cheaper to build than compiling the SQL.
+    if isinstance(query, ClauseElement):
+        cache_key = query._generate_cache_key()
+        return cache_key.key if cache_key is not None else str(query)
+    return query
+
+
+def _statement_params(query, values: Optional[dict]) -> dict:
+    if values is not None:
+        params = values
+    elif isinstance(query, BoundStatement):
+        params = query.values
+    elif isinstance(query, ClauseElement):
+        params = query.compile().params
+    else:
+        params = {}
+    return {key: "***" if "password" in key else value for key, value in params.items()}
+
+
+class InstrumentedDatabase(databases.Database):
+    """Database that records query count and time for the current request.
+
+    Queries slower than DB_SLOW_QUERY_MS are logged with their parameters,
+    and a statement repeated DB_REPEATED_QUERY_THRESHOLD times within one
+    request is flagged as a likely N+1.
+    """
+
+    @contextlib.contextmanager
+    def _instrument(self, query, values: Optional[dict] = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+
+            if duration * 1000 >= config.DB_SLOW_QUERY_MS:
+                logger.warning(
+                    "Slow query took %.1f ms: %s params=%s",
+                    duration * 1000, query, _statement_params(query, values)
+                )
+
+            stats = query_stats.get()
+            if stats is not None:
+                stats.count += 1
+                stats.duration += duration
+
+                key = _statement_key(query)
+                stats.statements[key] += 1
+                if stats.statements[key] == config.DB_REPEATED_QUERY_THRESHOLD:
+                    logger.warning(
+                        "Statement ran %s times in one request, possible N+1 query: %s",
+                        config.DB_REPEATED_QUERY_THRESHOLD, query
+                    )
+
+    async def fetch_all(self, query, values: Optional[dict] = None):
+        with self._instrument(query, values):
+            return await super().fetch_all(query, values)
+
+    async def fetch_one(self, query, values: Optional[dict] = None):
+        with self._instrument(query, values):
+            return await super().fetch_one(query, values)
+
+    async def fetch_val(self, query, values: Optional[dict] = None, column=0):
+        with self._instrument(query, values):
+            return await super().fetch_val(query, values, column=column)
+
+    async def execute(self, query, values: Optional[dict] = None):
+        with self._instrument(query, values):
+            return await super().execute(query, values)
+
+    async def execute_many(self, query, values: list):
+        with self._instrument(query):
+            return await super().execute_many(query, values)
+
+
+class QueryStatsMiddleware:
+    """Tracks queries per request and reports them in a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                server_timing = f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.reset(token)
+            logger.debug("Request ran %s queries in %.1f ms", stats.count, stats.duration * 1000)
@@ -0,0 +1,197 @@
+import hashlib
+import itertools
+import logging
+import math
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import databases
+from starlette.requests import cookie_parser
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Set on write responses, so a client's next reads stay on the primary
+# even when nothing else identifies it, e.g. behind a shared address.
+WROTE_COOKIE = "storeapi_wrote"
+
+use_primary: ContextVar[bool] = ContextVar("use_primary", default=False)
+
+
+class Replica:
+    def __init__(self, database: databases.Database):
+        self.database = database
+        self.unhealthy_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.database.is_connected and time.monotonic() >= self.unhealthy_until
+
+
+# The replica ReadRoutingMiddleware chose for the current request. All of
+# the request's reads go to it, so a later read never sees an older point
+# in replication than an earlier one, e.g. a body older than its ETag.
+request_replica: ContextVar[Optional[Replica]] = ContextVar("request_replica", default=None)
+
+
+class ReadRouter:
+    """Send read-only queries to replicas and fall back to the primary.
+
+    Each request reads from one replica, picked round-robin among the
+    healthy ones, unless use_primary is set for it. A replica whose
+    connection or query fails is skipped for retry_seconds, and the read
+    and the rest of the request go to the primary. After that it is
+    reconnected before it is used again.
+    Clients that wrote recently are kept on the primary for sticky_seconds
+    by ReadRoutingMiddleware, so they read their own writes; it knows them
+    by bearer token or address, and by a cookie it sets on the write.
+    """
+
+    def __init__(
+            self, primary: databases.Database, replicas: List[databases.Database],
+            sticky_seconds: float = 5, retry_seconds: float = 30
+    ):
+        self.primary = primary
+        self.replicas = [Replica(replica) for replica in replicas]
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self.recent_writers: Dict[str, float] = {}
+        self._next = itertools.count()
+
+    async def connect(self) -> None:
+        for replica in self.replicas:
+            try:
+                await replica.database.connect()
+            except Exception as err:
+                logger.error("Could not connect to read replica %s: %s", replica.database.url.obscure_password, err)
+                replica.unhealthy_until = time.monotonic() + self.retry_seconds
+
+    async def disconnect(self) -> None:
+        for replica in self.replicas:
+            await replica.database.disconnect()
+
+    def status(self) -> list:
+        return [
+            {"url": replica.database.url.obscure_password, "healthy": replica.healthy}
+            for replica in self.replicas
+        ]
+
+    def mark_write(self, client_key: str) -> None:
+        now = time.monotonic()
+        if len(self.recent_writers) > 1000:
+            self.recent_writers = {
+                key: written for key, written in self.recent_writers.items() if now - written < self.sticky_seconds
+            }
+        self.recent_writers[client_key] = now
+
+    def wrote_recently(self, client_key: str) -> bool:
+        written = self.recent_writers.get(client_key)
+        return written is not None and time.monotonic() - written < self.sticky_seconds
+
+    async def _available(self, replica: Replica) -> bool:
+        if replica.database.is_connected and not replica.unhealthy_until:
+            return True
+        if time.monotonic() < replica.unhealthy_until:
+            return False
+
+        # Skipped while reconnecting, so concurrent requests make one attempt.
+        url = replica.database.url.obscure_password
+        replica.unhealthy_until = time.monotonic() + self.retry_seconds
+        try:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+            await replica.database.connect()
+        except Exception as err:
+            logger.error("Could not reconnect to read replica %s: %s", url, err)
+            return False
+        logger.info("Reconnected to read replica %s", url)
+        replica.unhealthy_until = 0.0
+        return True
+
+    async def _pick_replica(self) -> Optional[Replica]:
+        if use_primary.get() or not self.replicas:
+            return None
+
+        replica = request_replica.get()
+        if replica is not None:
+            return replica if replica.healthy else None
+
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if await self._available(replica):
+                return replica
+        return None
+
+    async def _read(self, method: str, *args, **kwargs):
+        replica = await self._pick_replica()
+        if replica is not None:
+            try:
+                return await getattr(replica.database, method)(*args, **kwargs)
+            except Exception as err:
+                logger.warning(
+                    "Read replica %s failed, using the primary: %s", replica.database.url.obscure_password, err
+                )
+                replica.unhealthy_until = time.monotonic() + self.retry_seconds
+
+        return await getattr(self.primary, method)(*args, **kwargs)
+
+    async def fetch_all(self, query, values: Optional[dict] = None):
+        return await self._read("fetch_all", query, values)
+
+    async def fetch_one(self, query, values: Optional[dict] = None):
+        return await self._read("fetch_one", query, values)
+
+    async def fetch_val(self, query, values: Optional[dict] = None, column=0):
+        return await self._read("fetch_val", query, values, column=column)
+
+
+def _cookies(scope) -> dict:
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            return cookie_parser(value.decode("latin-1"))
+    return {}
+
+
+def client_key(scope) -> str:
+    """Identify the client by its bearer token, or by its address when anonymous."""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            return hashlib.sha256(value).hexdigest()
+
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class ReadRoutingMiddleware:
+    """Keeps writes and a client's reads after writes on the primary."""
+
+    def __init__(self, app, router: ReadRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.router.replicas:
+            return await self.app(scope, receive, send)
+
+        key = client_key(scope)
+        is_write = scope["method"] not in SAFE_METHODS
+        primary = is_write or self.router.wrote_recently(key) or WROTE_COOKIE in _cookies(scope)
+        replica = None if primary else await self.router._pick_replica()
+        token = use_primary.set(replica is None)
+        replica_token = request_replica.set(replica)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                cookie = f"{WROTE_COOKIE}=1; Max-Age={math.ceil(self.router.sticky_seconds)}; Path=/; HttpOnly"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper if is_write else send)
+        finally:
+            request_replica.reset(replica_token)
+            use_primary.reset(token)
+            if is_write:
+                self.router.mark_write(key)
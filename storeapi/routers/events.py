@@ -0,0 +1,74 @@
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from storeapi.config import config
+from storeapi.events import Subscription, SubscriptionOverflow, broker
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def sse_events(subscription: Subscription, heartbeat: float) -> AsyncIterator[str]:
+    # Sent straight away so headers reach the client before the first event.
+    yield ": connected\n\n"
+    while True:
+        try:
+            events = await subscription.get(heartbeat)
+        except SubscriptionOverflow:
+            yield "event: overflow\ndata: {}\n\n"
+            return
+        if not events:
+            yield ": ping\n\n"
+        for event in events:
+            yield format_sse(event)
+
+
+@router.get("/events")
+async def stream_events(post_id: Optional[int] = None):
+    """Server-Sent Events for new posts, comments, likes and post updates.
+
+    Pass post_id to only receive events for one post. An overflow event
+    means the connection fell behind; reconnect and refetch.
+    """
+    logger.info("Opening event stream")
+
+    async def stream():
+        with broker.subscribe(post_id) as subscription:
+            async for chunk in sse_events(subscription, config.EVENTS_HEARTBEAT_SECONDS):
+                yield chunk
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket, post_id: Optional[int] = None):
+    """The same events as /events, one JSON message each."""
+    await websocket.accept()
+    logger.info("Opening event websocket")
+
+    with broker.subscribe(post_id) as subscription:
+        try:
+            while True:
+                try:
+                    events = await subscription.get(config.EVENTS_HEARTBEAT_SECONDS)
+                except SubscriptionOverflow:
+                    # 1013: try again later.
+                    await websocket.close(code=1013)
+                    return
+                if not events:
+                    await websocket.send_json({"type": "ping"})
+                for event in events:
+                    await websocket.send_json(event)
+        except WebSocketDisconnect:
+            logger.debug("Event websocket disconnected")
@@ -0,0 +1,37 @@
+import logging
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from storeapi.database import acquire_stats, database, pool_stats, read_database
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/health/db")
+async def database_health():
+    start = time.perf_counter()
+    try:
+        await database.fetch_val("SELECT 1")
+    except Exception:
+        # The error can name hosts and users, and this endpoint is public.
+        logger.exception("Database health check failed")
+        return JSONResponse(status_code=503, content={"status": "unavailable", "error": "database unavailable"})
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    pool = pool_stats()
+    if pool:
+        pool["in_use"] = pool["size"] - pool["idle"]
+        pool["utilization"] = pool["in_use"] / pool["max_size"]
+
+    return {
+        "status": "ok",
+        "backend": database.url.dialect,
+        "latency_ms": latency_ms,
+        "pool": pool,
+        "acquire": acquire_stats(),
+        "replicas": read_database.status(),
+    }
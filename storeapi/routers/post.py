@@ -1,29 +1,65 @@
 import logging
 from enum import Enum
-from typing import List, Annotated
+from functools import lru_cache
+from typing import Annotated, List, Optional, Tuple
 
 import sqlalchemy
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
-
-from storeapi.database import post_table, comment_table, like_table, database
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+)
+from fastapi.responses import JSONResponse
+from pydantic import create_model
+
+from storeapi.caching import cache_headers, etag_matches, make_etag, not_modified
+from storeapi.config import config
+from storeapi.database import (
+    comment_table,
+    database,
+    like_table,
+    post_score_table,
+    post_table,
+    read_database,
+)
+from storeapi.db_backends import PreparedStatement
+from storeapi.events import LIKED, broker
+from storeapi.feed_version import bump_feed_version, select_feed_version
+from storeapi.fieldsets import json_response, parse_fields, partial_model
+from storeapi.like_buffer import like_buffer
 from storeapi.models.post import (
-    UserPost,
-    UserPostIn,
     Comment,
     CommentIn,
-    UserPostWithComments,
-    PostLikeIn,
     PostLike,
-    UserPostWithLikes
+    PostLikeIn,
+    PostLikeQueued,
+    UserPost,
+    UserPostIn,
+    UserPostWithComments,
+    UserPostWithLikes,
 )
 from storeapi.models.user import User
+from storeapi.replicas import request_replica, use_primary
 from storeapi.security import get_current_user
+from storeapi.singleflight import SingleFlight
+from storeapi.tags import extract_tags, tag_post
 from storeapi.tasks import generate_and_add_to_post
+from storeapi.timelines import fan_out_post
+from storeapi.user_stats import (
+    increment_comment_count,
+    increment_likes_received,
+    increment_post_count,
+)
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+read_coalescer = SingleFlight()
+
 select_post_and_likes = (
     sqlalchemy.select(post_table, sqlalchemy.func.count(like_table.c.post_id).label('likes'))
     .select_from(post_table.outerjoin(like_table))
@@ -35,15 +71,135 @@ class PostSorting(str, Enum):
     new = "new"
     old = "old"
     most_likes = "most_likes"
+    hot = "hot"
+
+
+# The top of the score index; hot_scores keeps it current.
+hot_posts = (
+    sqlalchemy.select(post_score_table.c.post_id, post_score_table.c.score)
+    .order_by(post_score_table.c.score.desc(), post_score_table.c.post_id.desc())
+    .limit(config.HOT_POSTS_LIMIT)
+    .subquery("hot_posts")
+)
+
+
+def select_hot_posts(fields: Optional[Tuple[str, ...]] = None):
+    """The hot posts, counting likes for only those posts."""
+    columns = [post_table] if fields is None else [post_table.c[name] for name in fields if name in post_table.c]
+    if fields is None or "likes" in fields:
+        columns.append(
+            sqlalchemy.select(sqlalchemy.func.count())
+            .where(like_table.c.post_id == post_table.c.id)
+            .scalar_subquery()
+            .label("likes")
+        )
+    return (
+        sqlalchemy.select(*columns)
+        .select_from(hot_posts.join(post_table, hot_posts.c.post_id == post_table.c.id))
+        .order_by(hot_posts.c.score.desc(), post_table.c.id.desc())
+    )
+
+
+# Built once so their SQL is compiled once per dialect, see PreparedStatement.
+select_post_by_id = PreparedStatement(
+    post_table.select().where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+)
+select_posts_sorted = {
+    PostSorting.new: PreparedStatement(select_post_and_likes.order_by(post_table.c.id.desc())),
+    PostSorting.old: PreparedStatement(select_post_and_likes.order_by(post_table.c.id.asc())),
+    PostSorting.most_likes: PreparedStatement(select_post_and_likes.order_by(sqlalchemy.desc("likes"))),
+    PostSorting.hot: PreparedStatement(select_hot_posts()),
+}
+select_post_and_likes_by_id = PreparedStatement(
+    select_post_and_likes.where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+)
+select_comments_by_post = PreparedStatement(
+    comment_table.select().where(comment_table.c.post_id == sqlalchemy.bindparam("post_id"))
+)
+select_post_version = PreparedStatement(
+    sqlalchemy.select(post_table.c.version).where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+)
+bump_post_version = PreparedStatement(
+    post_table.update()
+    .where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+    .values(version=post_table.c.version + 1)
+)
+# Changes whenever hot_scores rescores a post.
+select_hot_version = PreparedStatement(sqlalchemy.select(sqlalchemy.func.max(post_score_table.c.computed_at)))
+
+
+likes_count = sqlalchemy.func.count(like_table.c.post_id).label("likes")
+post_order = {
+    PostSorting.new: post_table.c.id.desc(),
+    PostSorting.old: post_table.c.id.asc(),
+    PostSorting.most_likes: likes_count.desc(),
+}
+
+
+def select_post_fields(fields: Tuple[str, ...], count_likes: bool = False):
+    """Select only the requested post columns, joining likes only when needed."""
+    query = sqlalchemy.select(*(post_table.c[name] for name in fields if name in post_table.c))
+    if "likes" not in fields and not count_likes:
+        return query
+    if "likes" in fields:
+        query = query.add_columns(likes_count)
+    return query.select_from(post_table.outerjoin(like_table)).group_by(post_table.c.id)
+
+
+# There are few enough field combinations to keep a statement for each.
+@lru_cache(maxsize=256)
+def select_posts_sorted_fields(sorting: PostSorting, fields: Tuple[str, ...]) -> PreparedStatement:
+    if sorting == PostSorting.hot:
+        return PreparedStatement(select_hot_posts(fields))
+    query = select_post_fields(fields, count_likes=sorting == PostSorting.most_likes)
+    return PreparedStatement(query.order_by(post_order[sorting]))
+
+
+@lru_cache(maxsize=256)
+def select_post_fields_by_id(fields: Tuple[str, ...]) -> PreparedStatement:
+    return PreparedStatement(select_post_fields(fields).where(post_table.c.id == sqlalchemy.bindparam("post_id")))
+
+
+@lru_cache(maxsize=256)
+def select_comment_fields_by_post(fields: Tuple[str, ...]) -> PreparedStatement:
+    return PreparedStatement(
+        sqlalchemy.select(*(comment_table.c[name] for name in fields))
+        .where(comment_table.c.post_id == sqlalchemy.bindparam("post_id"))
+    )
+
+
+@lru_cache(maxsize=256)
+def partial_post_with_comments(post_fields: Optional[Tuple[str, ...]], comment_fields: Optional[Tuple[str, ...]]):
+    return create_model(
+        "UserPostWithCommentsFields",
+        post=(partial_model(UserPostWithLikes, post_fields), ...),
+        comments=(List[partial_model(Comment, comment_fields)], ...),
+    )
+
+
+async def coalesced_read(name: str, method: str, query, values: Optional[dict] = None, version=None):
+    """Run a read on read_database, sharing it with identical reads already in flight.
+
+    Reads only share with reads on the same replica, and requests pinned
+    to the primary only share with each other, so they still read their
+    own writes. A read made for an ETag's version only shares with reads
+    made for that same version, so it never joins a flight that started
+    before the write the version stands for.
+    """
+    if not config.READ_COALESCING_ENABLED:
+        return await getattr(read_database, method)(query, values)
+
+    key = (method, query, tuple(sorted((values or {}).items())), use_primary.get(), request_replica.get(), version)
+    return await read_coalescer.do(name, key, lambda: getattr(read_database, method)(query, values))
 
 
 async def find_post(post_id: int):
-    logger.info(f"Finding post with id: {post_id}")
+    logger.info("Finding post with id: %s", post_id)
 
-    query = post_table.select().where(post_table.c.id == post_id)
+    query = select_post_by_id
     logger.debug(query)
 
-    return await database.fetch_one(query)
+    return await database.fetch_one(query, {"post_id": post_id})
 
 
 @router.post("/post", response_model=UserPost, status_code=201)
@@ -57,8 +213,14 @@ async def create_post(
     query = post_table.insert().values(data)
     logger.debug(query)
 
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await database.execute(increment_post_count, {"user_id": current_user.id})
+        await tag_post(last_record_id, extract_tags(post.body))
+        await fan_out_post(current_user.id, last_record_id)
+    await bump_feed_version(database)
     logger.debug(last_record_id)
+    await broker.publish("post.created", last_record_id, {**data, "id": last_record_id})
 
     if prompt:
         background_tasks.add_task(
@@ -74,18 +236,35 @@ async def create_post(
 
 
 @router.get("/post", response_model=List[UserPostWithLikes])
-async def get_all_posts(sorting: PostSorting = PostSorting.new):
+async def get_all_posts(
+        request: Request, response: Response, sorting: PostSorting = PostSorting.new, fields: Optional[str] = None
+):
     logger.info("Getting all posts")
 
-    if sorting == PostSorting.new:
-        query = select_post_and_likes.order_by(post_table.c.id.desc())
-    elif sorting == PostSorting.old:
-        query = select_post_and_likes.order_by(post_table.c.id.asc())
-    elif sorting == PostSorting.most_likes:
-        query = select_post_and_likes.order_by(sqlalchemy.desc("likes"))
+    post_fields = parse_fields(fields, UserPostWithLikes)
+
+    feed_version = (await coalesced_read("feed_version", "fetch_val", select_feed_version),)
+    if sorting == PostSorting.hot:
+        # Scores are written by hot_scores after the posts change, so they need their own version.
+        feed_version += (await coalesced_read("hot_version", "fetch_val", select_hot_version),)
+    headers = cache_headers(
+        make_etag("feed", sorting.value, *feed_version, *(post_fields or ())),
+        config.FEED_CACHE_CONTROL, ["posts"], config.SURROGATE_CONTROL
+    )
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+
+    if post_fields is None:
+        query = select_posts_sorted[sorting]
+        logger.debug(query)
+        return await coalesced_read("feed", "fetch_all", query, version=feed_version)
+
+    query = select_posts_sorted_fields(sorting, post_fields)
     logger.debug(query)
 
-    return await database.fetch_all(query)
+    posts = await coalesced_read("feed", "fetch_all", query, version=feed_version)
+    return json_response(List[partial_model(UserPostWithLikes, post_fields)], posts, headers)
 
 
 @router.post("/comment", response_model=Comment, status_code=201)
@@ -101,44 +280,86 @@ async def create_comment(comment: CommentIn, current_user: Annotated[User, Depen
     query = comment_table.insert().values(data)
     logger.debug(query, extra={"email": "erturk@example.com"})
 
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await database.execute(bump_post_version, {"post_id": comment.post_id})
+        await database.execute(increment_comment_count, {"user_id": current_user.id})
+    await bump_feed_version(database)
     logger.debug(last_record_id)
 
+    await broker.publish("comment.created", comment.post_id, {**data, "id": last_record_id})
     return {**data, "id": last_record_id}
 
 
 @router.get("/post/{post_id}/comment", response_model=List[Comment])
-async def get_comments_on_post(post_id: int):
+async def get_comments_on_post(post_id: int, fields: Optional[str] = None):
     logger.info("Getting comments on post")
 
-    query = comment_table.select().where(comment_table.c.post_id == post_id)
+    comment_fields = parse_fields(fields, Comment)
+    comments = await find_comments(post_id, comment_fields)
+    if comment_fields is None:
+        return comments
+    return json_response(List[partial_model(Comment, comment_fields)], comments)
+
+
+async def find_comments(post_id: int, fields: Optional[Tuple[str, ...]] = None, version: Optional[int] = None):
+    query = select_comments_by_post if fields is None else select_comment_fields_by_post(fields)
     logger.debug(query)
 
-    return await database.fetch_all(query)
+    return await coalesced_read("comments", "fetch_all", query, {"post_id": post_id}, version)
 
 
 @router.get("/post/{post_id}", response_model=UserPostWithComments)
-async def get_post_with_comments(post_id: int):
+async def get_post_with_comments(
+        post_id: int, request: Request, response: Response,
+        fields: Optional[str] = None, comment_fields: Optional[str] = None
+):
     logger.info("Getting post with comments")
 
-    query = select_post_and_likes.where(post_table.c.id == post_id)
+    post_fields = parse_fields(fields, UserPostWithLikes)
+    comment_fields = parse_fields(comment_fields, Comment)
+
+    version = await coalesced_read("post_version", "fetch_val", select_post_version, {"post_id": post_id})
+    if version is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    headers = cache_headers(
+        make_etag("post", post_id, version, *(post_fields or ()), *(comment_fields or ())),
+        config.POST_CACHE_CONTROL, ["posts", f"post-{post_id}"],
+        config.SURROGATE_CONTROL
+    )
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+
+    query = select_post_and_likes_by_id if post_fields is None else select_post_fields_by_id(post_fields)
     logger.debug(query)
 
-    post = await database.fetch_one(query)
+    post = await coalesced_read("post", "fetch_one", query, {"post_id": post_id}, version)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     logger.debug(post)
 
-    comments = await get_comments_on_post(post_id)
+    comments = await find_comments(post_id, comment_fields, version)
     logger.debug(comments)
 
-    return {"post": post, "comments": comments}
+    if post_fields is None and comment_fields is None:
+        return {"post": post, "comments": comments}
+    return json_response(
+        partial_post_with_comments(post_fields, comment_fields), {"post": post, "comments": comments}, headers
+    )
 
 
-@router.post("/like", response_model=PostLike, status_code=201)
+@router.post(
+    "/like", response_model=PostLike, status_code=201,
+    responses={202: {"model": PostLikeQueued, "description": "Like buffered, see LIKE_BUFFER_ENABLED"}},
+)
 async def like_post(like: PostLikeIn, current_user: Annotated[User, Depends(get_current_user)]):
     logger.info("Liking post")
 
+    if config.LIKE_BUFFER_ENABLED:
+        return await queue_like(like, current_user)
+
     post = await find_post(like.post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -148,7 +369,26 @@ async def like_post(like: PostLikeIn, current_user: Annotated[User, Depends(get_
     query = like_table.insert().values(data)
     logger.debug(query)
 
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await database.execute(bump_post_version, {"post_id": like.post_id})
+        await database.execute(increment_likes_received, {"post_id": like.post_id, "likes": 1})
+    await bump_feed_version(database)
     logger.debug(last_record_id)
 
+    await broker.publish(LIKED, like.post_id, {"likes_added": 1})
     return {**data, "id": last_record_id}
+
+
+async def queue_like(like: PostLikeIn, current_user: User) -> JSONResponse:
+    # During a spike most likes are for the same few posts, so the
+    # existence check is shared between them; it runs on the primary
+    # because likes are writes.
+    version = await coalesced_read("post_version", "fetch_val", select_post_version, {"post_id": like.post_id})
+    if version is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    data = {**like.model_dump(), "user_id": current_user.id}
+    await like_buffer.add(data)
+
+    return JSONResponse(status_code=202, content=PostLikeQueued(**data).model_dump())
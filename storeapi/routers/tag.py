@@ -0,0 +1,82 @@
+import datetime
+import logging
+from typing import Annotated, List, Optional
+
+import sqlalchemy
+from fastapi import APIRouter, HTTPException, Query, status
+
+from storeapi.config import config
+from storeapi.database import post_table, post_tag_table, read_database, tag_table
+from storeapi.db_backends import PreparedStatement
+from storeapi.models.post import PostPage
+from storeapi.models.tag import TrendingTag
+from storeapi.routers.post import coalesced_read, select_post_and_likes
+from storeapi.tags import normalize_tag, select_tag_id
+from storeapi.timelines import NEWEST
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Keyset pagination over the post_tags primary key.
+select_tag_posts = PreparedStatement(
+    select_post_and_likes
+    .where(post_table.c.id.in_(
+        sqlalchemy.select(post_tag_table.c.post_id)
+        .where(
+            post_tag_table.c.tag_id == sqlalchemy.bindparam("tag_id"),
+            post_tag_table.c.post_id < sqlalchemy.bindparam("before"),
+        )
+        .order_by(post_tag_table.c.post_id.desc())
+        .limit(sqlalchemy.bindparam("limit"))
+    ))
+    .order_by(post_table.c.id.desc())
+)
+# Counts only the window's rows, read from the (created_at, tag_id) index.
+tag_counts = (
+    sqlalchemy.select(post_tag_table.c.tag_id, sqlalchemy.func.count().label("posts"))
+    .where(post_tag_table.c.created_at >= sqlalchemy.bindparam("since"))
+    .group_by(post_tag_table.c.tag_id)
+    .order_by(sqlalchemy.desc("posts"), post_tag_table.c.tag_id)
+    .limit(sqlalchemy.bindparam("limit"))
+    .subquery("tag_counts")
+)
+select_trending_tags = PreparedStatement(
+    sqlalchemy.select(tag_table.c.name, tag_counts.c.posts)
+    .select_from(tag_counts.join(tag_table, tag_table.c.id == tag_counts.c.tag_id))
+    .order_by(tag_counts.c.posts.desc(), tag_table.c.name)
+)
+
+
+@router.get("/tags/trending", response_model=List[TrendingTag])
+async def trending_tags(limit: Annotated[int, Query(ge=1, le=100)] = config.TAGS_TRENDING_LIMIT):
+    """Tags used by the most posts over the last TAGS_TRENDING_WINDOW_HOURS."""
+    logger.info("Getting trending tags")
+
+    # Rounded to the minute so concurrent requests share one query.
+    now = datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0)
+    since = now - datetime.timedelta(hours=config.TAGS_TRENDING_WINDOW_HOURS)
+
+    return await coalesced_read("trending_tags", "fetch_all", select_trending_tags, {"since": since, "limit": limit})
+
+
+@router.get("/tags/{tag}/posts", response_model=PostPage)
+async def get_tag_posts(
+        tag: str,
+        before: Optional[int] = None,
+        limit: Annotated[int, Query(ge=1, le=config.FEED_MAX_PAGE_SIZE)] = config.FEED_PAGE_SIZE,
+):
+    """Posts with a hashtag ("python") or mention ("@alice"), newest first.
+
+    Pass the returned next_before as before to get the next page.
+    """
+    logger.info("Getting posts tagged %s", tag)
+
+    tag_id = await read_database.fetch_val(select_tag_id, {"name": normalize_tag(tag)})
+    if tag_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+
+    posts = await read_database.fetch_all(
+        select_tag_posts, {"tag_id": tag_id, "before": NEWEST if before is None else before, "limit": limit}
+    )
+    return {"posts": posts, "next_before": posts[-1].id if len(posts) == limit else None}
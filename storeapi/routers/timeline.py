@@ -0,0 +1,69 @@
+import logging
+from typing import Annotated, Optional
+
+import sqlalchemy
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from storeapi.config import config
+from storeapi.database import database, post_table, read_database, user_table
+from storeapi.db_backends import PreparedStatement
+from storeapi.models.post import PostPage
+from storeapi.models.user import User
+from storeapi.routers.post import select_post_and_likes
+from storeapi.security import get_current_user
+from storeapi.timelines import follow, timeline_post_ids, unfollow
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+select_user_id = PreparedStatement(
+    sqlalchemy.select(user_table.c.id).where(user_table.c.id == sqlalchemy.bindparam("user_id"))
+)
+
+
+@router.post("/user/{user_id}/follow", status_code=201)
+async def follow_user(user_id: int, current_user: Annotated[User, Depends(get_current_user)], response: Response):
+    logger.info("User %s following user %s", current_user.id, user_id)
+
+    if user_id == current_user.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot follow yourself")
+    if await database.fetch_val(select_user_id, {"user_id": user_id}) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    if not await follow(current_user.id, user_id):
+        response.status_code = status.HTTP_200_OK
+        return {"detail": "Already following this user"}
+    return {"detail": "Following user"}
+
+
+@router.delete("/user/{user_id}/follow")
+async def unfollow_user(user_id: int, current_user: Annotated[User, Depends(get_current_user)]):
+    logger.info("User %s unfollowing user %s", current_user.id, user_id)
+
+    if not await unfollow(current_user.id, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not following this user")
+    return {"detail": "Unfollowed user"}
+
+
+@router.get("/feed", response_model=PostPage)
+async def home_timeline(
+        current_user: Annotated[User, Depends(get_current_user)],
+        before: Optional[int] = None,
+        limit: Annotated[int, Query(ge=1, le=config.FEED_MAX_PAGE_SIZE)] = config.FEED_PAGE_SIZE,
+):
+    """Posts by the current user and the users they follow, newest first.
+
+    Pass the returned next_before as before to get the next page.
+    """
+    logger.info("Getting home timeline")
+
+    post_ids = await timeline_post_ids(current_user.id, before, limit)
+    if not post_ids:
+        return {"posts": [], "next_before": None}
+
+    query = select_post_and_likes.where(post_table.c.id.in_(post_ids)).order_by(post_table.c.id.desc())
+    logger.debug(query)
+
+    posts = await read_database.fetch_all(query)
+    return {"posts": posts, "next_before": post_ids[-1] if len(post_ids) == limit else None}
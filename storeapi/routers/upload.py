@@ -1,10 +1,48 @@
 import logging
+import pathlib
 import tempfile
+import uuid
+from typing import Annotated
+from urllib.parse import quote
 
 import aiofiles
-from fastapi import APIRouter, HTTPException, UploadFile, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 
-from storeapi.libs.b2 import b2_upload_file
+from storeapi.config import config
+from storeapi.database import database, post_table
+from storeapi.feed_version import bump_feed_version
+from storeapi.libs.b2 import (
+    b2_get_file_url,
+    b2_get_upload_authorization,
+    b2_upload_file,
+)
+from storeapi.libs.images import ImageProcessingError, create_image_variants
+from storeapi.libs.local_storage import local_file_path
+from storeapi.models.upload import (
+    UploadAuthorization,
+    UploadAuthorizationIn,
+    UploadComplete,
+    UploadCompleteIn,
+)
+from storeapi.models.user import User
+from storeapi.routers.post import find_post
+from storeapi.security import (
+    create_upload_token,
+    get_current_user,
+    get_payload_for_token_type,
+    upload_token_expires_minute,
+)
+from storeapi.tasks import add_image_variants_to_post
 
 logger = logging.getLogger(__name__)
 
@@ -18,17 +56,177 @@ async def upload_file(file: UploadFile):
     try:
         with tempfile.NamedTemporaryFile() as temp_file:
             filename = temp_file.name
-            logger.info(f"Saving uploaded file temporarily to {filename}")
+            logger.info("Saving uploaded file temporarily to %s", filename)
 
             async with aiofiles.open(filename, 'wb') as f:
                 while chunk := await file.read(CHUNK_SIZE):
                     await f.write(chunk)
 
-            file_url = b2_upload_file(local_file=filename, file_name=file.filename)
+            file_url = await run_in_threadpool(b2_upload_file, local_file=filename, file_name=file.filename)
+
+            try:
+                variants = await create_image_variants(filename, file.filename)
+            except ImageProcessingError as e:
+                logger.warning("Skipping image variants for %s: %s", file.filename, e)
+                variants = {}
+            except Exception:
+                # The original is already stored, so it is still worth returning.
+                logger.exception("Could not create image variants for %s", file.filename)
+                variants = {}
     except Exception:
         raise HTTPException(
             status_code=500,
             detail="There was an error uploading the file"
         )
 
-    return {'detail': f"Successfully uploaded {file.filename}", "file_url": file_url}
+    return {'detail': f"Successfully uploaded {file.filename}", "file_url": file_url, "variants": variants}
+
+
+def local_storage_path(file_name: str) -> pathlib.Path:
+    try:
+        return local_file_path(file_name)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file name")
+
+
+def require_local_storage():
+    if config.STORAGE_BACKEND != "local":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Local storage is not enabled")
+
+
+@router.post("/upload/authorize", response_model=UploadAuthorization)
+async def authorize_upload(
+        upload: UploadAuthorizationIn, current_user: Annotated[User, Depends(get_current_user)], request: Request
+):
+    """Hand out a URL for uploading a file straight to storage.
+
+    Local upload URLs accept one upload of up to LOCAL_UPLOAD_MAX_BYTES for
+    the returned file_name. B2 upload URLs cannot be scoped to one file and
+    stay valid for a day, as expires_in reports; only the file named in the
+    token can be attached to a post with /upload/complete.
+    """
+    token_expires_in = upload_token_expires_minute() * 60
+    file_name = f"{uuid.uuid4().hex}/{pathlib.PurePath(upload.file_name).name}"
+    token = create_upload_token(current_user.email, file_name)
+    logger.info("Authorizing direct upload of %s", file_name)
+
+    if config.STORAGE_BACKEND == "local":
+        upload_url = str(request.url_for("upload_local_file", token=token))
+        expires_in = token_expires_in
+        method = "PUT"
+        headers = {"Content-Type": upload.content_type or "application/octet-stream"}
+    else:
+        try:
+            authorization = await run_in_threadpool(b2_get_upload_authorization)
+        except Exception:
+            raise HTTPException(
+                status_code=500,
+                detail="There was an error authorizing the upload"
+            )
+        upload_url = authorization["upload_url"]
+        expires_in = authorization["expires_in"]
+        method = "POST"
+        headers = {
+            "Authorization": authorization["authorization_token"],
+            "X-Bz-File-Name": quote(file_name),
+            "Content-Type": upload.content_type or "b2/x-auto",
+            "X-Bz-Content-Sha1": "do_not_verify",
+        }
+
+    return {
+        "file_name": file_name,
+        "upload_url": upload_url,
+        "method": method,
+        "headers": headers,
+        "token": token,
+        "expires_in": expires_in,
+        "token_expires_in": token_expires_in,
+    }
+
+
+@router.put("/upload/local/{token}", status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_local_storage)])
+async def upload_local_file(token: str, request: Request):
+    file_name = get_payload_for_token_type(token, "upload")["file_name"]
+    path = local_storage_path(file_name)
+    if int(request.headers.get("content-length", 0)) > config.LOCAL_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large")
+    # Every token names a fresh file, so refusing to overwrite makes tokens single-use.
+    if path.exists():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="File has already been uploaded")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = path.with_name(path.name + ".part")
+    logger.info("Storing direct upload in %s", path)
+
+    size = 0
+    try:
+        async with aiofiles.open(partial_path, 'xb') as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > config.LOCAL_UPLOAD_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large"
+                    )
+                await f.write(chunk)
+    except FileExistsError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="File is already being uploaded")
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    partial_path.rename(path)
+
+    return {"detail": f"Successfully uploaded {file_name}"}
+
+
+@router.get("/upload/local/{file_name:path}", dependencies=[Depends(require_local_storage)])
+async def get_local_file(file_name: str):
+    path = local_storage_path(file_name)
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    return FileResponse(path)
+
+
+@router.post("/upload/complete", response_model=UploadComplete)
+async def complete_upload(
+        upload: UploadCompleteIn, current_user: Annotated[User, Depends(get_current_user)],
+        request: Request, background_tasks: BackgroundTasks
+):
+    payload = get_payload_for_token_type(upload.token, "upload")
+    if payload["sub"] != current_user.email:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Upload belongs to another user")
+
+    file_name = payload["file_name"]
+    logger.info("Completing direct upload of %s", file_name)
+
+    if config.STORAGE_BACKEND == "local":
+        file_url = None
+        if local_storage_path(file_name).is_file():
+            file_url = str(request.url_for("get_local_file", file_name=file_name))
+    else:
+        file_url = await run_in_threadpool(b2_get_file_url, file_name)
+
+    if file_url is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Uploaded file not found")
+
+    if upload.post_id is not None:
+        post = await find_post(upload.post_id)
+        if not post:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if post.user_id != current_user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Post belongs to another user")
+
+        query = (
+            post_table.update()
+            .where(post_table.c.id == upload.post_id)
+            .values(image_url=file_url, version=post_table.c.version + 1)
+        )
+        logger.debug(query)
+
+        await database.execute(query)
+        await bump_feed_version(database)
+        # Local files are read straight from storage rather than fetched back over HTTP.
+        stored_file = file_name if config.STORAGE_BACKEND == "local" else None
+        background_tasks.add_task(add_image_variants_to_post, upload.post_id, file_url, database, stored_file)
+
+    return {"file_name": file_name, "file_url": file_url, "post_id": upload.post_id}
@@ -1,25 +1,66 @@
 import logging
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, HTTPException, status, Request, BackgroundTasks, Depends
+import sqlalchemy
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
 from fastapi.security import OAuth2PasswordRequestForm
 
-from storeapi.database import database, user_table
-from storeapi.models.user import UserIn
+from storeapi import tasks
+from storeapi.config import config
+from storeapi.database import (
+    database,
+    post_table,
+    read_database,
+    user_stats_table,
+    user_table,
+)
+from storeapi.db_backends import PreparedStatement
+from storeapi.models.post import PostPage
+from storeapi.models.user import UserIn, UserProfile
+from storeapi.routers.post import select_post_and_likes
 from storeapi.security import (
-    get_user,
-    get_subject_for_token_type,
-    get_password_hash,
     authenticate_user,
     create_access_token,
-    create_confirmation_token
+    create_confirmation_token,
+    get_password_hash,
+    get_subject_for_token_type,
+    get_user,
 )
-from storeapi import tasks
+from storeapi.timelines import NEWEST
+from storeapi.user_stats import insert_user_stats
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+select_user_profile = PreparedStatement(
+    sqlalchemy.select(
+        user_table.c.id,
+        user_table.c.follower_count,
+        # Users created before user_stats existed have no row until a rebuild.
+        sqlalchemy.func.coalesce(user_stats_table.c.post_count, 0).label("post_count"),
+        sqlalchemy.func.coalesce(user_stats_table.c.comment_count, 0).label("comment_count"),
+        sqlalchemy.func.coalesce(user_stats_table.c.likes_received, 0).label("likes_received"),
+    )
+    .select_from(user_table.outerjoin(user_stats_table))
+    .where(user_table.c.id == sqlalchemy.bindparam("user_id"))
+)
+# Keyset pagination over the (user_id, id) index on posts.
+select_user_posts = PreparedStatement(
+    select_post_and_likes
+    .where(post_table.c.user_id == sqlalchemy.bindparam("user_id"), post_table.c.id < sqlalchemy.bindparam("before"))
+    .order_by(post_table.c.id.desc())
+    .limit(sqlalchemy.bindparam("limit"))
+)
+
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register(user: UserIn, request: Request, background_tasks: BackgroundTasks):
@@ -33,7 +74,9 @@ async def register(user: UserIn, request: Request, background_tasks: BackgroundT
     query = user_table.insert().values(email=user.email, password=hashed_password)
     logger.debug(query)
 
-    await database.execute(query)
+    async with database.transaction():
+        user_id = await database.execute(query)
+        await database.execute(insert_user_stats, {"user_id": user_id})
     background_tasks.add_task(
         tasks.send_user_registration_email,
         user.email,
@@ -66,3 +109,31 @@ async def confirm_email(token: str):
 
     await database.execute(query)
     return {"detail": "Email confirmed successfully"}
+
+
+@router.get("/user/{user_id}", response_model=UserProfile)
+async def get_user_profile(user_id: int):
+    logger.info("Getting profile of user %s", user_id)
+
+    profile = await read_database.fetch_one(select_user_profile, {"user_id": user_id})
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return profile
+
+
+@router.get("/user/{user_id}/posts", response_model=PostPage)
+async def get_user_posts(
+        user_id: int,
+        before: Optional[int] = None,
+        limit: Annotated[int, Query(ge=1, le=config.FEED_MAX_PAGE_SIZE)] = config.FEED_PAGE_SIZE,
+):
+    """A user's posts, newest first; pass the returned next_before as before for the next page."""
+    logger.info("Getting posts of user %s", user_id)
+
+    posts = await read_database.fetch_all(
+        select_user_posts, {"user_id": user_id, "before": NEWEST if before is None else before, "limit": limit}
+    )
+    if not posts:
+        # Only an empty page needs to tell a missing user from one without posts.
+        await get_user_profile(user_id)
+    return {"posts": posts, "next_before": posts[-1].id if len(posts) == limit else None}
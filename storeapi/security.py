@@ -1,14 +1,16 @@
+import datetime
 import logging
 import os
-import datetime
 from typing import Annotated, Literal
 
-from fastapi import HTTPException, status, Depends
+import sqlalchemy
+from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError, ExpiredSignatureError
+from jose import ExpiredSignatureError, JWTError, jwt
 from passlib.context import CryptContext
 
-from storeapi.database import database, user_table
+from storeapi.database import read_database, user_table
+from storeapi.db_backends import PreparedStatement
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,10 @@ ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 pwd_context = CryptContext(schemes=["bcrypt"])
 
+select_user_by_email = PreparedStatement(
+    user_table.select().where(user_table.c.email == sqlalchemy.bindparam("email"))
+)
+
 
 def create_credentials_exception(detail: str) -> HTTPException:
     return HTTPException(
@@ -34,6 +40,10 @@ def confirm_token_expires_minute() -> int:
     return 1440
 
 
+def upload_token_expires_minute() -> int:
+    return 15
+
+
 def create_access_token(email: str):
     logger.debug("Creating access token", extra={"email": email})
 
@@ -56,6 +66,17 @@ def create_confirmation_token(email: str):
     return encoded_jwt
 
 
+def create_upload_token(email: str, file_name: str):
+    logger.debug("Creating upload token", extra={"email": email})
+
+    expire = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        minutes=upload_token_expires_minute()
+    )
+    jwt_data = {"sub": email, "exp": expire, "type": "upload", "file_name": file_name}
+    encoded_jwt = jwt.encode(jwt_data, key=SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -67,16 +88,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 async def get_user(email: str):
     logger.debug("Fetching user from database", extra={"email": email})
 
-    query = user_table.select().where(user_table.c.email == email)
+    query = select_user_by_email
     logger.debug(query)
 
-    result = await database.fetch_one(query)
+    result = await read_database.fetch_one(query, {"email": email})
 
     if result:
         return result
 
 
-def get_subject_for_token_type(token: str, type: Literal["access", "confirmation"]) -> str:
+def get_payload_for_token_type(token: str, type: Literal["access", "confirmation", "upload"]) -> dict:
     try:
         payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
     except ExpiredSignatureError as e:
@@ -92,7 +113,11 @@ def get_subject_for_token_type(token: str, type: Literal["access", "confirmation
     if token_type is None or token_type != type:
         raise create_credentials_exception(f"Token has incorrect type, expected {type}, got {token_type}")
 
-    return email
+    return payload
+
+
+def get_subject_for_token_type(token: str, type: Literal["access", "confirmation", "upload"]) -> str:
+    return get_payload_for_token_type(token, type)["sub"]
 
 
 async def authenticate_user(email: str, password: str):
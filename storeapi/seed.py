@@ -0,0 +1,190 @@
+"""Generate a large synthetic dataset for local load testing.
+
+Rows are generated deterministically from --seed. Likes per post and the
+hashtag in each post body follow a Zipf distribution and a small share of
+users write most of the comments. Every seeded user shares one bcrypt
+hash of --password.
+
+    python -m storeapi.seed --users 10000 --posts 200000 --comments 300000 --likes 500000
+"""
+import argparse
+import bisect
+import csv
+import io
+import itertools
+import logging
+import random
+import time
+from typing import Iterable, Iterator, List
+
+import sqlalchemy
+
+from storeapi.config import config
+from storeapi.database import (
+    comment_table,
+    like_table,
+    metadata,
+    post_table,
+    user_table,
+)
+from storeapi.feed_version import increment_feed_version
+from storeapi.security import get_password_hash
+from storeapi.tags import rebuild_post_tags
+from storeapi.user_stats import rebuild_user_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PASSWORD = "password"
+BATCH_SIZE = 10_000
+TOPICS = 100
+
+
+class ZipfSampler:
+    """Draw 1-based ids where rank k is chosen with weight 1 / k ** exponent.
+
+    Ranks are shuffled onto ids so the most popular rows are spread out
+    rather than always being the oldest ones.
+    """
+
+    def __init__(self, size: int, exponent: float, rng: random.Random):
+        self.rng = rng
+        self.ids = list(range(1, size + 1))
+        rng.shuffle(self.ids)
+        self.cum_weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+    def __call__(self) -> int:
+        position = bisect.bisect(self.cum_weights, self.rng.random() * self.cum_weights[-1])
+        return self.ids[min(position, len(self.ids) - 1)]
+
+
+def _max_id(connection, table: sqlalchemy.Table) -> int:
+    return connection.execute(sqlalchemy.select(sqlalchemy.func.max(table.c.id))).scalar() or 0
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _copy_rows(connection, table: sqlalchemy.Table, batch: List[dict]) -> None:
+    columns = list(batch[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([row[column] for column in columns] for row in batch)
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load_rows(connection, table: sqlalchemy.Table, rows: Iterable[dict], batch_size: int = BATCH_SIZE) -> int:
+    """Bulk load rows with COPY on Postgres and executemany batches elsewhere."""
+    count = 0
+    start = time.perf_counter()
+    for batch in _batches(rows, batch_size):
+        if connection.dialect.name == "postgresql":
+            _copy_rows(connection, table, batch)
+        else:
+            connection.execute(table.insert(), batch)
+        count += len(batch)
+
+    logger.info("Loaded %s rows into %s in %.1f s", count, table.name, time.perf_counter() - start)
+    return count
+
+
+def _reset_sequences(connection) -> None:
+    # COPY with explicit ids does not advance the serial sequences.
+    for table in (user_table, post_table, comment_table, like_table):
+        connection.execute(sqlalchemy.text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+        ))
+
+
+def seed(
+        engine: sqlalchemy.Engine, users: int, posts: int, comments: int, likes: int,
+        seed: int = 0, password: str = DEFAULT_PASSWORD, zipf_exponent: float = 1.1,
+        batch_size: int = BATCH_SIZE
+) -> dict:
+    """Append a synthetic dataset to the database behind engine.
+
+    Users are emailed seed<id>@example.com and are already confirmed, so
+    they can log in straight away with password.
+    """
+    rng = random.Random(seed)
+    password_hash = get_password_hash(password)
+
+    with engine.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("PRAGMA synchronous = OFF")
+
+        first_user = _max_id(connection, user_table) + 1
+        first_post = _max_id(connection, post_table) + 1
+        first_comment = _max_id(connection, comment_table) + 1
+        first_like = _max_id(connection, like_table) + 1
+        user_ids = range(first_user, first_user + users)
+        post_ids = range(first_post, first_post + posts)
+
+        load_rows(connection, user_table, (
+            {"id": user_id, "email": f"seed{user_id}@example.com", "password": password_hash, "confirmed": True}
+            for user_id in user_ids
+        ), batch_size)
+        topic = ZipfSampler(TOPICS, zipf_exponent, rng)
+        load_rows(connection, post_table, (
+            {"id": post_id, "body": f"Post {post_id} #topic{topic()}", "user_id": rng.choice(user_ids)}
+            for post_id in post_ids
+        ), batch_size)
+
+        commenter = ZipfSampler(users, zipf_exponent, rng)
+        load_rows(connection, comment_table, (
+            {
+                "id": first_comment + i, "body": f"Comment {first_comment + i}",
+                "post_id": rng.choice(post_ids), "user_id": first_user + commenter() - 1,
+            }
+            for i in range(comments)
+        ), batch_size)
+
+        liked_post = ZipfSampler(posts, zipf_exponent, rng)
+        load_rows(connection, like_table, (
+            {"id": first_like + i, "post_id": first_post + liked_post() - 1, "user_id": rng.choice(user_ids)}
+            for i in range(likes)
+        ), batch_size)
+
+        if connection.dialect.name == "postgresql":
+            _reset_sequences(connection)
+        connection.execute(increment_feed_version.statement)
+
+    rebuild_user_stats(engine)
+    rebuild_post_tags(engine, batch_size)
+    return {"users": users, "posts": posts, "comments": comments, "likes": likes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--comments", type=int, default=50_000)
+    parser.add_argument("--likes", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    engine = sqlalchemy.create_engine(args.database_url)
+    metadata.create_all(engine)
+
+    start = time.perf_counter()
+    counts = seed(
+        engine, args.users, args.posts, args.comments, args.likes, seed=args.seed,
+        password=args.password, zipf_exponent=args.zipf_exponent, batch_size=args.batch_size,
+    )
+    logger.info("Seeded %s rows in %.1f s", sum(counts.values()), time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
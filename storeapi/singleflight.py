@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+from storeapi.metrics import (
+    coalesced_requests_total,
+    coalesced_waiters,
+    coalesced_waiters_per_flight,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts fn as a task and every caller that
+    arrives before it finishes awaits that same task, so they all get its
+    result or its exception. The task is shielded, so a caller that is
+    cancelled (e.g. the client went away) does not cancel the call for
+    the others. name labels the metrics and should not include the
+    parameters, which belong in key.
+    """
+
+    def __init__(self):
+        self.flights: Dict[Tuple[str, Hashable], Flight] = {}
+
+    async def do(self, name: str, key: Hashable, fn: Callable[[], Awaitable]):
+        flight_key = (name, key)
+        flight = self.flights.get(flight_key)
+
+        if flight is None:
+            coalesced_requests_total.inc((name, "leader"))
+            flight = self.flights[flight_key] = Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda task: self._finish(flight_key, flight))
+            return await asyncio.shield(flight.task)
+
+        coalesced_requests_total.inc((name, "follower"))
+        coalesced_waiters.inc((name,))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            coalesced_waiters.dec((name,))
+
+    def _finish(self, flight_key: Tuple[str, Hashable], flight: Flight) -> None:
+        if self.flights.get(flight_key) is flight:
+            del self.flights[flight_key]
+        coalesced_waiters_per_flight.observe(flight.waiters, (flight_key[0],))
+        if flight.waiters:
+            logger.debug("Shared %s with %s waiters", flight_key[0], flight.waiters)
+        # Mark the exception as retrieved when every caller was cancelled.
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def in_flight(self) -> Dict[str, int]:
+        """Waiters per in-flight key, for debugging."""
+        return {f"{name} {key}": flight.waiters for (name, key), flight in self.flights.items()}
@@ -0,0 +1,128 @@
+"""Hashtags and @mentions, indexed by post.
+
+create_post stores each distinct #tag and @mention in a post's body in
+tags, lower-cased and keeping its sigil, and links it to the post in
+post_tags. Paging a tag's posts and counting trending tags then read
+post_tags by index instead of searching post bodies. Posts written
+before tags existed, or loaded in bulk, are indexed with:
+
+    python -m storeapi.tags
+"""
+import argparse
+import logging
+import re
+import time
+from typing import Dict, Iterable, List
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from storeapi.config import config
+from storeapi.database import database, post_table, post_tag_table, tag_table
+from storeapi.db_backends import PreparedStatement
+
+logger = logging.getLogger(__name__)
+
+# Emails and URL fragments do not count, hence the lookbehind.
+TAG_PATTERN = re.compile(r"(?<![\w#@/])[#@]\w+")
+MAX_TAG_LENGTH = 64
+# Keeps each IN list under SQLite's bound parameter limit.
+LOOKUP_BATCH_SIZE = 1000
+
+select_tag_id = PreparedStatement(
+    sqlalchemy.select(tag_table.c.id).where(tag_table.c.name == sqlalchemy.bindparam("name"))
+)
+
+
+def extract_tags(body: str, limit: int = config.TAGS_MAX_PER_POST) -> List[str]:
+    """The distinct tags and mentions in body, in order of first use."""
+    tags: Dict[str, None] = {}
+    for match in TAG_PATTERN.finditer(body):
+        tag = match.group().casefold()
+        if len(tag) <= MAX_TAG_LENGTH + 1:
+            tags[tag] = None
+            if len(tags) == limit:
+                break
+    return list(tags)
+
+
+def normalize_tag(tag: str) -> str:
+    """Turn a tag from a URL into its stored name: "Python" and "#python" are "#python"."""
+    if not tag.startswith(("#", "@")):
+        tag = "#" + tag
+    return tag.casefold()
+
+
+def insert_missing_tags(dialect: str):
+    """INSERT into tags that skips names already there, so concurrent posts can share a new tag."""
+    insert = postgresql.insert if dialect.startswith("postgres") else sqlite.insert
+    return insert(tag_table).on_conflict_do_nothing(index_elements=["name"])
+
+
+async def tag_post(post_id: int, tags: List[str]) -> None:
+    """Link a new post to its tags, creating the tags it introduces."""
+    if not tags:
+        return
+
+    await database.execute(insert_missing_tags(database.url.dialect).values([{"name": tag} for tag in tags]))
+    tag_ids = await database.fetch_all(sqlalchemy.select(tag_table.c.id).where(tag_table.c.name.in_(tags)))
+    await database.execute(
+        post_tag_table.insert().values([{"post_id": post_id, "tag_id": row.id} for row in tag_ids])
+    )
+
+
+def _lookup_tag_ids(connection, names: Iterable[str], tag_ids: Dict[str, int]) -> None:
+    missing = sorted(set(names) - tag_ids.keys())
+    for offset in range(0, len(missing), LOOKUP_BATCH_SIZE):
+        batch = missing[offset:offset + LOOKUP_BATCH_SIZE]
+        connection.execute(insert_missing_tags(connection.dialect.name), [{"name": name} for name in batch])
+        tag_ids.update(connection.execute(
+            sqlalchemy.select(tag_table.c.name, tag_table.c.id).where(tag_table.c.name.in_(batch))
+        ).tuples().all())
+
+
+def rebuild_post_tags(engine: sqlalchemy.Engine, batch_size: int = 10_000) -> int:
+    """Re-extract the tags of every post; returns the number of post_tags rows written."""
+    tag_ids: Dict[str, int] = {}
+    count = 0
+
+    with engine.begin() as connection:
+        connection.execute(post_tag_table.delete())
+
+        last_id = 0
+        while posts := connection.execute(
+            sqlalchemy.select(post_table.c.id, post_table.c.body, post_table.c.created_at)
+            .where(post_table.c.id > last_id)
+            .order_by(post_table.c.id)
+            .limit(batch_size)
+        ).all():
+            last_id = posts[-1].id
+            tagged = [(post, extract_tags(post.body or "")) for post in posts]
+            _lookup_tag_ids(connection, (tag for _, tags in tagged for tag in tags), tag_ids)
+
+            rows = [
+                {"tag_id": tag_ids[tag], "post_id": post.id, "created_at": post.created_at}
+                for post, tags in tagged for tag in tags
+            ]
+            if rows:
+                connection.execute(post_tag_table.insert(), rows)
+            count += len(rows)
+
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    engine = sqlalchemy.create_engine(args.database_url)
+    start = time.perf_counter()
+    rows = rebuild_post_tags(engine)
+    logger.info("Indexed %s post tags in %.1f s", rows, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import logging
 from json import JSONDecodeError
+from typing import Optional
 
 import httpx
 from databases import Database
+from starlette.concurrency import run_in_threadpool
 from starlette.datastructures import URL
 
 from storeapi.config import config
 from storeapi.database import post_table
+from storeapi.events import broker
+from storeapi.feed_version import bump_feed_version
+from storeapi.libs.images import ImageProcessingError, create_image_variants
+from storeapi.libs.local_storage import local_file_path
+from storeapi.metrics import track_in_progress
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +23,7 @@ class APIResponseError(Exception):
 
 
 async def send_simple_email(to: str, subject: str, body: str):
-    logger.info(f"Sending email to {to} with subject: {subject}")
+    logger.info("Sending email to %s with subject: %s", to, subject)
 
     async with httpx.AsyncClient() as client:
         try:
@@ -38,6 +45,7 @@ async def send_simple_email(to: str, subject: str, body: str):
             raise APIResponseError(f"API request failed with status {err.response.status_code}") from err
 
 
+@track_in_progress("send_user_registration_email")
 async def send_user_registration_email(email: str, confirmation_url: URL):
     return await send_simple_email(
         email,
@@ -71,6 +79,49 @@ async def _generate_cute_creature_api(prompt: str):
             raise APIResponseError("API response parsing failed") from err
 
 
+async def _download_image(url: str) -> bytes:
+    logger.debug("Downloading image from %s", url)
+
+    async with httpx.AsyncClient() as client:
+        try:
+            response = await client.get(url, timeout=60)
+            response.raise_for_status()
+            return response.content
+        except httpx.HTTPStatusError as err:
+            raise APIResponseError(f"Image download failed with status code {err.response.status_code}") from err
+        except httpx.RequestError as err:
+            raise APIResponseError(f"Image download failed: {err}") from err
+
+
+@track_in_progress("add_image_variants_to_post")
+async def add_image_variants_to_post(
+        post_id: int, image_url: str, database: Database, local_file_name: Optional[str] = None
+):
+    """Store image variants for a post, reading the image from local storage when local_file_name is given."""
+    try:
+        if local_file_name is not None:
+            image = await run_in_threadpool(local_file_path(local_file_name).read_bytes)
+        else:
+            image = await _download_image(image_url)
+        variants = await create_image_variants(image, f"posts/{post_id}")
+    except (APIResponseError, ImageProcessingError, OSError, ValueError) as err:
+        logger.warning("Could not create image variants for post %s: %s", post_id, err)
+        return None
+
+    query = (
+        post_table.update()
+        .where(post_table.c.id == post_id)
+        .values(image_variants=variants, version=post_table.c.version + 1)
+    )
+    logger.debug(query)
+
+    await database.execute(query)
+    await bump_feed_version(database)
+    await broker.publish("post.updated", post_id, {"image_variants": variants})
+    return variants
+
+
+@track_in_progress("generate_and_add_to_post")
 async def generate_and_add_to_post(
         email: str, post_id: int, post_url: str, database: Database,
         prompt: str = "A blue british shorthair cat is sitting on a couch"
@@ -89,11 +140,14 @@ async def generate_and_add_to_post(
     query = (
         post_table.update()
         .where(post_table.c.id == post_id)
-        .values(image_url=response["output_url"])
+        .values(image_url=response["output_url"], version=post_table.c.version + 1)
     )
     logger.debug(query)
 
     await database.execute(query)
+    await bump_feed_version(database)
+    await broker.publish("post.updated", post_id, {"image_url": response["output_url"]})
+    await add_image_variants_to_post(post_id, response["output_url"], database)
     logger.debug("Database connection in background task closed")
 
     await send_simple_email(
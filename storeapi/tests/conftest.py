@@ -1,15 +1,15 @@
 import os
 from typing import AsyncGenerator, Generator
-from unittest.mock import Mock, AsyncMock
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 from fastapi.testclient import TestClient
-from httpx import AsyncClient, Response, Request
+from httpx import AsyncClient, Request, Response
 from pytest_mock import MockerFixture
 
 os.environ["ENV_STATE"] = "test"
 
-from storeapi.database import database, user_table  # noqa: E402
+from storeapi.database import create_schema, database, user_table  # noqa: E402
 from storeapi.main import app  # noqa: E402
 from storeapi.tests.helpers import create_post  # noqa: E402
 
@@ -19,6 +19,11 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    create_schema()
+
+
 @pytest.fixture()
 def client() -> Generator:
     yield TestClient(app)
@@ -56,7 +61,9 @@ async def confirmed_user(registered_user: dict) -> dict:
 
 @pytest.fixture()
 async def logged_in_token(async_client: AsyncClient, confirmed_user: dict) -> str:
-    response = await async_client.post("/token", json=confirmed_user)
+    response = await async_client.post(
+        "/token", data={"username": confirmed_user["email"], "password": confirmed_user["password"]}
+    )
     return response.json()['access_token']
 
 
@@ -66,6 +73,7 @@ def mock_httpx_client(mocker: MockerFixture):
     mocked_async_client = Mock()
     response = Response(status_code=200, content="", request=Request("POST", "//"))
     mocked_async_client.post = AsyncMock(return_value=response)
+    mocked_async_client.get = AsyncMock(return_value=response)
     mocked_client.return_value.__aenter__.return_value = mocked_async_client
     return mocked_async_client
 
@@ -0,0 +1,74 @@
+import io
+
+import pytest
+from PIL import Image
+from pytest_mock import MockerFixture
+
+from storeapi.libs.images import (
+    VARIANT_SIZES,
+    ImageProcessingError,
+    create_image_variants,
+    render_variants,
+    shutdown_process_pool,
+    supported_formats,
+)
+
+
+@pytest.fixture()
+def image_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 800), color="blue").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_render_variants(image_bytes: bytes):
+    variants = render_variants(image_bytes)
+
+    assert len(variants) == len(VARIANT_SIZES) * len(supported_formats())
+
+    with Image.open(io.BytesIO(variants[("thumbnail", "webp")])) as thumbnail:
+        assert thumbnail.format == "WEBP"
+        assert max(thumbnail.size) == VARIANT_SIZES["thumbnail"]
+
+
+def test_render_variants_empty():
+    with pytest.raises(ImageProcessingError):
+        render_variants(b"")
+
+
+def test_render_variants_not_an_image():
+    with pytest.raises(ImageProcessingError):
+        render_variants(b"not an image")
+
+
+@pytest.mark.anyio
+async def test_create_image_variants(image_bytes: bytes, mocker: MockerFixture):
+    mock_upload = mocker.patch(
+        "storeapi.libs.images.b2_upload_bytes", return_value="https://fakeurl.com"
+    )
+
+    try:
+        variants = await create_image_variants(image_bytes, "posts/1")
+    finally:
+        shutdown_process_pool()
+
+    assert variants["thumbnail_webp"] == "https://fakeurl.com"
+    mock_upload.assert_any_call(mocker.ANY, "posts/1/thumbnail.webp", "image/webp")
+
+
+@pytest.mark.anyio
+async def test_create_image_variants_skips_failed_uploads(image_bytes: bytes, mocker: MockerFixture):
+    def upload(data: bytes, file_name: str, content_type: str) -> str:
+        if file_name == "posts/1/thumbnail.webp":
+            raise ConnectionError("B2 unavailable")
+        return f"https://fakeurl.com/{file_name}"
+
+    mocker.patch("storeapi.libs.images.b2_upload_bytes", side_effect=upload)
+
+    try:
+        variants = await create_image_variants(image_bytes, "posts/1")
+    finally:
+        shutdown_process_pool()
+
+    assert "thumbnail_webp" not in variants
+    assert variants["medium_webp"] == "https://fakeurl.com/posts/1/medium.webp"
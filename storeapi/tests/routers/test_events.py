@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi.events import Subscription, broker
+from storeapi.routers.events import sse_events, websocket_events
+from storeapi.tests.helpers import create_comment, like_post
+
+
+@pytest.mark.anyio
+async def test_write_paths_publish_events(async_client: AsyncClient, logged_in_token: str, created_post: dict):
+    with broker.subscribe() as subscription:
+        await create_comment("Nice", created_post["id"], async_client, logged_in_token)
+        await like_post(created_post["id"], async_client, logged_in_token)
+        await like_post(created_post["id"], async_client, logged_in_token)
+
+        events = await subscription.get(1)
+
+    assert [(event["type"], event["post_id"]) for event in events] == [
+        ("comment.created", created_post["id"]), ("post.liked", created_post["id"])
+    ]
+    assert events[0]["data"]["body"] == "Nice"
+    assert events[1]["data"] == {"likes_added": 2}
+
+
+@pytest.mark.anyio
+async def test_create_post_publishes_event(async_client: AsyncClient, logged_in_token: str):
+    with broker.subscribe() as subscription:
+        response = await async_client.post(
+            "/post", json={"body": "Live"}, headers={"Authorization": f"Bearer {logged_in_token}"}
+        )
+
+        [event] = await subscription.get(1)
+
+    post = response.json()
+    assert event == {
+        "type": "post.created", "post_id": post["id"],
+        "data": {"id": post["id"], "body": "Live", "user_id": post["user_id"]},
+    }
+
+
+@pytest.mark.anyio
+async def test_sse_events_format():
+    subscription = Subscription()
+    stream = sse_events(subscription, heartbeat=0.01)
+
+    assert await anext(stream) == ": connected\n\n"
+    assert await anext(stream) == ": ping\n\n"
+
+    subscription.put({"type": "post.liked", "post_id": 1, "data": {"likes_added": 1}})
+    chunk = await anext(stream)
+
+    assert chunk.startswith("event: post.liked\ndata: ")
+    assert json.loads(chunk.split("data: ", 1)[1])["post_id"] == 1
+
+
+@pytest.mark.anyio
+async def test_sse_events_overflow_ends_stream():
+    subscription = Subscription(max_pending=1)
+    stream = sse_events(subscription, heartbeat=1)
+    await anext(stream)
+    for post_id in range(2):
+        subscription.put({"type": "comment.created", "post_id": post_id, "data": {}})
+
+    assert await anext(stream) == "event: overflow\ndata: {}\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+
+
+@pytest.mark.anyio
+async def test_websocket_events(mocker: MockerFixture):
+    websocket = mocker.AsyncMock()
+    sent = []
+
+    async def send_json(message):
+        sent.append(message)
+        if len(sent) == 1:
+            raise WebSocketDisconnect()
+
+    websocket.send_json.side_effect = send_json
+    task = asyncio.ensure_future(websocket_events(websocket, post_id=1))
+    await asyncio.sleep(0)
+    await broker.publish("comment.created", 2, {})
+    await broker.publish("comment.created", 1, {"body": "Hi"})
+    await asyncio.wait_for(task, 1)
+
+    websocket.accept.assert_awaited_once()
+    assert sent == [{"type": "comment.created", "post_id": 1, "data": {"body": "Hi"}}]
+    assert broker.subscriptions == set()
@@ -0,0 +1,40 @@
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi.routers import health
+
+
+@pytest.mark.anyio
+async def test_database_health(async_client: AsyncClient):
+    response = await async_client.get("/health/db")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+    assert response.json()["backend"] == "sqlite"
+
+
+@pytest.mark.anyio
+async def test_database_health_reports_pool_utilization(async_client: AsyncClient, mocker: MockerFixture):
+    mocker.patch(
+        "storeapi.routers.health.pool_stats", return_value={"size": 4, "idle": 1, "min_size": 1, "max_size": 8}
+    )
+
+    response = await async_client.get("/health/db")
+
+    assert response.json()["pool"]["in_use"] == 3
+    assert response.json()["pool"]["utilization"] == 0.375
+
+
+@pytest.mark.anyio
+async def test_database_health_unavailable(async_client: AsyncClient, mocker: MockerFixture):
+    mocker.patch(
+        "storeapi.routers.health.database.fetch_val", side_effect=OSError("connection to db.internal:5432 refused")
+    )
+    spy = mocker.spy(health.logger, "exception")
+
+    response = await async_client.get("/health/db")
+
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable", "error": "database unavailable"}
+    spy.assert_called_once()
@@ -5,7 +5,7 @@ from httpx import AsyncClient
 from pytest_mock import MockerFixture
 
 from storeapi import security
-from storeapi.tests.helpers import create_post, create_comment, like_post
+from storeapi.tests.helpers import create_comment, create_post, like_post
 
 
 @pytest.fixture()
@@ -230,3 +230,158 @@ async def test_get_missing_post_with_comments(
     response = await async_client.get("/post/2")
 
     assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_cache_headers(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get("/post")
+
+    assert response.headers["etag"].startswith('W/"feed-new-')
+    assert response.headers["cache-control"] == "public, max-age=0, must-revalidate"
+    assert response.headers["surrogate-key"] == "posts"
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_not_modified(async_client: AsyncClient, created_post: dict):
+    etag = (await async_client.get("/post")).headers["etag"]
+
+    response = await async_client.get("/post", headers={"If-None-Match": etag.removeprefix("W/")})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["server-timing"].endswith('desc="1 queries"')
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_etag_changes_on_like(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    etag = (await async_client.get("/post")).headers["etag"]
+    await like_post(created_post["id"], async_client, logged_in_token)
+
+    response = await async_client.get("/post", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()[0]["likes"] == 1
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_etag_depends_on_sorting(async_client: AsyncClient, created_post: dict):
+    etag = (await async_client.get("/post")).headers["etag"]
+
+    response = await async_client.get("/post?sorting=old", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_etag_changes_on_new_post(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    etag = (await async_client.get("/post")).headers["etag"]
+    await create_post("Second post", async_client, logged_in_token)
+
+    response = await async_client.get("/post", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_not_modified_matches_compressed_etag(async_client: AsyncClient, logged_in_token: str):
+    await create_post("x" * 1000, async_client, logged_in_token)
+    compressed = await async_client.get("/post", headers={"Accept-Encoding": "gzip"})
+
+    response = await async_client.get(
+        "/post", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]}
+    )
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert response.status_code == 304
+    assert response.headers["etag"] == compressed.headers["etag"]
+
+
+@pytest.mark.anyio
+async def test_get_post_with_comments_not_modified(async_client: AsyncClient, created_post: dict):
+    first = await async_client.get(f'/post/{created_post["id"]}')
+
+    response = await async_client.get(f'/post/{created_post["id"]}', headers={"If-None-Match": first.headers["etag"]})
+
+    assert response.status_code == 304
+    assert response.headers["surrogate-key"] == f'posts post-{created_post["id"]}'
+    assert response.headers["server-timing"].endswith('desc="1 queries"')
+
+
+@pytest.mark.anyio
+async def test_get_post_with_comments_etag_changes_on_comment(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    etag = (await async_client.get(f'/post/{created_post["id"]}')).headers["etag"]
+    await create_comment("New comment", created_post["id"], async_client, logged_in_token)
+
+    response = await async_client.get(f'/post/{created_post["id"]}', headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert len(response.json()["comments"]) == 1
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_with_fields(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get("/post", params={"fields": "likes"})
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": created_post["id"], "likes": 0}]
+    assert "etag" in response.headers
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_fields_without_likes_sorted_by_likes(
+    async_client: AsyncClient, logged_in_token: str
+):
+    first = await create_post("First", async_client, logged_in_token)
+    second = await create_post("Second", async_client, logged_in_token)
+    await like_post(first["id"], async_client, logged_in_token)
+
+    response = await async_client.get("/post", params={"fields": "body", "sorting": "most_likes"})
+
+    assert response.json() == [{"id": first["id"], "body": "First"}, {"id": second["id"], "body": "Second"}]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_unknown_field(async_client: AsyncClient):
+    response = await async_client.get("/post", params={"fields": "body,password"})
+
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_etag_depends_on_fields(async_client: AsyncClient, created_post: dict):
+    etag = (await async_client.get("/post")).headers["etag"]
+
+    response = await async_client.get("/post", params={"fields": "likes"}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_get_post_with_comments_fields(
+    async_client: AsyncClient, created_post: dict, created_comment: dict
+):
+    response = await async_client.get(
+        f'/post/{created_post["id"]}', params={"fields": "likes", "comment_fields": "user_id"}
+    )
+
+    assert response.json() == {
+        "post": {"id": created_post["id"], "likes": 0},
+        "comments": [{"id": created_comment["id"], "user_id": created_comment["user_id"]}],
+    }
+
+
+@pytest.mark.anyio
+async def test_get_comments_on_post_fields(async_client: AsyncClient, created_post: dict, created_comment: dict):
+    response = await async_client.get(f'/post/{created_post["id"]}/comment', params={"fields": "body"})
+
+    assert response.json() == [{"id": created_comment["id"], "body": created_comment["body"]}]
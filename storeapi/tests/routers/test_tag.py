@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+from databases import Database
+from httpx import AsyncClient
+
+from storeapi.database import post_tag_table
+from storeapi.tests.helpers import create_post, like_post
+
+
+@pytest.mark.anyio
+async def test_get_tag_posts(async_client: AsyncClient, logged_in_token: str):
+    tagged = await create_post("Hello #Python", async_client, logged_in_token)
+    await create_post("No tags here", async_client, logged_in_token)
+    await like_post(tagged["id"], async_client, logged_in_token)
+
+    for tag in ("python", "#python", "PYTHON"):
+        response = await async_client.get(f"/tags/{tag.replace('#', '%23')}/posts")
+
+        assert response.status_code == 200
+        assert response.json() == {"posts": [{**tagged, "likes": 1}], "next_before": None}
+
+
+@pytest.mark.anyio
+async def test_get_mention_posts(async_client: AsyncClient, logged_in_token: str):
+    await create_post("Thanks @alice", async_client, logged_in_token)
+
+    response = await async_client.get("/tags/@Alice/posts")
+
+    assert [post["body"] for post in response.json()["posts"]] == ["Thanks @alice"]
+
+
+@pytest.mark.anyio
+async def test_get_tag_posts_keyset_pagination(async_client: AsyncClient, logged_in_token: str):
+    for body in ("First #news", "Second #news", "Third #news"):
+        await create_post(body, async_client, logged_in_token)
+
+    first_page = (await async_client.get("/tags/news/posts", params={"limit": 2})).json()
+    second_page = (await async_client.get(
+        "/tags/news/posts", params={"limit": 2, "before": first_page["next_before"]}
+    )).json()
+
+    assert [post["body"] for post in first_page["posts"]] == ["Third #news", "Second #news"]
+    assert [post["body"] for post in second_page["posts"]] == ["First #news"]
+    assert second_page["next_before"] is None
+
+
+@pytest.mark.anyio
+async def test_get_tag_posts_not_found(async_client: AsyncClient):
+    response = await async_client.get("/tags/missing/posts")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_trending_tags(async_client: AsyncClient, logged_in_token: str, db: Database):
+    for body in ("#a #b", "#b #c", "#b", "#old"):
+        await create_post(body, async_client, logged_in_token)
+    await db.execute(post_tag_table.update().where(post_tag_table.c.post_id == 4).values(
+        created_at=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=2)
+    ))
+
+    response = await async_client.get("/tags/trending", params={"limit": 2})
+
+    assert response.status_code == 200
+    assert response.json() == [{"name": "#b", "posts": 3}, {"name": "#a", "posts": 1}]
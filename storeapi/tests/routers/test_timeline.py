@@ -0,0 +1,169 @@
+import pytest
+from databases import Database
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi import timelines
+from storeapi.config import config
+from storeapi.database import follow_table, timeline_table, user_table
+from storeapi.tests.helpers import create_post
+
+
+@pytest.fixture()
+async def other_user(async_client: AsyncClient, db: Database) -> dict:
+    details = {"email": "other@example.com", "password": "1234"}
+    await async_client.post("/register", json=details)
+    await db.execute(user_table.update().where(user_table.c.email == details["email"]).values(confirmed=True))
+    response = await async_client.post("/token", data={"username": details["email"], "password": details["password"]})
+    user_id = await db.fetch_val(user_table.select().with_only_columns(user_table.c.id).where(
+        user_table.c.email == details["email"]
+    ))
+    return {**details, "id": user_id, "token": response.json()["access_token"]}
+
+
+async def follow(async_client: AsyncClient, user_id: int, token: str):
+    return await async_client.post(f"/user/{user_id}/follow", headers={"Authorization": f"Bearer {token}"})
+
+
+async def get_feed(async_client: AsyncClient, token: str, **params) -> dict:
+    response = await async_client.get("/feed", params=params, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def bodies(feed: dict) -> list:
+    return [post["body"] for post in feed["posts"]]
+
+
+@pytest.mark.anyio
+async def test_follow_user(async_client: AsyncClient, logged_in_token: str, other_user: dict, db: Database):
+    response = await follow(async_client, other_user["id"], logged_in_token)
+
+    assert response.status_code == 201
+    follower_count = await db.fetch_val(
+        user_table.select().with_only_columns(user_table.c.follower_count).where(user_table.c.id == other_user["id"])
+    )
+    assert follower_count == 1
+
+
+@pytest.mark.anyio
+async def test_follow_user_twice(async_client: AsyncClient, logged_in_token: str, other_user: dict):
+    await follow(async_client, other_user["id"], logged_in_token)
+    response = await follow(async_client, other_user["id"], logged_in_token)
+
+    assert response.status_code == 200
+    assert "Already following" in response.json()["detail"]
+
+
+@pytest.mark.anyio
+async def test_follow_self(async_client: AsyncClient, logged_in_token: str, registered_user: dict):
+    response = await follow(async_client, registered_user["id"], logged_in_token)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_follow_missing_user(async_client: AsyncClient, logged_in_token: str):
+    response = await follow(async_client, 999, logged_in_token)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_unfollow_not_following(async_client: AsyncClient, logged_in_token: str, other_user: dict):
+    response = await async_client.delete(
+        f"/user/{other_user['id']}/follow", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_feed_has_own_and_followed_posts(async_client: AsyncClient, logged_in_token: str, other_user: dict):
+    await create_post("Before follow", async_client, other_user["token"])
+    await follow(async_client, other_user["id"], logged_in_token)
+    await create_post("Mine", async_client, logged_in_token)
+    await create_post("After follow", async_client, other_user["token"])
+
+    feed = await get_feed(async_client, logged_in_token)
+
+    assert bodies(feed) == ["After follow", "Mine", "Before follow"]
+    assert feed["posts"][0]["likes"] == 0
+
+
+@pytest.mark.anyio
+async def test_feed_excludes_unfollowed_posts(async_client: AsyncClient, logged_in_token: str, other_user: dict):
+    await follow(async_client, other_user["id"], logged_in_token)
+    await create_post("Followed", async_client, other_user["token"])
+
+    response = await async_client.delete(
+        f"/user/{other_user['id']}/follow", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 200
+    assert bodies(await get_feed(async_client, logged_in_token)) == []
+
+
+@pytest.mark.anyio
+async def test_feed_from_popular_user_is_read_on_demand(
+    async_client: AsyncClient, logged_in_token: str, registered_user: dict, other_user: dict,
+    db: Database, mocker: MockerFixture
+):
+    mocker.patch.object(config, "FEED_FANOUT_MAX_FOLLOWERS", 1)
+    await follow(async_client, other_user["id"], logged_in_token)
+    await create_post("Popular", async_client, other_user["token"])
+
+    timeline = await db.fetch_all(timeline_table.select().where(timeline_table.c.user_id == registered_user["id"]))
+
+    assert timeline == []
+    assert bodies(await get_feed(async_client, logged_in_token)) == ["Popular"]
+
+
+@pytest.mark.anyio
+async def test_feed_keeps_posts_when_user_is_no_longer_popular(
+    async_client: AsyncClient, logged_in_token: str, registered_user: dict, other_user: dict,
+    db: Database, mocker: MockerFixture
+):
+    mocker.patch.object(config, "FEED_FANOUT_MAX_FOLLOWERS", 2)
+    third_id = await db.execute(user_table.insert().values(email="third@example.com"))
+    await follow(async_client, other_user["id"], logged_in_token)
+    await timelines.follow(third_id, other_user["id"])
+    await create_post("Popular", async_client, other_user["token"])
+
+    assert await timelines.unfollow(third_id, other_user["id"])
+
+    timeline = await db.fetch_all(timeline_table.select().where(timeline_table.c.user_id == registered_user["id"]))
+    assert len(timeline) == 1
+    assert bodies(await get_feed(async_client, logged_in_token)) == ["Popular"]
+
+
+@pytest.mark.anyio
+async def test_follow_existing_row_is_not_counted(registered_user: dict, other_user: dict, db: Database):
+    await db.execute(follow_table.insert().values(follower_id=registered_user["id"], followee_id=other_user["id"]))
+
+    assert not await timelines.follow(registered_user["id"], other_user["id"])
+
+    follower_count = await db.fetch_val(
+        user_table.select().with_only_columns(user_table.c.follower_count).where(user_table.c.id == other_user["id"])
+    )
+    assert follower_count == 0
+
+
+@pytest.mark.anyio
+async def test_feed_keyset_pagination(async_client: AsyncClient, logged_in_token: str):
+    for body in ("First", "Second", "Third"):
+        await create_post(body, async_client, logged_in_token)
+
+    first_page = await get_feed(async_client, logged_in_token, limit=2)
+    second_page = await get_feed(async_client, logged_in_token, limit=2, before=first_page["next_before"])
+
+    assert bodies(first_page) == ["Third", "Second"]
+    assert bodies(second_page) == ["First"]
+    assert second_page["next_before"] is None
+
+
+@pytest.mark.anyio
+async def test_feed_requires_login(async_client: AsyncClient):
+    response = await async_client.get("/feed")
+
+    assert response.status_code == 401
@@ -2,11 +2,14 @@ import contextlib
 import os
 import pathlib
 import tempfile
+import threading
 
 import pytest
 from httpx import AsyncClient
 from pytest_mock import MockerFixture
 
+from storeapi.config import config
+
 
 @pytest.fixture()
 def sample_image(fs) -> pathlib.Path:
@@ -22,6 +25,14 @@ async def mock_b2_upload_file(mocker: MockerFixture):
     )
 
 
+@pytest.fixture(autouse=True)
+async def mock_create_image_variants(mocker: MockerFixture):
+    return mocker.patch(
+        "storeapi.routers.upload.create_image_variants",
+        return_value={"thumbnail_webp": "https://fakeurl.com/thumbnail.webp"},
+    )
+
+
 @pytest.fixture(autouse=True)
 async def aiofiles_mock_open(mocker: MockerFixture, fs):
     mock_open = mocker.patch("aiofiles.open")
@@ -53,6 +64,20 @@ async def test_upload_image(async_client: AsyncClient, logged_in_token: str, sam
 
     assert response.status_code == 201
     assert response.json()['file_url'] == "https://fakeurl.com"
+    assert response.json()['variants'] == {"thumbnail_webp": "https://fakeurl.com/thumbnail.webp"}
+
+
+@pytest.mark.anyio
+async def test_upload_image_when_variants_fail(
+    async_client: AsyncClient, logged_in_token: str, sample_image: pathlib, mock_create_image_variants
+):
+    mock_create_image_variants.side_effect = ConnectionError("B2 unavailable")
+
+    response = await call_upload_endpoint(async_client, logged_in_token, sample_image)
+
+    assert response.status_code == 201
+    assert response.json()['file_url'] == "https://fakeurl.com"
+    assert response.json()['variants'] == {}
 
 
 @pytest.mark.anyio
@@ -67,3 +92,154 @@ async def test_temp_file_removed_after_upload(
     created_temp_file = named_temp_file_spy.spy_return
 
     assert not os.path.exists(created_temp_file.name)
+
+
+@pytest.fixture()
+def local_storage(mocker: MockerFixture, fs) -> pathlib.Path:
+    storage_dir = pathlib.Path("/uploads")
+    mocker.patch.object(config, "STORAGE_BACKEND", "local")
+    mocker.patch.object(config, "LOCAL_STORAGE_DIR", str(storage_dir))
+    return storage_dir
+
+
+async def authorize_upload(async_client: AsyncClient, token: str) -> dict:
+    response = await async_client.post(
+        "/upload/authorize",
+        json={"file_name": "my_file.png", "content_type": "image/png"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    return response.json()
+
+
+@pytest.mark.anyio
+async def test_authorize_upload_b2(async_client: AsyncClient, logged_in_token: str, mocker: MockerFixture):
+    mocker.patch(
+        "storeapi.routers.upload.b2_get_upload_authorization",
+        return_value={
+            "upload_url": "https://b2.example.com/upload", "authorization_token": "b2-token", "expires_in": 86400
+        },
+    )
+    authorization = await authorize_upload(async_client, logged_in_token)
+
+    assert authorization["upload_url"] == "https://b2.example.com/upload"
+    assert authorization["expires_in"] == 86400
+    assert authorization["token_expires_in"] == 15 * 60
+    assert authorization["method"] == "POST"
+    assert authorization["headers"]["Authorization"] == "b2-token"
+    assert authorization["file_name"].endswith("/my_file.png")
+
+
+@pytest.mark.anyio
+async def test_complete_upload_b2_calls_sdk_off_event_loop(
+        async_client: AsyncClient, logged_in_token: str, mocker: MockerFixture
+):
+    threads = []
+
+    def sdk_call(*args):
+        threads.append(threading.current_thread())
+        return {"upload_url": "https://b2.example.com/upload", "authorization_token": "b2-token", "expires_in": 86400}
+
+    mocker.patch("storeapi.routers.upload.b2_get_upload_authorization", side_effect=sdk_call)
+    mocker.patch(
+        "storeapi.routers.upload.b2_get_file_url",
+        side_effect=lambda file_name: sdk_call() and f"https://b2.example.com/{file_name}",
+    )
+    authorization = await authorize_upload(async_client, logged_in_token)
+
+    response = await async_client.post(
+        "/upload/complete",
+        json={"token": authorization["token"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.json()["file_url"] == f"https://b2.example.com/{authorization['file_name']}"
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.anyio
+async def test_authorize_upload_requires_login(async_client: AsyncClient):
+    response = await async_client.post("/upload/authorize", json={"file_name": "my_file.png"})
+
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_direct_upload_local_and_attach_to_post(
+        async_client: AsyncClient, logged_in_token: str, created_post: dict, local_storage: pathlib.Path,
+        mocker: MockerFixture
+):
+    mock_add_variants = mocker.patch("storeapi.routers.upload.add_image_variants_to_post")
+    authorization = await authorize_upload(async_client, logged_in_token)
+
+    response = await async_client.put(authorization["upload_url"], content=b"image bytes")
+    assert response.status_code == 201
+    assert (local_storage / authorization["file_name"]).read_bytes() == b"image bytes"
+
+    response = await async_client.post(
+        "/upload/complete",
+        json={"token": authorization["token"], "post_id": created_post["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 200
+    file_url = response.json()["file_url"]
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["post"]["image_url"] == file_url
+    mock_add_variants.assert_called_once_with(created_post["id"], file_url, mocker.ANY, authorization["file_name"])
+
+    response = await async_client.get(file_url)
+    assert response.content == b"image bytes"
+
+
+@pytest.mark.anyio
+async def test_direct_upload_local_token_is_single_use(
+        async_client: AsyncClient, logged_in_token: str, local_storage: pathlib.Path
+):
+    authorization = await authorize_upload(async_client, logged_in_token)
+
+    await async_client.put(authorization["upload_url"], content=b"image bytes")
+    response = await async_client.put(authorization["upload_url"], content=b"other bytes")
+
+    assert response.status_code == 409
+    assert (local_storage / authorization["file_name"]).read_bytes() == b"image bytes"
+
+
+@pytest.mark.anyio
+async def test_direct_upload_local_too_large(
+        async_client: AsyncClient, logged_in_token: str, local_storage: pathlib.Path, mocker: MockerFixture
+):
+    async def chunks():
+        yield b"ima"
+        yield b"ge bytes"
+
+    mocker.patch.object(config, "LOCAL_UPLOAD_MAX_BYTES", 4)
+    authorization = await authorize_upload(async_client, logged_in_token)
+
+    response = await async_client.put(authorization["upload_url"], content=b"image bytes")
+    # Streamed without a Content-Length, so the limit is enforced while writing.
+    streamed = await async_client.put(authorization["upload_url"], content=chunks())
+
+    assert response.status_code == streamed.status_code == 413
+    assert list((local_storage / authorization["file_name"]).parent.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_complete_upload_missing_file(
+        async_client: AsyncClient, logged_in_token: str, local_storage: pathlib.Path
+):
+    authorization = await authorize_upload(async_client, logged_in_token)
+    response = await async_client.post(
+        "/upload/complete",
+        json={"token": authorization["token"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_upload_local_disabled(async_client: AsyncClient):
+    response = await async_client.put("/upload/local/some-token", content=b"image bytes")
+
+    assert response.status_code == 404
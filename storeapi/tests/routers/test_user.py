@@ -1,8 +1,10 @@
 import pytest
+from fastapi import BackgroundTasks
 from httpx import AsyncClient
 from pytest_mock import MockerFixture
 
-from fastapi import BackgroundTasks
+from storeapi.database import user_stats_table
+from storeapi.tests.helpers import create_comment, create_post, like_post
 
 
 async def register_user(async_client: AsyncClient, email: str, password: str):
@@ -57,7 +59,7 @@ async def test_confirm_user_expired_token(async_client: AsyncClient, mocker: Moc
 
 @pytest.mark.anyio
 async def test_login_user_not_exists(async_client: AsyncClient):
-    response = await async_client.post('/token', json={'email': 'test@example.com', 'password': '1234'})
+    response = await async_client.post('/token', data={'username': 'test@example.com', 'password': '1234'})
 
     assert response.status_code == 401
 
@@ -66,7 +68,7 @@ async def test_login_user_not_exists(async_client: AsyncClient):
 async def test_login_user_not_confirmed(async_client: AsyncClient, registered_user: dict):
     response = await async_client.post(
         '/token',
-        json={'email': registered_user['email'], 'password': registered_user['password']}
+        data={'username': registered_user['email'], 'password': registered_user['password']}
     )
 
     assert response.status_code == 401
@@ -75,7 +77,70 @@ async def test_login_user_not_confirmed(async_client: AsyncClient, registered_us
 @pytest.mark.anyio
 async def test_login_user(async_client: AsyncClient, confirmed_user: dict):
     response = await async_client.post(
-        '/token', json={'email': confirmed_user['email'], 'password': confirmed_user['password']}
+        '/token', data={'username': confirmed_user['email'], 'password': confirmed_user['password']}
     )
 
     assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_user_profile_counts_activity(
+    async_client: AsyncClient, registered_user: dict, logged_in_token: str
+):
+    post = await create_post("Post", async_client, logged_in_token)
+    await create_comment("Comment", post["id"], async_client, logged_in_token)
+    await like_post(post["id"], async_client, logged_in_token)
+
+    response = await async_client.get(f"/user/{registered_user['id']}")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": registered_user["id"], "follower_count": 0, "post_count": 1, "comment_count": 1, "likes_received": 1
+    }
+
+
+@pytest.mark.anyio
+async def test_user_profile_without_stats_row(async_client: AsyncClient, registered_user: dict, db):
+    await db.execute(user_stats_table.delete())
+
+    response = await async_client.get(f"/user/{registered_user['id']}")
+
+    assert response.json()["post_count"] == 0
+
+
+@pytest.mark.anyio
+async def test_user_profile_not_found(async_client: AsyncClient):
+    response = await async_client.get("/user/999")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_user_posts_keyset_pagination(
+    async_client: AsyncClient, registered_user: dict, logged_in_token: str
+):
+    for body in ("First", "Second", "Third"):
+        await create_post(body, async_client, logged_in_token)
+
+    first_page = (await async_client.get(f"/user/{registered_user['id']}/posts", params={"limit": 2})).json()
+    second_page = (await async_client.get(
+        f"/user/{registered_user['id']}/posts", params={"limit": 2, "before": first_page["next_before"]}
+    )).json()
+
+    assert [post["body"] for post in first_page["posts"]] == ["Third", "Second"]
+    assert [post["body"] for post in second_page["posts"]] == ["First"]
+    assert second_page["next_before"] is None
+
+
+@pytest.mark.anyio
+async def test_user_posts_not_found(async_client: AsyncClient):
+    response = await async_client.get("/user/999/posts")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_user_posts_empty(async_client: AsyncClient, registered_user: dict):
+    response = await async_client.get(f"/user/{registered_user['id']}/posts")
+
+    assert response.json() == {"posts": [], "next_before": None}
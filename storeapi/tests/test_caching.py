@@ -0,0 +1,36 @@
+import pytest
+from fastapi import Request
+
+from storeapi.caching import cache_headers, etag_matches, make_etag
+
+
+def request_with(if_none_match: str) -> Request:
+    return Request({"type": "http", "headers": [(b"if-none-match", if_none_match.encode())]})
+
+
+def test_make_etag():
+    assert make_etag("post", 1, 3) == 'W/"post-1-3"'
+
+
+@pytest.mark.parametrize(
+    "header, matches",
+    [
+        ('"post-1-3"', True),
+        ('W/"post-1-3"', True),
+        ('"post-1-2", "post-1-3"', True),
+        ("*", True),
+        ('"post-1-2"', False),
+        ("", False),
+    ],
+)
+def test_etag_matches(header: str, matches: bool):
+    assert etag_matches(request_with(header), '"post-1-3"') is matches
+    assert etag_matches(request_with(header), 'W/"post-1-3"') is matches
+
+
+def test_cache_headers_surrogate_control():
+    headers = cache_headers('"feed"', "no-cache", ["posts"], surrogate_control="max-age=60")
+
+    assert headers == {
+        "ETag": '"feed"', "Cache-Control": "no-cache", "Surrogate-Key": "posts", "Surrogate-Control": "max-age=60"
+    }
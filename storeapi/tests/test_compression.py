@@ -0,0 +1,148 @@
+import gzip
+import zlib
+
+import anyio
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from storeapi.compression import CompressionMiddleware, negotiate_encoding
+
+BODY = [{"id": i, "body": "A fairly repetitive post body", "likes": 0} for i in range(100)]
+
+
+async def feed(request):
+    return JSONResponse(BODY, headers={"ETag": '"feed-1"'})
+
+
+async def small(request):
+    return JSONResponse({"detail": "ok"})
+
+
+async def image(request):
+    return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+
+async def stream_lines():
+    for i in range(3):
+        yield f'{{"line": {i}, "padding": "{"x" * 300}"}}\n'
+
+
+def make_client(**options) -> AsyncClient:
+    app = Starlette(routes=[
+        Route("/feed", feed), Route("/small", small), Route("/image", image), Route("/post/{post_id}", feed),
+    ])
+    app.add_middleware(CompressionMiddleware, **options)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+async def raw_get(client: AsyncClient, path: str, accept_encoding: str = "gzip"):
+    async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip;q=0.5, br", "br"),
+        ("br;q=0.5, gzip;q=0.8", "gzip"),
+        ("*", "zstd"),
+        ("gzip;q=0, *;q=0.1", "zstd"),
+        ("identity", None),
+        ("gzip;q=0", None),
+    ],
+)
+def test_negotiate_encoding(header: str, expected: str):
+    assert negotiate_encoding(header, ["zstd", "br", "gzip"]) == expected
+
+
+@pytest.mark.anyio
+async def test_large_json_is_compressed():
+    async with make_client() as client:
+        response, raw = await raw_get(client, "/feed")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(raw)
+    assert response.headers["etag"] == 'W/"feed-1"'
+    assert len(raw) < len(gzip.decompress(raw)) / 5
+
+
+@pytest.mark.anyio
+async def test_small_response_is_not_compressed():
+    async with make_client() as client:
+        response, raw = await raw_get(client, "/small")
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert raw == b'{"detail":"ok"}'
+
+
+@pytest.mark.anyio
+async def test_compressed_media_is_skipped():
+    async with make_client() as client:
+        response, raw = await raw_get(client, "/image")
+
+    assert "content-encoding" not in response.headers
+    assert len(raw) == 4000
+
+
+@pytest.mark.anyio
+async def test_unsupported_encoding_is_not_compressed():
+    async with make_client() as client:
+        response, _ = await raw_get(client, "/feed", accept_encoding="identity")
+
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_route_level_zero_disables_compression():
+    async with make_client(route_levels={"GET /feed": {"gzip": 0}}) as client:
+        response, _ = await raw_get(client, "/feed")
+
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_route_levels_match_routes_with_path_parameters():
+    async with make_client(route_levels={"GET /post/{id}": {"gzip": 0}}) as client:
+        response, _ = await raw_get(client, "/post/1")
+
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_streaming_response_is_flushed_per_chunk():
+    # httpx's ASGI transport buffers the body, so drive the middleware directly.
+    middleware = CompressionMiddleware(StreamingResponse(stream_lines(), media_type="application/x-ndjson"))
+    scope = {"type": "http", "method": "GET", "path": "/stream", "headers": [(b"accept-encoding", b"gzip")]}
+    messages = []
+
+    async def receive():
+        await anyio.sleep_forever()
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    # Every chunk decompresses on its own because of the sync flush.
+    lines = [decompressor.decompress(message["body"]) for message in messages[1:4]]
+    assert [line[:10] for line in lines] == [b'{"line": 0', b'{"line": 1', b'{"line": 2']
+    assert messages[-1]["more_body"] is False
+
+
+@pytest.mark.anyio
+async def test_app_compresses_feed(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get("/post", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "accept-encoding" in response.headers["vary"].lower()
@@ -0,0 +1,179 @@
+import json
+
+import pytest
+from pytest_mock import MockerFixture
+
+from storeapi import events as events_module
+from storeapi.events import (
+    LIKED,
+    EventBroker,
+    LocalBackend,
+    PostgresBackend,
+    Subscription,
+    SubscriptionOverflow,
+)
+from storeapi.metrics import events_disconnects, events_dropped
+
+
+def event(type: str, post_id: int = 1, **data) -> dict:
+    return {"type": type, "post_id": post_id, "data": data}
+
+
+@pytest.mark.anyio
+async def test_subscription_receives_events():
+    broker = EventBroker(LocalBackend())
+    with broker.subscribe() as subscription:
+        await broker.publish("post.created", 1, {"body": "Hello"})
+        await broker.publish("comment.created", 2, {"body": "Hi"})
+
+        assert await subscription.get(1) == [
+            event("post.created", 1, body="Hello"), event("comment.created", 2, body="Hi")
+        ]
+    assert broker.subscriptions == set()
+
+
+@pytest.mark.anyio
+async def test_subscription_filters_by_post():
+    broker = EventBroker(LocalBackend())
+    with broker.subscribe(post_id=2) as subscription:
+        await broker.publish("comment.created", 1, {})
+        await broker.publish("comment.created", 2, {})
+
+        assert [received["post_id"] for received in await subscription.get(1)] == [2]
+
+
+@pytest.mark.anyio
+async def test_get_times_out_with_no_events():
+    assert await Subscription().get(0.01) == []
+
+
+@pytest.mark.anyio
+async def test_likes_are_coalesced_per_post():
+    subscription = Subscription()
+    shared = event(LIKED, 1, likes_added=1)
+    for _ in range(3):
+        subscription.put(shared)
+    subscription.put(event(LIKED, 2, likes_added=1))
+    subscription.put(event(LIKED, 1, likes_added=2))
+
+    assert await subscription.get(1) == [event(LIKED, 1, likes_added=5), event(LIKED, 2, likes_added=1)]
+    # Other subscribers see the published event unchanged.
+    assert shared["data"]["likes_added"] == 1
+
+
+@pytest.mark.anyio
+async def test_slow_subscription_overflows():
+    subscription = Subscription(max_pending=2)
+    for post_id in range(3):
+        subscription.put(event("comment.created", post_id))
+
+    with pytest.raises(SubscriptionOverflow):
+        await subscription.get(1)
+    assert subscription.pending == {}
+
+
+@pytest.mark.anyio
+async def test_publish_failure_is_logged(mocker: MockerFixture):
+    backend = LocalBackend()
+    broker = EventBroker(backend)
+    mocker.patch.object(backend, "publish", side_effect=OSError("broker down"))
+    spy = mocker.spy(events_module.logger, "exception")
+
+    await broker.publish("post.created", 1, {})
+
+    spy.assert_called_once()
+
+
+def test_postgres_backend_delivers_notifications():
+    backend = PostgresBackend("postgresql+asyncpg://localhost/test")
+    broker = EventBroker(backend)
+    subscription = Subscription()
+    broker.subscriptions.add(subscription)
+
+    backend._on_notify(None, 1, "storeapi_events", '{"type": "post.created", "post_id": 1, "data": {}}')
+
+    assert backend.url == "postgresql://localhost/test"
+    assert list(subscription.pending.values()) == [event("post.created")]
+
+
+def listening_connection(mocker: MockerFixture):
+    connection = mocker.AsyncMock()
+    connection.add_termination_listener = mocker.Mock()
+    connection.remove_termination_listener = mocker.Mock()
+    return connection
+
+
+@pytest.mark.anyio
+async def test_postgres_backend_sends_queued_events_together(mocker: MockerFixture):
+    connection = listening_connection(mocker)
+    mocker.patch("asyncpg.connect", return_value=connection)
+    backend = PostgresBackend("postgresql://localhost/test")
+    await backend.start()
+
+    await backend.publish(event("post.created", body="x" * 10000))
+    await backend.publish(event("post.created", body="first"))
+    await backend.publish(event("post.created", body="second"))
+    await backend.stop()
+
+    connection.executemany.assert_awaited_once_with("SELECT pg_notify($1, $2)", [
+        ("storeapi_events", json.dumps(event("post.created", body="first"))),
+        ("storeapi_events", json.dumps(event("post.created", body="second"))),
+    ])
+
+
+@pytest.mark.anyio
+async def test_postgres_backend_drops_events_when_queue_is_full():
+    dropped = events_dropped.values.get(("queue_full",), 0)
+    backend = PostgresBackend("postgresql://localhost/test", max_queued=1)
+
+    await backend.publish(event("post.created"))
+    await backend.publish(event("post.created"))
+
+    assert backend._queue.qsize() == 1
+    assert events_dropped.values[("queue_full",)] == dropped + 1
+
+
+@pytest.mark.anyio
+async def test_postgres_backend_reconnects_after_losing_connection(mocker: MockerFixture):
+    first, second = listening_connection(mocker), listening_connection(mocker)
+    connect = mocker.patch("asyncpg.connect", side_effect=[first, OSError("refused"), OSError("refused"), second])
+    sleep = mocker.patch.object(events_module.asyncio, "sleep")
+    spy = mocker.spy(events_module.logger, "warning")
+    disconnects = events_disconnects.values.get((), 0)
+    backend = PostgresBackend("postgresql://localhost/test", retry_seconds=1, max_retry_seconds=30)
+    await backend.start()
+
+    backend._on_termination(first)
+    await backend.publish(event("post.created"))
+    await backend._reconnect_task
+    await backend._queue.join()
+
+    assert connect.await_count == 4
+    assert [call.args[0] for call in sleep.await_args_list] == [1, 2]
+    assert backend.connection is second
+    assert backend._reconnect_task is None
+    assert events_disconnects.values[()] == disconnects + 1
+    assert "reconnecting" in spy.call_args.args[0]
+    # The event published while reconnecting waited for the new connection.
+    first.executemany.assert_not_awaited()
+    second.executemany.assert_awaited_once()
+    second.add_listener.assert_awaited_once_with("storeapi_events", backend._on_notify)
+
+    await backend.stop()
+
+    second.close.assert_awaited_once()
+    assert backend.connection is None
+
+
+@pytest.mark.anyio
+async def test_postgres_backend_stop_ignores_its_own_termination(mocker: MockerFixture):
+    connection = listening_connection(mocker)
+    mocker.patch("asyncpg.connect", return_value=connection)
+    backend = PostgresBackend("postgresql://localhost/test")
+    await backend.start()
+
+    await backend.stop()
+    backend._on_termination(connection)
+
+    connection.remove_termination_listener.assert_called_once_with(backend._on_termination)
+    assert backend._reconnect_task is None
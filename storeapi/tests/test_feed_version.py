@@ -0,0 +1,26 @@
+import pytest
+from databases import Database
+from pytest_mock import MockerFixture
+
+from storeapi import feed_version as feed_version_module
+from storeapi.feed_version import bump_feed_version, select_feed_version
+
+
+@pytest.mark.anyio
+async def test_bump_feed_version(db: Database):
+    version = await db.fetch_val(select_feed_version)
+
+    await bump_feed_version(db)
+
+    assert await db.fetch_val(select_feed_version) == version + 1
+
+
+@pytest.mark.anyio
+async def test_bump_feed_version_failure_is_logged(mocker: MockerFixture):
+    database = mocker.AsyncMock()
+    database.execute.side_effect = OSError("connection refused")
+    spy = mocker.spy(feed_version_module.logger, "exception")
+
+    await bump_feed_version(database)
+
+    spy.assert_called_once()
@@ -0,0 +1,132 @@
+import asyncio
+import datetime
+
+import pytest
+from databases import Database
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi import hot_scores as hot_scores_module
+from storeapi.database import post_score_table
+from storeapi.hot_scores import HotScores, hot_score
+from storeapi.tests.helpers import create_comment, create_post, like_post
+
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def test_hot_score_trades_activity_for_age():
+    earlier = NOW - datetime.timedelta(seconds=45000)
+
+    assert hot_score(10, 0, earlier, 45000, 2) == pytest.approx(hot_score(1, 0, NOW, 45000, 2))
+    assert hot_score(0, 0, NOW, 45000, 2) > hot_score(0, 0, earlier, 45000, 2)
+    assert hot_score(0, 1, NOW, 45000, 2) == hot_score(2, 0, NOW, 45000, 2)
+    assert hot_score(0, 0, NOW.replace(tzinfo=None), 45000, 2) == hot_score(0, 0, NOW, 45000, 2)
+
+
+async def scores(db: Database) -> dict:
+    return {row.post_id: row.score for row in await db.fetch_all(post_score_table.select())}
+
+
+@pytest.mark.anyio
+async def test_refresh_scores_recent_posts(
+        db: Database, async_client: AsyncClient, logged_in_token: str, created_post: dict
+):
+    newer = await create_post("Newer", async_client, logged_in_token)
+    for _ in range(10):
+        await like_post(created_post["id"], async_client, logged_in_token)
+
+    assert await HotScores(db, decay_seconds=3600).refresh() == 2
+
+    hot = await scores(db)
+    assert hot[created_post["id"]] > hot[newer["id"]]
+
+
+@pytest.mark.anyio
+async def test_refresh_only_rescores_changed_posts(
+        db: Database, async_client: AsyncClient, logged_in_token: str, created_post: dict
+):
+    quiet = await create_post("Quiet", async_client, logged_in_token)
+    scorer = HotScores(db)
+    await scorer.refresh()
+    before = await scores(db)
+
+    assert await scorer.refresh() == 0
+
+    await create_comment("Nice", created_post["id"], async_client, logged_in_token)
+
+    assert await scorer.refresh() == 1
+    after = await scores(db)
+    assert after[created_post["id"]] > before[created_post["id"]]
+    assert after[quiet["id"]] == before[quiet["id"]]
+
+
+@pytest.mark.anyio
+async def test_refresh_drops_posts_outside_window(
+        db: Database, async_client: AsyncClient, logged_in_token: str, created_post: dict
+):
+    scorer = HotScores(db, window_hours=1)
+    await scorer.refresh()
+
+    later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=2)
+
+    assert await scorer.refresh(now=later) == 0
+    assert await scores(db) == {}
+
+
+@pytest.mark.anyio
+async def test_refresh_skips_while_another_worker_holds_the_lock(db: Database, mocker: MockerFixture):
+    scorer = HotScores(db)
+    mocker.patch.object(db.url.__class__, "dialect", new_callable=mocker.PropertyMock, return_value="postgresql")
+    fetch_val = mocker.patch.object(db, "fetch_val", return_value=False)
+    fetch_all = mocker.spy(db, "fetch_all")
+
+    assert await scorer.refresh() == 0
+
+    assert fetch_val.await_args.args[0] is hot_scores_module.try_advisory_lock
+    fetch_all.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_periodic_refresh_logs_failures(db: Database, mocker: MockerFixture):
+    scorer = HotScores(db, interval=0.01)
+    mocker.patch.object(scorer, "refresh", side_effect=[OSError("database down"), 0], autospec=True)
+    spy = mocker.spy(hot_scores_module.logger, "exception")
+
+    await scorer.start()
+    while scorer.refresh.call_count < 2:
+        await asyncio.sleep(0.01)
+    await scorer.stop()
+
+    spy.assert_called_once()
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_hot(
+        db: Database, async_client: AsyncClient, logged_in_token: str, created_post: dict
+):
+    newer = await create_post("Newer", async_client, logged_in_token)
+    for _ in range(10):
+        await like_post(created_post["id"], async_client, logged_in_token)
+
+    response = await async_client.get("/post", params={"sorting": "hot"})
+    assert response.json() == []
+    etag = response.headers["ETag"]
+
+    await HotScores(db, decay_seconds=3600).refresh()
+    response = await async_client.get("/post", params={"sorting": "hot"}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()] == [created_post["id"], newer["id"]]
+    assert response.json()[0]["likes"] == 10
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_hot_fields(
+        db: Database, async_client: AsyncClient, logged_in_token: str, created_post: dict
+):
+    await like_post(created_post["id"], async_client, logged_in_token)
+    await HotScores(db).refresh()
+
+    response = await async_client.get("/post", params={"sorting": "hot", "fields": "likes"})
+
+    assert response.json() == [{"id": created_post["id"], "likes": 1}]
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from databases import Database
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi import like_buffer as like_buffer_module
+from storeapi.config import config
+from storeapi.database import like_table, post_table
+from storeapi.feed_version import select_feed_version
+from storeapi.like_buffer import LikeBuffer, like_buffer
+from storeapi.metrics import like_buffer_dropped
+
+
+async def count_likes(db: Database) -> int:
+    return len(await db.fetch_all(like_table.select()))
+
+
+@pytest.mark.anyio
+async def test_flush_writes_batch(db: Database, created_post: dict, registered_user: dict):
+    buffer = LikeBuffer(db, batch_size=2)
+    for _ in range(3):
+        await buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]})
+
+    assert await buffer.flush() == 2
+    assert await count_likes(db) == 2
+    assert len(buffer.pending) == 1
+
+
+@pytest.mark.anyio
+async def test_flush_bumps_post_version(db: Database, created_post: dict, registered_user: dict):
+    buffer = LikeBuffer(db)
+    feed_version = await db.fetch_val(select_feed_version)
+    await buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]})
+    await buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]})
+    await buffer.flush()
+
+    version = await db.fetch_val(post_table.select().with_only_columns(post_table.c.version))
+    assert version == 2
+    assert await db.fetch_val(select_feed_version) == feed_version + 1
+
+
+@pytest.mark.anyio
+async def test_full_buffer_flushes_before_adding(db: Database, created_post: dict, registered_user: dict):
+    buffer = LikeBuffer(db, batch_size=10, max_size=2)
+    for _ in range(3):
+        await buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]})
+
+    assert await count_likes(db) == 2
+    assert len(buffer.pending) == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_adds_never_exceed_max_size(
+        db: Database, created_post: dict, registered_user: dict, mocker: MockerFixture
+):
+    execute = db.execute
+
+    async def slow_execute(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return await execute(*args, **kwargs)
+
+    mocker.patch.object(db, "execute", side_effect=slow_execute)
+    depth = mocker.spy(like_buffer_module.like_buffer_depth, "set")
+    buffer = LikeBuffer(db, batch_size=10, max_size=2)
+
+    await asyncio.gather(*(
+        buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]}) for _ in range(10)
+    ))
+    mocker.stopall()
+
+    assert max(call.args[0] for call in depth.call_args_list) <= 2
+    assert await count_likes(db) + len(buffer.pending) == 10
+
+
+@pytest.mark.anyio
+async def test_stop_drains_buffer(db: Database, created_post: dict, registered_user: dict):
+    buffer = LikeBuffer(db, batch_size=2, flush_interval=60)
+    await buffer.start()
+    for _ in range(5):
+        await buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]})
+
+    await buffer.stop()
+
+    assert await count_likes(db) == 5
+    assert buffer.pending == []
+
+
+@pytest.mark.anyio
+async def test_stop_waits_for_flush_in_progress(
+        db: Database, created_post: dict, registered_user: dict, mocker: MockerFixture
+):
+    execute = db.execute
+    flushing = asyncio.Event()
+
+    async def slow_execute(*args, **kwargs):
+        flushing.set()
+        await asyncio.sleep(0.05)
+        return await execute(*args, **kwargs)
+
+    buffer = LikeBuffer(db, batch_size=1, flush_interval=60)
+    await buffer.start()
+    mocker.patch.object(db, "execute", side_effect=slow_execute)
+    await buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]})
+    await asyncio.wait_for(flushing.wait(), 1)
+
+    await buffer.stop()
+    mocker.stopall()
+
+    assert await count_likes(db) == 1
+    assert buffer.pending == []
+
+
+@pytest.mark.anyio
+async def test_periodic_flush(db: Database, created_post: dict, registered_user: dict):
+    buffer = LikeBuffer(db, flush_interval=0.01)
+    await buffer.start()
+    await buffer.add({"post_id": created_post["id"], "user_id": registered_user["id"]})
+    await asyncio.sleep(0.1)
+    await buffer.stop()
+
+    assert await count_likes(db) == 1
+
+
+@pytest.mark.anyio
+async def test_failed_batch_is_dropped(db: Database, registered_user: dict, mocker: MockerFixture):
+    spy = mocker.spy(like_buffer_module.logger, "exception")
+    dropped = like_buffer_dropped.values.get((), 0)
+    buffer = LikeBuffer(db)
+    await buffer.add({"post_id": 1, "user_id": registered_user["id"], "no_such_column": 1})
+
+    assert await buffer.flush() == 0
+    assert buffer.pending == []
+    assert like_buffer_dropped.values[()] == dropped + 1
+    spy.assert_called_once()
+
+
+@pytest.mark.anyio
+async def test_like_post_buffered(
+    async_client: AsyncClient, db: Database, created_post: dict, logged_in_token: str, mocker: MockerFixture
+):
+    mocker.patch.object(config, "LIKE_BUFFER_ENABLED", True)
+    mocker.patch.object(like_buffer, "pending", [])
+
+    response = await async_client.post(
+        "/like", json={"post_id": created_post["id"]}, headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 202
+    assert response.json()["post_id"] == created_post["id"]
+    assert await count_likes(db) == 0
+
+    await like_buffer.flush()
+    response = await async_client.get(f'/post/{created_post["id"]}')
+    assert response.json()["post"]["likes"] == 1
+
+
+@pytest.mark.anyio
+async def test_like_missing_post_buffered(async_client: AsyncClient, logged_in_token: str, mocker: MockerFixture):
+    mocker.patch.object(config, "LIKE_BUFFER_ENABLED", True)
+
+    response = await async_client.post(
+        "/like", json={"post_id": 2}, headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 404
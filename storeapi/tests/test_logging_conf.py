@@ -0,0 +1,186 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+import pytest
+from asgi_correlation_id.context import correlation_id
+from pytest_mock import MockerFixture
+from pythonjsonlogger import jsonlogger
+
+from storeapi import logging_conf
+from storeapi.config import config
+from storeapi.logging_conf import (
+    BoundedQueueHandler,
+    BoundedQueueListener,
+    EmailObfuscationFilter,
+    JsonFormatter,
+    RequestSamplingFilter,
+    configure_logging,
+    dropped_log_records,
+    obfuscated,
+    stop_logging,
+)
+
+
+def make_record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("storeapi", logging.INFO, __file__, 1, message, None, None)
+
+
+def test_obfuscated():
+    assert obfuscated("test@example.com", 2) == "te**@example.com"
+
+
+def test_bounded_queue_handler_drop_newest():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), drop_policy="drop_newest")
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+
+    assert handler.dropped_records == 1
+    assert handler.queue.get_nowait().getMessage() == "first"
+
+
+def test_bounded_queue_handler_drop_oldest():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), drop_policy="drop_oldest")
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+
+    assert handler.dropped_records == 1
+    assert handler.queue.get_nowait().getMessage() == "second"
+
+
+@pytest.fixture()
+def queue_logging(mocker: MockerFixture, tmp_path):
+    mocker.patch.object(config, "LOG_QUEUE_ENABLED", True)
+    mocker.patch.object(config, "LOG_FILE", str(tmp_path / "storeapi.log"))
+    configure_logging()
+    yield
+    stop_logging()
+
+
+def test_configure_logging_queue_mode(queue_logging, mocker: MockerFixture):
+    storeapi_logger = logging.getLogger("storeapi")
+    queue_handler = storeapi_logger.handlers[0]
+
+    assert len(storeapi_logger.handlers) == 1
+    assert isinstance(queue_handler, BoundedQueueHandler)
+    assert [type(f).__name__ for f in queue_handler.filters] == [
+        "RequestSamplingFilter", "CorrelationIdFilter", "EmailObfuscationFilter"
+    ]
+
+    listener = next(lst for lst in logging_conf._queue_listeners if lst.queue is queue_handler.queue)
+    emit = mocker.spy(listener.handlers[1], "emit")
+    logging.getLogger("storeapi.tests").info("Queued message", extra={"email": "test@example.com"})
+    stop_logging()
+
+    record = emit.call_args[0][0]
+    assert record.getMessage() == "Queued message"
+    assert record.correlation_id == "-"
+    assert record.email == "****@example.com"
+    assert dropped_log_records() == 0
+
+
+def test_stop_logging_restores_handlers(queue_logging):
+    stop_logging()
+    storeapi_logger = logging.getLogger("storeapi")
+
+    assert not any(isinstance(handler, BoundedQueueHandler) for handler in storeapi_logger.handlers)
+    assert all(handler.filters for handler in storeapi_logger.handlers)
+
+
+def test_email_obfuscation_runs_once_per_record():
+    email_filter = EmailObfuscationFilter(obfuscated_length=2)
+    record = make_record("message")
+    record.email = "test@example.com"
+
+    email_filter.filter(record)
+    email_filter.filter(record)
+
+    assert record.email == "te**@example.com"
+
+
+@pytest.mark.parametrize("sample_rate, expected", [(0.0, False), (1.0, True)])
+def test_request_sampling_filter(sample_rate: float, expected: bool):
+    sampling_filter = RequestSamplingFilter(sample_rate=sample_rate)
+    token = correlation_id.set("a" * 32)
+    try:
+        assert sampling_filter.filter(make_record("message")) is expected
+    finally:
+        correlation_id.reset(token)
+
+
+def test_request_sampling_filter_is_consistent_per_request():
+    sampling_filter = RequestSamplingFilter(sample_rate=0.5)
+    decisions = set()
+    token = correlation_id.set("b" * 32)
+    try:
+        for _ in range(10):
+            decisions.add(sampling_filter.filter(make_record("message")))
+    finally:
+        correlation_id.reset(token)
+
+    assert len(decisions) == 1
+
+
+def test_request_sampling_filter_keeps_warnings_and_records_outside_requests():
+    sampling_filter = RequestSamplingFilter(sample_rate=0.0)
+    warning = make_record("warning")
+    warning.levelno = logging.WARNING
+
+    assert sampling_filter.filter(make_record("startup"))
+
+    token = correlation_id.set("c" * 32)
+    try:
+        assert sampling_filter.filter(warning)
+    finally:
+        correlation_id.reset(token)
+
+
+def test_bounded_queue_listener_stops_with_full_queue():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record("message"))
+    target = logging.handlers.BufferingHandler(capacity=10)
+    listener = BoundedQueueListener(handler.queue, target)
+
+    listener.start()
+    listener.stop()
+
+    assert [record.getMessage() for record in target.buffer] == ["message"]
+
+
+def json_records() -> list[logging.LogRecord]:
+    plain = logging.LogRecord("storeapi.post", logging.INFO, __file__, 10, "Finding post with id: %s", (1,), None)
+    with_extras = make_record("Creating access token")
+    with_extras.email = "****@example.com"
+    with_extras.color_message = "Query: %s"
+    with_dict = logging.LogRecord("storeapi.post", logging.DEBUG, __file__, 12, {"id": 1, "likes": 0}, None, None)
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        with_exception = logging.LogRecord(
+            "storeapi.main", logging.ERROR, __file__, 14, "Failed", None, sys.exc_info()
+        )
+
+    records = [plain, with_extras, with_dict, with_exception]
+    for record in records:
+        record.correlation_id = "0123abcd"
+    return records
+
+
+@pytest.mark.parametrize("record", json_records())
+def test_json_formatter_matches_python_json_logger(record: logging.LogRecord):
+    reference = jsonlogger.JsonFormatter(
+        "%(asctime)s %(msecs)03d %(levelname)-8s %(correlation_id)s %(name)s %(lineno)d %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    formatter = JsonFormatter(datefmt="%Y-%m-%d %H:%M:%S")
+
+    assert json.loads(formatter.format(record)) == json.loads(reference.format(record))
+
+
+def test_json_formatter_without_orjson(mocker: MockerFixture):
+    mocker.patch.object(logging_conf, "orjson", None)
+    record = json_records()[1]
+
+    assert json.loads(JsonFormatter().format(record))["email"] == "****@example.com"
@@ -0,0 +1,80 @@
+import pytest
+from httpx import AsyncClient
+
+from storeapi.metrics import Counter, Gauge, Histogram, track_in_progress
+
+
+def test_counter_render():
+    counter = Counter("requests_total", "Requests.", ("method",))
+    counter.inc(("GET",))
+    counter.inc(("GET",))
+
+    assert counter.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{method="GET"} 2'
+    )
+
+
+def test_counter_function():
+    counter = Counter("timeouts_total", "Timeouts.", function=lambda: 2)
+
+    assert counter.render() == "# HELP timeouts_total Timeouts.\n# TYPE timeouts_total counter\ntimeouts_total 2"
+
+
+def test_gauge_function():
+    gauge = Gauge("queue_depth", "Depth.", function=lambda: 3)
+
+    assert 'queue_depth 3' in gauge.render()
+
+
+def test_gauge_function_without_value():
+    gauge = Gauge("pool_size", "Size.", function=lambda: None)
+
+    assert gauge.render() == "# HELP pool_size Size.\n# TYPE pool_size gauge"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    rendered = histogram.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in rendered
+    assert 'latency_seconds_bucket{le="1.0"} 2' in rendered
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in rendered
+    assert "latency_seconds_sum 5.55" in rendered
+    assert "latency_seconds_count 3" in rendered
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors.", ("detail",))
+    counter.inc(('say "hi"\n',))
+
+    assert 'errors_total{detail="say \\"hi\\"\\n"} 1' in counter.render()
+
+
+@pytest.mark.anyio
+async def test_track_in_progress():
+    gauge_values = []
+
+    @track_in_progress("test_task")
+    async def task():
+        from storeapi.metrics import background_tasks_in_progress
+        gauge_values.append(background_tasks_in_progress.values[("test_task",)])
+
+    await task()
+
+    assert gauge_values == [1]
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint(async_client: AsyncClient, created_post: dict):
+    await async_client.get(f"/post/{created_post['id']}")
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/post/{post_id}",status="200"}' in response.text
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/post",le="+Inf"}' in response.text
+    assert "# TYPE log_records_dropped_total counter" in response.text
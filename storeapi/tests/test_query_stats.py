@@ -0,0 +1,61 @@
+import pytest
+from databases import Database
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi import query_stats as query_stats_module
+from storeapi.config import config
+from storeapi.database import post_table, user_table
+from storeapi.query_stats import QueryStats, query_stats
+
+
+def track_queries() -> QueryStats:
+    # Set inside the test itself: fixtures run in a different context.
+    stats = QueryStats()
+    query_stats.set(stats)
+    return stats
+
+
+@pytest.mark.anyio
+async def test_queries_are_counted(db: Database):
+    stats = track_queries()
+    await db.fetch_all(post_table.select())
+    await db.fetch_one(post_table.select().where(post_table.c.id == 1))
+
+    assert stats.count == 2
+    assert stats.duration > 0
+
+
+@pytest.mark.anyio
+async def test_repeated_statement_is_flagged(db: Database, mocker: MockerFixture):
+    stats = track_queries()
+    mocker.patch.object(config, "DB_REPEATED_QUERY_THRESHOLD", 3)
+    spy = mocker.spy(query_stats_module.logger, "warning")
+
+    for post_id in range(4):
+        await db.fetch_one(post_table.select().where(post_table.c.id == post_id))
+
+    assert len(stats.statements) == 1
+    n_plus_one = [call for call in spy.call_args_list if "possible N+1" in call.args[0]]
+    assert len(n_plus_one) == 1
+    assert n_plus_one[0].args[1] == 3
+
+
+@pytest.mark.anyio
+async def test_slow_query_is_logged_without_passwords(db: Database, mocker: MockerFixture):
+    mocker.patch.object(config, "DB_SLOW_QUERY_MS", 0)
+    spy = mocker.spy(query_stats_module.logger, "warning")
+
+    await db.execute(user_table.insert().values(email="slow@example.com", password="hash"))
+
+    message, _, _, params = spy.call_args.args
+    assert message.startswith("Slow query")
+    assert params["email"] == "slow@example.com"
+    assert params["password"] == "***"
+
+
+@pytest.mark.anyio
+async def test_server_timing_header(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get(f"/post/{created_post['id']}")
+
+    assert response.headers["server-timing"].endswith('desc="3 queries"')
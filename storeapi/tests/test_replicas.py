@@ -0,0 +1,147 @@
+import time
+
+import pytest
+import sqlalchemy
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi.database import (
+    TunedSQLiteDatabase,
+    database,
+    feed_version_table,
+    metadata,
+    post_table,
+    read_database,
+    user_table,
+)
+from storeapi.replicas import ReadRouter, use_primary
+
+
+def create_replica_db(url: str, body: str = "From replica", feed_version: int = 0) -> None:
+    engine = sqlalchemy.create_engine(url)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(user_table.insert().values(id=1, email="replica@example.com", password="x"))
+        connection.execute(post_table.insert().values(id=1, body=body, user_id=1))
+        connection.execute(feed_version_table.update().values(version=feed_version))
+    engine.dispose()
+
+
+@pytest.fixture()
+async def replica(tmp_path, mocker: MockerFixture):
+    url = f"sqlite:///{tmp_path}/replica.db"
+    create_replica_db(url)
+
+    replica = TunedSQLiteDatabase(url)
+    router = ReadRouter(database, [replica], sticky_seconds=60, retry_seconds=60)
+    mocker.patch.object(read_database, "replicas", router.replicas)
+    mocker.patch.object(read_database, "recent_writers", {})
+    await replica.connect()
+    yield replica
+    await replica.disconnect()
+
+
+@pytest.mark.anyio
+async def test_reads_use_replica(replica):
+    assert await read_database.fetch_val(post_table.select().with_only_columns(post_table.c.body)) == "From replica"
+
+
+@pytest.mark.anyio
+async def test_reads_use_primary_without_replicas():
+    assert await read_database.fetch_one(post_table.select()) is None
+
+
+@pytest.mark.anyio
+async def test_use_primary_skips_replica(replica):
+    use_primary.set(True)
+
+    assert await read_database.fetch_one(post_table.select()) is None
+
+
+@pytest.mark.anyio
+async def test_unhealthy_replica_falls_back_to_primary(replica, mocker: MockerFixture):
+    mocker.patch.object(replica, "fetch_all", side_effect=OSError("replica down"))
+
+    assert await read_database.fetch_all(post_table.select()) == []
+    assert read_database.status()[0]["healthy"] is False
+
+    # The replica is skipped until the retry window has passed.
+    replica.fetch_all.reset_mock()
+    await read_database.fetch_all(post_table.select())
+    replica.fetch_all.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_get_posts_reads_from_replica(async_client: AsyncClient, replica):
+    response = await async_client.get("/post")
+
+    assert [post["body"] for post in response.json()] == ["From replica"]
+
+
+@pytest.mark.anyio
+async def test_reads_after_write_stick_to_primary(async_client: AsyncClient, logged_in_token: str, replica):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    await async_client.post("/post", json={"body": "From primary"}, headers=headers)
+
+    own_feed = await async_client.get("/post", headers=headers)
+    async_client.cookies.clear()
+    anonymous_feed = await async_client.get("/post")
+
+    assert [post["body"] for post in own_feed.json()] == ["From primary"]
+    assert [post["body"] for post in anonymous_feed.json()] == ["From replica"]
+
+
+@pytest.mark.anyio
+async def test_each_request_reads_from_one_replica(async_client: AsyncClient, replica, tmp_path, mocker: MockerFixture):
+    # The second replica is further along: a newer feed version and another body.
+    url = f"sqlite:///{tmp_path}/replica2.db"
+    create_replica_db(url, body="From newer replica", feed_version=1)
+    newer = TunedSQLiteDatabase(url)
+    router = ReadRouter(database, [replica, newer])
+    mocker.patch.object(read_database, "replicas", router.replicas)
+    await newer.connect()
+    try:
+        responses = [await async_client.get("/post") for _ in range(4)]
+    finally:
+        await newer.disconnect()
+
+    bodies = {response.headers["etag"]: response.json()[0]["body"] for response in responses}
+    assert bodies == {'W/"feed-new-0"': "From replica", 'W/"feed-new-1"': "From newer replica"}
+
+
+@pytest.mark.anyio
+async def test_replica_reconnects_after_retry_window(tmp_path, mocker: MockerFixture):
+    url = f"sqlite:///{tmp_path}/replica.db"
+    create_replica_db(url)
+    replica = TunedSQLiteDatabase(url)
+    router = ReadRouter(database, [replica], retry_seconds=60)
+    real_connect = replica.connect
+    connect = mocker.patch.object(replica, "connect", side_effect=OSError("replica down"))
+    await router.connect()
+
+    assert await router.fetch_one(post_table.select()) is None
+
+    connect.side_effect = real_connect
+    router.replicas[0].unhealthy_until = time.monotonic() - 1
+    try:
+        assert await router.fetch_val(post_table.select().with_only_columns(post_table.c.body)) == "From replica"
+        assert router.status()[0]["healthy"] is True
+    finally:
+        await replica.disconnect()
+
+
+@pytest.mark.anyio
+async def test_anonymous_reads_after_write_stick_to_primary(
+    async_client: AsyncClient, replica, mocker: MockerFixture
+):
+    # Only the cookie says this client wrote, not its address.
+    mocker.patch.object(read_database, "wrote_recently", return_value=False)
+
+    response = await async_client.post("/register", json={"email": "new@example.com", "password": "1234"})
+    own_feed = await async_client.get("/post")
+    async_client.cookies.clear()
+    other_feed = await async_client.get("/post")
+
+    assert "storeapi_wrote=1" in response.headers["set-cookie"]
+    assert own_feed.json() == []
+    assert [post["body"] for post in other_feed.json()] == ["From replica"]
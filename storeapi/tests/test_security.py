@@ -4,18 +4,20 @@ from jose import jwt
 from pytest_mock import MockerFixture
 
 from storeapi.security import (
-    get_user,
-    get_password_hash,
-    verify_password,
-    get_subject_for_token_type,
+    ALGORITHM,
+    SECRET_KEY,
     access_token_expires_minute,
+    authenticate_user,
     confirm_token_expires_minute,
-    create_confirmation_token,
     create_access_token,
-    authenticate_user,
+    create_confirmation_token,
+    create_upload_token,
     get_current_user,
-    SECRET_KEY,
-    ALGORITHM
+    get_password_hash,
+    get_payload_for_token_type,
+    get_subject_for_token_type,
+    get_user,
+    verify_password,
 )
 
 
@@ -55,6 +57,14 @@ def test_get_subject_for_token_type_valid_access():
     assert email == get_subject_for_token_type(token, "access")
 
 
+def test_get_payload_for_token_type_upload():
+    token = create_upload_token('a@b2.com', 'abc/my_file.png')
+    payload = get_payload_for_token_type(token, "upload")
+
+    assert payload['sub'] == 'a@b2.com'
+    assert payload['file_name'] == 'abc/my_file.png'
+
+
 def test_get_subject_for_token_type_expired(mocker: MockerFixture):
     mocker.patch('storeapi.security.access_token_expires_minute', return_value=-1)
     email = 'a@b2.com'
@@ -0,0 +1,75 @@
+import collections
+import random
+
+import pytest
+import sqlalchemy
+
+from storeapi.database import (
+    comment_table,
+    like_table,
+    metadata,
+    post_table,
+    user_table,
+)
+from storeapi.security import verify_password
+from storeapi.seed import DEFAULT_PASSWORD, ZipfSampler, seed
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path}/seed.db")
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def rows(engine, table) -> list:
+    # created_at is wall-clock time, so it is not part of the generated data.
+    columns = [column for column in table.c if column.name != "created_at"]
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(sqlalchemy.select(*columns).order_by(table.c.id))]
+
+
+def test_seed_loads_requested_rows(engine):
+    counts = seed(engine, users=20, posts=50, comments=200, likes=500, batch_size=64)
+
+    assert counts == {"users": 20, "posts": 50, "comments": 200, "likes": 500}
+    assert [len(rows(engine, table)) for table in (user_table, post_table, comment_table, like_table)] == [
+        20, 50, 200, 500
+    ]
+
+
+def test_seeded_users_can_log_in(engine):
+    seed(engine, users=3, posts=1, comments=0, likes=0)
+
+    users = rows(engine, user_table)
+    assert len({user[2] for user in users}) == 1
+    assert verify_password(DEFAULT_PASSWORD, users[0][2])
+    assert all(user[3] for user in users)
+
+
+def test_seed_is_deterministic(tmp_path):
+    results = []
+    for name in ("first", "second"):
+        engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path}/{name}.db")
+        metadata.create_all(engine)
+        seed(engine, users=10, posts=20, comments=50, likes=100, seed=42)
+        results.append([rows(engine, table) for table in (post_table, comment_table, like_table)])
+        engine.dispose()
+
+    assert results[0] == results[1]
+
+
+def test_seed_appends_after_existing_rows(engine):
+    seed(engine, users=5, posts=5, comments=5, likes=5)
+    seed(engine, users=5, posts=5, comments=5, likes=5, seed=1)
+
+    assert [user[0] for user in rows(engine, user_table)] == list(range(1, 11))
+    assert all(1 <= like[1] <= 10 for like in rows(engine, like_table))
+
+
+def test_zipf_sampler_is_skewed():
+    sampler = ZipfSampler(100, 1.1, random.Random(0))
+    counts = collections.Counter(sampler() for _ in range(10_000)).most_common()
+
+    assert counts[0][1] > 10 * counts[len(counts) // 2][1]
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from storeapi.database import read_database
+from storeapi.metrics import coalesced_requests_total, coalesced_waiters_per_flight
+from storeapi.routers.post import coalesced_read
+from storeapi.singleflight import SingleFlight
+
+
+class SlowQuery:
+    def __init__(self, result=None, error: Exception = None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+async def start(flight: SingleFlight, query: SlowQuery, key="post-1", count: int = 5) -> list:
+    tasks = [asyncio.ensure_future(flight.do("post", key, query)) for _ in range(count)]
+    await asyncio.sleep(0)
+    return tasks
+
+
+@pytest.mark.anyio
+async def test_concurrent_calls_share_one_query():
+    flight = SingleFlight()
+    query = SlowQuery(result=["row"])
+    tasks = await start(flight, query)
+
+    assert flight.in_flight() == {"post post-1": 4}
+    query.release.set()
+
+    assert await asyncio.gather(*tasks) == [["row"]] * 5
+    assert query.calls == 1
+    assert flight.in_flight() == {}
+
+
+@pytest.mark.anyio
+async def test_different_keys_run_separately():
+    flight = SingleFlight()
+    query = SlowQuery()
+    tasks = await start(flight, query, key="post-1", count=2) + await start(flight, query, key="post-2", count=2)
+    query.release.set()
+    await asyncio.gather(*tasks)
+
+    assert query.calls == 2
+
+
+@pytest.mark.anyio
+async def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    query = SlowQuery(error=OSError("database went away"))
+    tasks = await start(flight, query, count=3)
+    query.release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert [type(result) for result in results] == [OSError] * 3
+    assert flight.in_flight() == {}
+
+
+@pytest.mark.anyio
+async def test_next_call_after_error_runs_again():
+    flight = SingleFlight()
+    failing = SlowQuery(error=OSError("database went away"))
+    failing.release.set()
+    with pytest.raises(OSError):
+        await flight.do("post", "post-1", failing)
+
+    working = SlowQuery(result="row")
+    working.release.set()
+
+    assert await flight.do("post", "post-1", working) == "row"
+
+
+@pytest.mark.anyio
+async def test_cancelled_leader_does_not_cancel_waiters():
+    flight = SingleFlight()
+    query = SlowQuery(result="row")
+    leader, *followers = await start(flight, query, count=3)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    query.release.set()
+
+    assert await asyncio.gather(*followers) == ["row", "row"]
+
+
+@pytest.mark.anyio
+async def test_waiter_metrics():
+    flight = SingleFlight()
+    query = SlowQuery()
+    leaders = coalesced_requests_total.values.get(("metrics-test", "leader"), 0)
+    tasks = [asyncio.ensure_future(flight.do("metrics-test", 1, query)) for _ in range(4)]
+    await asyncio.sleep(0)
+    query.release.set()
+    await asyncio.gather(*tasks)
+
+    assert coalesced_requests_total.values[("metrics-test", "leader")] == leaders + 1
+    assert coalesced_requests_total.values[("metrics-test", "follower")] >= 3
+    assert coalesced_waiters_per_flight.values[("metrics-test",)][1] >= 3
+
+
+@pytest.mark.anyio
+async def test_concurrent_post_requests_share_queries(
+    async_client: AsyncClient, created_post: dict, mocker: MockerFixture
+):
+    spy = mocker.spy(read_database, "fetch_one")
+
+    responses = await asyncio.gather(*(async_client.get(f'/post/{created_post["id"]}') for _ in range(5)))
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.text for response in responses}) == 1
+    # The post query ran fewer times than there were requests.
+    assert spy.call_count < 5
+
+
+@pytest.mark.anyio
+async def test_reads_for_a_new_version_do_not_join_older_flights(mocker: MockerFixture):
+    query = SlowQuery(result=[])
+
+    async def fetch_all(*args):
+        return await query()
+
+    mocker.patch.object(read_database, "fetch_all", side_effect=fetch_all)
+    old = asyncio.ensure_future(coalesced_read("feed", "fetch_all", "SELECT posts", version=(1,)))
+    await asyncio.sleep(0)
+    new = asyncio.ensure_future(coalesced_read("feed", "fetch_all", "SELECT posts", version=(2,)))
+    same = asyncio.ensure_future(coalesced_read("feed", "fetch_all", "SELECT posts", version=(2,)))
+    await asyncio.sleep(0)
+    query.release.set()
+    await asyncio.gather(old, new, same)
+
+    assert query.calls == 2
@@ -0,0 +1,62 @@
+import pytest
+import sqlalchemy
+
+from storeapi.database import (
+    metadata,
+    post_table,
+    post_tag_table,
+    tag_table,
+    user_table,
+)
+from storeapi.tags import extract_tags, normalize_tag, rebuild_post_tags
+
+
+@pytest.mark.parametrize(
+    "body, expected",
+    [
+        ("Hello #World and @Alice", ["#world", "@alice"]),
+        ("#python #Python #PYTHON", ["#python"]),
+        ("Mail bob@example.com or see example.com/#anchor", []),
+        ("##double #über", ["#über"]),
+        ("#" + "a" * 65, []),
+    ],
+)
+def test_extract_tags(body: str, expected: list):
+    assert extract_tags(body) == expected
+
+
+def test_extract_tags_limit():
+    assert extract_tags("#a #b #c", limit=2) == ["#a", "#b"]
+
+
+@pytest.mark.parametrize("tag, expected", [("Python", "#python"), ("#python", "#python"), ("@Alice", "@alice")])
+def test_normalize_tag(tag: str, expected: str):
+    assert normalize_tag(tag) == expected
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path}/tags.db")
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_rebuild_post_tags(engine):
+    with engine.begin() as connection:
+        connection.execute(user_table.insert().values(id=1, email="a@example.com"))
+        connection.execute(post_table.insert(), [
+            {"id": 1, "body": "#one #two", "user_id": 1},
+            {"id": 2, "body": "No tags", "user_id": 1},
+            {"id": 3, "body": "#two @a", "user_id": 1},
+        ])
+        connection.execute(tag_table.insert().values(id=10, name="#two"))
+
+    assert rebuild_post_tags(engine, batch_size=2) == 4
+    assert rebuild_post_tags(engine, batch_size=2) == 4
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            sqlalchemy.select(tag_table.c.name, post_tag_table.c.post_id).join(post_tag_table)
+        ).tuples().all()
+    assert sorted(rows) == [("#one", 1), ("#two", 1), ("#two", 3), ("@a", 3)]
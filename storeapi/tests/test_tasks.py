@@ -1,13 +1,21 @@
-import pytest
+import pathlib
+
 import httpx
+import pytest
 from databases import Database
+from PIL import Image
+from pytest_mock import MockerFixture
 
+from storeapi.config import config
 from storeapi.database import post_table
+from storeapi.feed_version import select_feed_version
+from storeapi.libs.images import shutdown_process_pool
 from storeapi.tasks import (
     APIResponseError,
-    send_simple_email,
     _generate_cute_creature_api,
+    add_image_variants_to_post,
     generate_and_add_to_post,
+    send_simple_email,
 )
 
 
@@ -80,3 +88,59 @@ async def test_generate_and_add_to_post(
     updated_post = await db.fetch_one(query)
 
     assert updated_post.image_url == json_data['output_url']
+
+
+@pytest.mark.anyio
+async def test_add_image_variants_to_post(mocker, created_post: dict, db: Database):
+    variants = {"thumbnail_webp": "http://example.com/thumbnail.webp"}
+    mocker.patch("storeapi.tasks.create_image_variants", return_value=variants)
+    feed_version = await db.fetch_val(select_feed_version)
+
+    await add_image_variants_to_post(created_post['id'], 'http://example.com/image.png', db)
+
+    query = post_table.select().where(post_table.c.id == created_post['id'])
+    updated_post = await db.fetch_one(query)
+
+    assert updated_post.image_variants == variants
+    assert await db.fetch_val(select_feed_version) == feed_version + 1
+
+
+@pytest.mark.anyio
+async def test_add_image_variants_to_post_download_error(mock_httpx_client, created_post: dict, db: Database):
+    mock_httpx_client.get.return_value = httpx.Response(
+        status_code=404, content="", request=httpx.Request("GET", "//")
+    )
+
+    assert await add_image_variants_to_post(created_post['id'], 'http://example.com/image.png', db) is None
+
+
+@pytest.mark.anyio
+async def test_add_image_variants_to_post_connection_error(mock_httpx_client, created_post: dict, db: Database):
+    mock_httpx_client.get.side_effect = httpx.ConnectError("connection refused")
+
+    assert await add_image_variants_to_post(created_post['id'], 'http://example.com/image.png', db) is None
+
+
+@pytest.mark.anyio
+async def test_add_image_variants_to_post_local_storage(
+    created_post: dict, db: Database, tmp_path: pathlib.Path, mocker: MockerFixture
+):
+    mocker.patch.object(config, "STORAGE_BACKEND", "local")
+    mocker.patch.object(config, "LOCAL_STORAGE_DIR", str(tmp_path))
+    (tmp_path / "upload").mkdir()
+    Image.new("RGB", (1200, 800), color="blue").save(tmp_path / "upload" / "image.png")
+
+    try:
+        variants = await add_image_variants_to_post(
+            created_post['id'], '/upload/local/upload/image.png', db, "upload/image.png"
+        )
+    finally:
+        shutdown_process_pool()
+
+    query = post_table.select().where(post_table.c.id == created_post['id'])
+    updated_post = await db.fetch_one(query)
+
+    assert variants["thumbnail_webp"] == f"/upload/local/posts/{created_post['id']}/thumbnail.webp"
+    assert updated_post.image_variants == variants
+    with Image.open(tmp_path / "posts" / str(created_post['id']) / "thumbnail.webp") as thumbnail:
+        assert thumbnail.format == "WEBP"
@@ -0,0 +1,77 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from storeapi.tracing import AdaptiveTracesSampler, TracesSamplerMiddleware, route_key
+
+
+@pytest.fixture()
+def sampler() -> AdaptiveTracesSampler:
+    return AdaptiveTracesSampler(
+        default_rate=0.5, route_rates={"GET /post": 0.01}, slow_request_ms=1000, boost_requests=2
+    )
+
+
+def sampling_context(method: str, path: str) -> dict:
+    return {"asgi_scope": {"type": "http", "method": method, "path": path}}
+
+
+@pytest.mark.parametrize(
+    "method, path, expected",
+    [
+        ("GET", "/post", "GET /post"),
+        ("GET", "/post/12", "GET /post/{id}"),
+        ("GET", "/post/12/comment", "GET /post/{id}/comment"),
+        ("GET", "/confirm/abc123", "GET /confirm/abc123"),
+        ("GET", "/post/{post_id}/comment", "GET /post/{id}/comment"),
+    ],
+)
+def test_route_key(method: str, path: str, expected: str):
+    assert route_key(method, path) == expected
+
+
+def test_sampler_route_rates(sampler: AdaptiveTracesSampler):
+    assert sampler(sampling_context("GET", "/post")) == 0.01
+    assert sampler(sampling_context("POST", "/post")) == 0.5
+
+
+def test_sampler_respects_parent_decision(sampler: AdaptiveTracesSampler):
+    assert sampler({**sampling_context("GET", "/post"), "parent_sampled": True}) == 1.0
+
+
+@pytest.mark.parametrize("status_code, duration_ms", [(500, 10), (200, 2000)])
+def test_sampler_boosts_after_errors_and_slow_requests(
+    sampler: AdaptiveTracesSampler, status_code: int, duration_ms: float
+):
+    sampler.record("GET /post", status_code, duration_ms)
+
+    assert sampler(sampling_context("GET", "/post")) == 1.0
+    assert sampler(sampling_context("GET", "/post")) == 1.0
+    assert sampler(sampling_context("GET", "/post")) == 0.01
+
+
+def test_sampler_ignores_fast_successful_requests(sampler: AdaptiveTracesSampler):
+    sampler.record("GET /post", 200, 10)
+
+    assert sampler(sampling_context("GET", "/post")) == 0.01
+
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+
+@pytest.mark.anyio
+async def test_middleware_records_matched_routes_only():
+    # Every request counts as slow, so each one it records is boosted.
+    sampler = AdaptiveTracesSampler(default_rate=0.5, route_rates={}, slow_request_ms=0, boost_requests=2)
+    app = Starlette(routes=[Route("/post/{post_id}", ok)])
+    app.add_middleware(TracesSamplerMiddleware, sampler=sampler)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        for path in ("/post/12", "/post/13", "/wp-login.php", "/.env", "/admin/setup"):
+            await client.get(path)
+
+    assert sampler.boosted == {"GET /post/{id}": 2}
+    assert sampler(sampling_context("GET", "/post/14")) == 1.0
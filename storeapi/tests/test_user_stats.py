@@ -0,0 +1,54 @@
+import collections
+
+import pytest
+import sqlalchemy
+
+from storeapi.database import (
+    comment_table,
+    like_table,
+    metadata,
+    post_table,
+    user_stats_table,
+)
+from storeapi.seed import seed
+from storeapi.user_stats import rebuild_user_stats
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path}/stats.db")
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def stats(engine) -> dict:
+    with engine.connect() as connection:
+        return {row.user_id: row[1:] for row in connection.execute(user_stats_table.select())}
+
+
+def test_rebuild_matches_tables(engine):
+    seed(engine, users=10, posts=40, comments=100, likes=200)
+
+    with engine.begin() as connection:
+        connection.execute(user_stats_table.update().values(post_count=999))
+
+    assert rebuild_user_stats(engine) == 10
+
+    with engine.connect() as connection:
+        authors = dict(connection.execute(sqlalchemy.select(post_table.c.id, post_table.c.user_id)).all())
+        posts = collections.Counter(authors.values())
+        comments = collections.Counter(connection.execute(sqlalchemy.select(comment_table.c.user_id)).scalars())
+        likes = collections.Counter(
+            authors[post_id] for post_id in connection.execute(sqlalchemy.select(like_table.c.post_id)).scalars()
+        )
+
+    assert stats(engine) == {
+        user_id: (posts[user_id], comments[user_id], likes[user_id]) for user_id in range(1, 11)
+    }
+
+
+def test_rebuild_includes_users_without_activity(engine):
+    seed(engine, users=3, posts=0, comments=0, likes=0)
+
+    assert stats(engine) == {1: (0, 0, 0), 2: (0, 0, 0), 3: (0, 0, 0)}
@@ -0,0 +1,197 @@
+"""Home timelines built from the follow graph.
+
+Posts by users with fewer than FEED_FANOUT_MAX_FOLLOWERS followers are
+fanned out on write: a single INSERT ... SELECT copies the post id into
+the timelines table of every follower (and the author). Posts by users
+with more followers are left out of timelines and fetched on read from
+the posts table, so one post by a popular account does not write
+thousands of rows. A home timeline page merges both sources by post id.
+When an unfollow takes a popular user back under the threshold, their
+recent posts are copied into their followers' timelines, since reads
+stop fetching them.
+"""
+import logging
+from typing import List, Optional
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from storeapi.config import config
+from storeapi.database import (
+    database,
+    follow_table,
+    post_table,
+    read_database,
+    timeline_table,
+    user_table,
+)
+from storeapi.db_backends import PreparedStatement
+
+logger = logging.getLogger(__name__)
+
+# Cursor used for the first page, newer than any post id.
+NEWEST = 2 ** 63 - 1
+
+
+def _insert_ignoring_conflicts(table: sqlalchemy.Table):
+    insert = postgresql.insert if database.url.dialect.startswith("postgres") else sqlite.insert
+    return insert(table).on_conflict_do_nothing()
+
+
+select_follower_count = PreparedStatement(
+    sqlalchemy.select(user_table.c.follower_count).where(user_table.c.id == sqlalchemy.bindparam("user_id"))
+)
+fan_out_to_followers = PreparedStatement(
+    timeline_table.insert().from_select(
+        ["user_id", "post_id"],
+        sqlalchemy.select(
+            follow_table.c.follower_id, sqlalchemy.bindparam("post_id", type_=sqlalchemy.Integer)
+        ).where(follow_table.c.followee_id == sqlalchemy.bindparam("author_id")),
+    )
+)
+insert_timeline_entry = PreparedStatement(
+    timeline_table.insert().values(user_id=sqlalchemy.bindparam("user_id"), post_id=sqlalchemy.bindparam("post_id"))
+)
+# Both return a row only when they changed something, so concurrent
+# requests for the same follow cannot count it twice.
+insert_follow = PreparedStatement(
+    _insert_ignoring_conflicts(follow_table)
+    .values(follower_id=sqlalchemy.bindparam("follower_id"), followee_id=sqlalchemy.bindparam("followee_id"))
+    .returning(follow_table.c.follower_id)
+)
+delete_follow = PreparedStatement(
+    follow_table.delete().where(
+        follow_table.c.follower_id == sqlalchemy.bindparam("follower_id"),
+        follow_table.c.followee_id == sqlalchemy.bindparam("followee_id"),
+    ).returning(follow_table.c.follower_id)
+)
+increment_follower_count = PreparedStatement(
+    user_table.update()
+    .where(user_table.c.id == sqlalchemy.bindparam("user_id"))
+    .values(follower_count=user_table.c.follower_count + 1)
+    .returning(user_table.c.follower_count)
+)
+decrement_follower_count = PreparedStatement(
+    user_table.update()
+    .where(user_table.c.id == sqlalchemy.bindparam("user_id"))
+    .values(follower_count=user_table.c.follower_count - 1)
+    .returning(user_table.c.follower_count)
+)
+backfill_timeline = PreparedStatement(
+    _insert_ignoring_conflicts(timeline_table).from_select(
+        ["user_id", "post_id"],
+        sqlalchemy.select(sqlalchemy.bindparam("follower_id", type_=sqlalchemy.Integer), post_table.c.id)
+        .where(post_table.c.user_id == sqlalchemy.bindparam("followee_id"))
+        .order_by(post_table.c.id.desc())
+        .limit(sqlalchemy.bindparam("limit", type_=sqlalchemy.Integer)),
+    )
+)
+recent_followee_posts = (
+    sqlalchemy.select(post_table.c.id)
+    .where(post_table.c.user_id == sqlalchemy.bindparam("followee_id"))
+    .order_by(post_table.c.id.desc())
+    .limit(sqlalchemy.bindparam("limit", type_=sqlalchemy.Integer))
+    .subquery()
+)
+backfill_followers = PreparedStatement(
+    _insert_ignoring_conflicts(timeline_table).from_select(
+        ["user_id", "post_id"],
+        sqlalchemy.select(follow_table.c.follower_id, recent_followee_posts.c.id)
+        .select_from(follow_table.join(recent_followee_posts, sqlalchemy.true()))
+        .where(follow_table.c.followee_id == sqlalchemy.bindparam("followee_id")),
+    )
+)
+remove_followee_posts = PreparedStatement(
+    timeline_table.delete().where(
+        timeline_table.c.user_id == sqlalchemy.bindparam("follower_id"),
+        timeline_table.c.post_id.in_(
+            sqlalchemy.select(post_table.c.id).where(post_table.c.user_id == sqlalchemy.bindparam("followee_id"))
+        ),
+    )
+)
+select_timeline_ids = PreparedStatement(
+    sqlalchemy.select(timeline_table.c.post_id)
+    .where(
+        timeline_table.c.user_id == sqlalchemy.bindparam("user_id"),
+        timeline_table.c.post_id < sqlalchemy.bindparam("before"),
+    )
+    .order_by(timeline_table.c.post_id.desc())
+    .limit(sqlalchemy.bindparam("limit"))
+)
+select_popular_followees = PreparedStatement(
+    sqlalchemy.select(follow_table.c.followee_id)
+    .select_from(follow_table.join(user_table, user_table.c.id == follow_table.c.followee_id))
+    .where(
+        follow_table.c.follower_id == sqlalchemy.bindparam("user_id"),
+        user_table.c.follower_count >= sqlalchemy.bindparam("threshold"),
+    )
+)
+
+
+def is_popular(follower_count: int) -> bool:
+    return follower_count >= config.FEED_FANOUT_MAX_FOLLOWERS
+
+
+async def fan_out_post(author_id: int, post_id: int) -> None:
+    """Deliver a new post to its author's timeline and, for most authors, their followers'."""
+    await database.execute(insert_timeline_entry, {"user_id": author_id, "post_id": post_id})
+
+    follower_count = await database.fetch_val(select_follower_count, {"user_id": author_id})
+    if is_popular(follower_count):
+        logger.debug("Post %s by popular user %s is fanned out on read", post_id, author_id)
+        return
+
+    await database.execute(fan_out_to_followers, {"author_id": author_id, "post_id": post_id})
+
+
+async def follow(follower_id: int, followee_id: int) -> bool:
+    """Follow followee_id, returning False if already following."""
+    values = {"follower_id": follower_id, "followee_id": followee_id}
+    async with database.transaction():
+        if await database.fetch_val(insert_follow, values) is None:
+            return False
+        follower_count = await database.fetch_val(increment_follower_count, {"user_id": followee_id})
+        if not is_popular(follower_count):
+            await database.execute(backfill_timeline, {**values, "limit": config.FEED_BACKFILL_POSTS})
+    return True
+
+
+async def unfollow(follower_id: int, followee_id: int) -> bool:
+    """Stop following followee_id, returning False if not following."""
+    values = {"follower_id": follower_id, "followee_id": followee_id}
+    async with database.transaction():
+        if await database.fetch_val(delete_follow, values) is None:
+            return False
+        follower_count = await database.fetch_val(decrement_follower_count, {"user_id": followee_id})
+        await database.execute(remove_followee_posts, values)
+
+        if is_popular(follower_count + 1) and not is_popular(follower_count):
+            logger.info("User %s is no longer popular, backfilling follower timelines", followee_id)
+            await database.execute(
+                backfill_followers, {"followee_id": followee_id, "limit": config.FEED_BACKFILL_POSTS}
+            )
+    return True
+
+
+async def timeline_post_ids(user_id: int, before: Optional[int], limit: int) -> List[int]:
+    """Newest post ids for a user's home timeline, older than before."""
+    values = {"user_id": user_id, "before": NEWEST if before is None else before, "limit": limit}
+    post_ids = {row[0] for row in await read_database.fetch_all(select_timeline_ids, values)}
+
+    popular = await read_database.fetch_all(
+        select_popular_followees, {"user_id": user_id, "threshold": config.FEED_FANOUT_MAX_FOLLOWERS}
+    )
+    if popular:
+        # The author list varies per user, so this one is not prepared.
+        query = (
+            sqlalchemy.select(post_table.c.id)
+            .where(
+                post_table.c.user_id.in_([row[0] for row in popular]),
+                post_table.c.id < values["before"],
+            )
+            .order_by(post_table.c.id.desc())
+            .limit(limit)
+        )
+        post_ids.update(row[0] for row in await read_database.fetch_all(query))
+
+    return sorted(post_ids, reverse=True)[:limit]
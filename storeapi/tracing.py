@@ -0,0 +1,112 @@
+import logging
+import re
+import time
+
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+# Numeric ids in request paths and parameters in route templates.
+ID_SEGMENT = re.compile(r"/(\d+|\{[^/}]+\})(?=/|$)")
+
+
+def route_key(method: str, path: str) -> str:
+    """Key a request path or route template, e.g. "/post/12" or "/post/{post_id}", as "GET /post/{id}"."""
+    return f"{method} {ID_SEGMENT.sub('/{id}', path)}"
+
+
+class AdaptiveTracesSampler:
+    """Sentry traces_sampler with per-route rates.
+
+    Routes are keyed as "METHOD /path" with numeric segments replaced by
+    {id}, e.g. "GET /post/{id}". When a request on a route fails with a 5xx
+    or is slower than slow_request_ms, the next boost_requests requests on
+    that route are always traced, so problems are captured even on routes
+    that are normally sampled rarely.
+    """
+
+    def __init__(
+            self, default_rate: float, route_rates: dict[str, float],
+            slow_request_ms: float, boost_requests: int
+    ):
+        self.default_rate = default_rate
+        self.route_rates = route_rates
+        self.slow_request_ms = slow_request_ms
+        self.boost_requests = boost_requests
+        self.boosted: dict[str, int] = {}
+
+    def __call__(self, sampling_context: dict) -> float:
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return float(parent_sampled)
+
+        scope = sampling_context.get("asgi_scope")
+        if not scope or scope.get("type") != "http":
+            return self.default_rate
+
+        key = route_key(scope["method"], scope["path"])
+        remaining = self.boosted.get(key)
+        if remaining:
+            if remaining == 1:
+                del self.boosted[key]
+            else:
+                self.boosted[key] = remaining - 1
+            return 1.0
+
+        return self.route_rates.get(key, self.default_rate)
+
+    def record(self, key: str, status_code: int, duration_ms: float) -> None:
+        if status_code >= 500 or duration_ms >= self.slow_request_ms:
+            logger.debug("Boosting trace sampling for %s", key)
+            self.boosted[key] = self.boost_requests
+
+
+traces_sampler = AdaptiveTracesSampler(
+    default_rate=config.SENTRY_TRACES_SAMPLE_RATE,
+    route_rates=config.SENTRY_ROUTE_SAMPLE_RATES,
+    slow_request_ms=config.SENTRY_SLOW_REQUEST_MS,
+    boost_requests=config.SENTRY_BOOST_REQUESTS,
+)
+
+
+class TracesSamplerMiddleware:
+    """Feeds the status and duration of routed requests back into the traces sampler."""
+
+    def __init__(self, app, sampler: AdaptiveTracesSampler = traces_sampler):
+        self.app = app
+        self.sampler = sampler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Keyed by the matched route so the boosted routes stay bounded;
+            # requests that match no route, such as 404 probes, are skipped.
+            route = scope.get("route")
+            if route is not None:
+                self.sampler.record(
+                    route_key(scope["method"], route.path), status_code, (time.perf_counter() - start) * 1000
+                )
+
+
+def init_sentry(**options) -> None:
+    # Imported here so processes without a DSN never load the SDK and its
+    # integrations.
+    import sentry_sdk
+
+    if config.SENTRY_PROFILING_ENABLED:
+        options.setdefault("profiles_sample_rate", config.SENTRY_PROFILES_SAMPLE_RATE)
+
+    sentry_sdk.init(dsn=config.SENTRY_DSN, traces_sampler=traces_sampler, **options)
@@ -0,0 +1,102 @@
+"""Incremental per-user aggregates.
+
+The write paths bump the counters in user_stats in the same transaction
+as the row they add, so profiles never need to scan posts, comments or
+likes. rebuild_user_stats recomputes every row from those tables, for
+existing databases or after counters drift:
+
+    python -m storeapi.user_stats
+"""
+import argparse
+import logging
+import time
+
+import sqlalchemy
+
+from storeapi.config import config
+from storeapi.database import (
+    comment_table,
+    like_table,
+    post_table,
+    user_stats_table,
+    user_table,
+)
+from storeapi.db_backends import PreparedStatement
+
+logger = logging.getLogger(__name__)
+
+insert_user_stats = PreparedStatement(
+    user_stats_table.insert().values(user_id=sqlalchemy.bindparam("user_id"))
+)
+increment_post_count = PreparedStatement(
+    user_stats_table.update()
+    .where(user_stats_table.c.user_id == sqlalchemy.bindparam("user_id"))
+    .values(post_count=user_stats_table.c.post_count + 1)
+)
+increment_comment_count = PreparedStatement(
+    user_stats_table.update()
+    .where(user_stats_table.c.user_id == sqlalchemy.bindparam("user_id"))
+    .values(comment_count=user_stats_table.c.comment_count + 1)
+)
+# Credits the author of post_id, so callers only need the post.
+increment_likes_received = PreparedStatement(
+    user_stats_table.update()
+    .where(
+        user_stats_table.c.user_id == sqlalchemy.select(post_table.c.user_id)
+        .where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+        .scalar_subquery()
+    )
+    .values(
+        likes_received=user_stats_table.c.likes_received + sqlalchemy.bindparam("likes", type_=sqlalchemy.Integer)
+    )
+)
+
+
+def _count_per_user(user_id_column, select_from=None) -> sqlalchemy.Subquery:
+    query = sqlalchemy.select(user_id_column.label("user_id"), sqlalchemy.func.count().label("count"))
+    if select_from is not None:
+        query = query.select_from(select_from)
+    return query.group_by(user_id_column).subquery()
+
+
+def rebuild_user_stats(engine: sqlalchemy.Engine) -> int:
+    """Recompute user_stats for every user; returns the number of rows written."""
+    posts = _count_per_user(post_table.c.user_id)
+    comments = _count_per_user(comment_table.c.user_id)
+    likes = _count_per_user(post_table.c.user_id, like_table.join(post_table))
+
+    query = (
+        sqlalchemy.select(
+            user_table.c.id,
+            sqlalchemy.func.coalesce(posts.c.count, 0),
+            sqlalchemy.func.coalesce(comments.c.count, 0),
+            sqlalchemy.func.coalesce(likes.c.count, 0),
+        )
+        .outerjoin(posts, posts.c.user_id == user_table.c.id)
+        .outerjoin(comments, comments.c.user_id == user_table.c.id)
+        .outerjoin(likes, likes.c.user_id == user_table.c.id)
+    )
+
+    with engine.begin() as connection:
+        connection.execute(user_stats_table.delete())
+        connection.execute(user_stats_table.insert().from_select(
+            ["user_id", "post_count", "comment_count", "likes_received"], query
+        ))
+        return connection.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(user_stats_table)).scalar()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    engine = sqlalchemy.create_engine(args.database_url)
+    start = time.perf_counter()
+    rows = rebuild_user_stats(engine)
+    logger.info("Rebuilt stats for %s users in %.1f s", rows, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()